@@ -4,7 +4,7 @@ from shutil import copyfile
 
 import pandas as pd
 from pyxll import xl_func
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, bindparam
 from sqlalchemy.orm import sessionmaker
 
 from generic_exceptions import (
@@ -128,8 +128,7 @@ class DataManager:
             table = self.get_table_handle(name)
             tbl_name = table.name
 
-            tf = getattr(self.data_loader, tbl_name)
-            df = tf(df, table)
+            df = self.clean_data(df, table, tbl_name)
 
         else:
             raise AssignmentErrorException(value)
@@ -217,8 +216,7 @@ class DataManager:
         table = self.get_table_handle(name)
         tbl_name = table.name
 
-        tf = getattr(self.data_loader, tbl_name)
-        df = tf(df, table)
+        df = self.clean_data(df, table, tbl_name)
 
         df.to_sql(tbl_name, self.db_engine)
         self._log.info(f"{tbl_name}{df.shape}")
@@ -331,6 +329,40 @@ class DataManager:
         else:
             self._log.info(f"{tbl_name}(0)")
 
+    def bulk_update(self, table_name: str, key: str, df: pd.DataFrame) -> int:
+        """
+        Updates the rows of a table from a data frame in a single executemany.
+
+        Parameters
+        ----------
+        table_name: str
+        key: str
+            Column used to match the rows, every other column of df is updated.
+        df: pd.DataFrame
+
+        Returns
+        -------
+        Number of rows updated
+        """
+        table = self.get_table_handle(table_name)
+
+        # The where bind parameter cannot share the name of a column.
+        key_param = "_" + key
+        statement = table.update().where(table.c[key] == bindparam(key_param))
+        records = df.rename(columns={key: key_param}).to_dict("records")
+
+        if len(records) == 0:
+            return 0
+
+        with self.db_engine.begin() as connection:
+            result = connection.execute(statement, records)
+
+        # Rows loaded in the session before the update are stale now.
+        self.session.expire_all()
+
+        self._log.info(f"{table.name} updated {result.rowcount} rows")
+        return result.rowcount
+
     def get_primary_keys(self, table_name) -> List:
         return self.get_table_handle(table_name).primary_key.columns.keys()
 
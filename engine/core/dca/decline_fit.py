@@ -0,0 +1,374 @@
+import logging
+import multiprocessing.spawn
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.optimize import minimize
+
+from decline_models import get_decline_model
+from precision import FIT_DTYPE
+
+
+def align_decline_streams(production, mask):
+    """
+    Left aligns the decline part of every well's production stream.
+
+    The decline of a well starts from the month of its maximum production.
+    Each row is shifted left by its own argmax so that column 0 holds the IP month,
+    the padding months are moved to the end of the row.
+
+    :param production: np.ndarray (nwells, nmonths)
+        Padded monthly production, one row per well.
+    :param mask: np.ndarray (nwells, nmonths)
+        True where the month is a reported month, False for padding.
+    :return: (np.ndarray, np.ndarray, np.ndarray)
+        decline (nwells, nmonths), decline_mask (nwells, nmonths), ip_idx (nwells,)
+
+    Examples
+    --------
+    >>> production = np.array([[1., 3., 2., 0.], [5., 4., 0., 0.]])
+    >>> mask = np.array([[True, True, True, False], [True, True, False, False]])
+    >>> decline, decline_mask, ip_idx = align_decline_streams(production, mask)
+    >>> decline
+    array([[3., 2., 0., 0.],
+           [5., 4., 0., 0.]])
+    >>> ip_idx
+    array([1, 0])
+    """
+    nwells, nmonths = production.shape
+    ip_idx = np.argmax(np.where(mask, production, -np.inf), axis=1)
+
+    columns = np.arange(nmonths).reshape((1, -1)) + ip_idx.reshape((-1, 1))
+    in_range = columns < nmonths
+    columns = np.minimum(columns, nmonths - 1)
+    rows = np.arange(nwells).reshape((-1, 1))
+
+    decline_mask = mask[rows, columns] & in_range
+    decline = np.where(decline_mask, production[rows, columns], 0)
+    return decline, decline_mask, ip_idx
+
+
+def _minimize_batch(
+    model,
+    actual,
+    mask,
+    x0,
+    bounds,
+    options,
+    loss="rmse",
+    loss_options=None,
+    gtol=1e-2,
+):
+    """
+    Runs L-BFGS-B over the (npars * nwells) parameters of the normalized wells.
+
+    A well is flagged converged when its own projected gradient is small,
+    the optimizer only checks the convergence of the summed error.
+
+    :return: (np.ndarray, np.ndarray, np.ndarray, dict)
+        pars (npars, nwells), loss (nwells,), converged (nwells,)
+        and the number of iterations and evaluations of the optimizer.
+    """
+    nwells = actual.shape[0]
+    npars = model.npars
+    batch_bounds = [bound for bound in bounds for _ in range(nwells)]
+
+    def objective(x):
+        well_loss, grad = model.loss_and_grad(
+            x.reshape((npars, nwells)), actual, mask, loss, loss_options
+        )
+        return np.sum(well_loss), grad.ravel()
+
+    result = minimize(
+        objective,
+        x0=x0.ravel(),
+        jac=True,
+        method="L-BFGS-B",
+        bounds=batch_bounds,
+        options=options,
+    )
+
+    pars = result.x.reshape((npars, nwells))
+    well_loss, grad = model.loss_and_grad(pars, actual, mask, loss, loss_options)
+
+    lower = np.array([bound[0] for bound in bounds]).reshape((-1, 1))
+    upper = np.array([bound[1] for bound in bounds]).reshape((-1, 1))
+    at_bound = ((pars <= lower) & (grad > 0)) | ((pars >= upper) & (grad < 0))
+    projected_grad = np.where(at_bound, 0, grad)
+    converged = np.max(np.abs(projected_grad), axis=0) <= gtol * (1 + well_loss)
+
+    logging.info(
+        f"Fitted {nwells} wells with {model.name} in {result.nit} iterations"
+        f" and {result.nfev} evaluations, {np.sum(converged)} converged"
+    )
+    stats = dict(iterations=result.nit, evaluations=result.nfev)
+    return pars, well_loss, converged, stats
+
+
+def fit_decline_batch(
+    decline,
+    mask,
+    initial_guess=None,
+    bounds=None,
+    model="mod_arps",
+    options=None,
+    warm_start=None,
+    loss="rmse",
+    loss_options=None,
+    return_stats=False,
+):
+    """
+    Fits the decline model parameters of all the wells in a single optimizer call.
+
+    The wells are independent, so the sum of their errors is minimized over the
+    (npars * nwells) parameter vector with L-BFGS-B using the jacobian of the model.
+    Every well is normalized by its first decline month, the same way run_arps scales
+    the IP guess and bounds, which keeps all the parameters in the same order of magnitude.
+
+    Months without production are shut-in or missing months filled with zeros,
+    they are left out of the fit so downtime does not drag the decline down.
+
+    With warm_start the wells start from their given parameters. Wells that do not
+    converge from there fall back to the initial guess and keep the better of the two fits.
+
+    :param decline: np.ndarray (nwells, nmonths)
+        Decline streams starting at the IP month. See align_decline_streams.
+    :param mask: np.ndarray (nwells, nmonths)
+        True for the months used in the fit.
+    :param initial_guess: list
+        Initial guess of the model parameters. The first parameter is a multiplier
+        of the first decline month. Defaults to the initial guess of the model.
+    :param bounds: list of tuples
+        (low, high) of the model parameters. The first parameter is a multiplier
+        of the first decline month. Defaults to the bounds of the model.
+    :param model: str
+        Name of a registered decline model, see get_decline_model.
+    :param options: dict
+        L-BFGS-B options.
+    :param warm_start: np.ndarray (npars, nwells)
+        Previously fitted parameters. NaN for wells without parameters.
+    :param loss: str
+        Name of a registered loss, see get_loss.
+    :param loss_options: dict
+        Keyword arguments of the loss, for example {"delta": 0.2} for huber.
+    :param return_stats: bool
+        Also return the fit statistics, see _add_stats.
+    :return: np.ndarray (npars, nwells) or (np.ndarray (npars, nwells), dict)
+    """
+    model = get_decline_model(model)
+    initial_guess = model.initial_guess if initial_guess is None else initial_guess
+    bounds = model.bounds if bounds is None else bounds
+
+    nwells = decline.shape[0]
+    stats = _add_stats(dict(), nwells=nwells)
+    if nwells == 0:
+        pars = np.zeros((model.npars, 0))
+        return (pars, stats) if return_stats else pars
+
+    if options is None:
+        options = {"maxiter": 1000}
+
+    decline = decline.astype(FIT_DTYPE)
+    mask = mask & (decline > 0)
+    scale = np.where(mask[:, 0], decline[:, 0], 0)
+    safe_scale = np.where(scale > 0, scale, 1)
+    actual = decline / safe_scale.reshape((-1, 1))
+
+    x0 = np.repeat(np.asarray(initial_guess, dtype=FIT_DTYPE), nwells)
+    x0 = x0.reshape((model.npars, nwells))
+
+    if warm_start is None:
+        pars, _, converged, fit_stats = _minimize_batch(
+            model, actual, mask, x0, bounds, options, loss, loss_options
+        )
+        _add_stats(stats, **fit_stats)
+
+    else:
+        warm_x0 = np.array(warm_start, dtype=FIT_DTYPE)
+        warm_x0[0] = warm_x0[0] / safe_scale
+        has_warm = np.all(np.isfinite(warm_x0), axis=0)
+
+        lower = np.array([bound[0] for bound in bounds]).reshape((-1, 1))
+        upper = np.array([bound[1] for bound in bounds]).reshape((-1, 1))
+        warm_x0 = np.clip(warm_x0[:, has_warm], lower, upper)
+
+        pars = x0.copy()
+        fit_loss = np.full(nwells, np.inf)
+        converged = np.zeros(nwells, dtype=bool)
+        if np.any(has_warm):
+            warm_pars, warm_loss, warm_converged, fit_stats = _minimize_batch(
+                model,
+                actual[has_warm],
+                mask[has_warm],
+                warm_x0,
+                bounds,
+                options,
+                loss,
+                loss_options,
+            )
+            pars[:, has_warm] = warm_pars
+            fit_loss[has_warm] = warm_loss
+            converged[has_warm] = warm_converged
+            _add_stats(stats, **fit_stats)
+
+        # Wells without parameters and warm started wells that did not converge
+        # fall back to the initial guess.
+        retry = ~converged
+        if np.any(retry):
+            retry_pars, retry_loss, retry_converged, fit_stats = _minimize_batch(
+                model,
+                actual[retry],
+                mask[retry],
+                x0[:, retry],
+                bounds,
+                options,
+                loss,
+                loss_options,
+            )
+            better = retry_loss < fit_loss[retry]
+            pars[:, np.flatnonzero(retry)[better]] = retry_pars[:, better]
+            converged[np.flatnonzero(retry)[better]] = retry_converged[better]
+            _add_stats(stats, **fit_stats)
+
+        logging.info(
+            f"Warm started {np.sum(has_warm)} of {nwells} wells,"
+            f" {np.sum(retry & has_warm)} fell back to the initial guess"
+        )
+
+    pars[0] = pars[0] * scale
+    _add_stats(stats, converged=int(np.sum(converged)))
+    return (pars, stats) if return_stats else pars
+
+
+def _add_stats(stats, nwells=0, iterations=0, evaluations=0, converged=0):
+    """
+    Adds up the fit statistics of optimizer calls and chunks.
+
+    nwells - Number of wells fitted
+    iterations - L-BFGS-B iterations
+    evaluations - Evaluations of the loss and its gradient
+    converged - Number of wells flagged converged
+    """
+    for key, value in [
+        ("nwells", nwells),
+        ("iterations", iterations),
+        ("evaluations", evaluations),
+        ("converged", converged),
+    ]:
+        stats[key] = stats.get(key, 0) + value
+    return stats
+
+
+@contextmanager
+def worker_executable(executable):
+    """
+    Python interpreter of the worker processes started in the block.
+
+    multiprocessing only has a process wide executable, it is restored on exit so
+    that later pools of the process are not affected. None keeps the current one.
+    """
+    if executable is None:
+        yield
+        return
+
+    previous = multiprocessing.spawn.get_executable()
+    multiprocessing.set_executable(executable)
+    try:
+        yield
+    finally:
+        multiprocessing.set_executable(previous)
+
+
+def fit_decline_parallel(
+    decline,
+    mask,
+    initial_guess=None,
+    bounds=None,
+    model="mod_arps",
+    workers=1,
+    chunk_size=100,
+    progress=None,
+    options=None,
+    warm_start=None,
+    loss="rmse",
+    loss_options=None,
+    return_stats=False,
+    executable=None,
+):
+    """
+    Splits the wells into chunks and fits every chunk with fit_decline_batch
+    on a pool of worker processes.
+
+    The chunks only depend on chunk_size, and the results are collected in the
+    chunk order, so the parameters do not change with the number of workers.
+
+    :param decline: np.ndarray (nwells, nmonths)
+    :param mask: np.ndarray (nwells, nmonths)
+    :param initial_guess: list
+    :param bounds: list of tuples
+    :param model: str
+        Name of a registered decline model, see get_decline_model.
+    :param workers: int
+        Number of worker processes. 1 fits the chunks in the calling process.
+    :param chunk_size: int
+        Number of wells fitted in a single optimizer call.
+    :param progress: Callable[[int, int], None]
+        Called after every chunk with the number of wells fitted so far and the total.
+    :param options: dict
+        L-BFGS-B options.
+    :param warm_start: np.ndarray (npars, nwells)
+        Previously fitted parameters, see fit_decline_batch.
+    :param loss: str
+        Name of a registered loss, see get_loss.
+    :param loss_options: dict
+        Keyword arguments of the loss, for example {"delta": 0.2} for huber.
+    :param return_stats: bool
+        Also return the fit statistics summed over the chunks.
+    :param executable: str
+        Python interpreter of the worker processes, the one of the calling process
+        when None. Used only by this pool, see worker_executable.
+    :return: np.ndarray (npars, nwells) or (np.ndarray (npars, nwells), dict)
+    """
+    nwells = decline.shape[0]
+    starts = list(range(0, nwells, chunk_size))
+    nchunks = len(starts)
+
+    chunks = (
+        [decline[start : start + chunk_size] for start in starts],
+        [mask[start : start + chunk_size] for start in starts],
+        [initial_guess] * nchunks,
+        [bounds] * nchunks,
+        [model] * nchunks,
+        [options] * nchunks,
+        [
+            None if warm_start is None else warm_start[:, start : start + chunk_size]
+            for start in starts
+        ],
+        [loss] * nchunks,
+        [loss_options] * nchunks,
+        [True] * nchunks,
+    )
+
+    pars = np.zeros((get_decline_model(model).npars, nwells))
+    stats = _add_stats(dict())
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is None:
+            results = map(fit_decline_batch, *chunks)
+        else:
+            # Every chunk is submitted by map, the workers are started in the block
+            with worker_executable(executable):
+                results = executor.map(fit_decline_batch, *chunks)
+
+        for start, (chunk_pars, chunk_stats) in zip(starts, results):
+            end = start + chunk_pars.shape[1]
+            pars[:, start:end] = chunk_pars
+            _add_stats(stats, **chunk_stats)
+            if progress is not None:
+                progress(end, nwells)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return (pars, stats) if return_stats else pars
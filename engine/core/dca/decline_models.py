@@ -0,0 +1,617 @@
+import numpy as np
+from numba import jit
+
+from mod_arps import (
+    np_mod_arps_fit,
+    nb_mod_arps,
+    np_mod_arps_jacobian,
+    nb_mod_arps_jacobian,
+    np_mod_arps_volumes,
+    nb_mod_arps_volumes,
+    np_mod_arps_volumes_jacobian,
+)
+
+_DECLINE_MODELS = dict()
+_LOSSES = dict()
+
+
+class DeclineModel:
+    """
+    Decline curve model that can be fitted by fit_decline_batch.
+
+    The forecast of a model takes the number of months and a (npars, nwells) parameter
+    array and returns the (nwells, mprod) production. The first parameter is always
+    the initial rate and the forecast is proportional to it, so the fit can normalize
+    every well by its first decline month.
+
+    :param name: str
+        Name the model is registered under.
+    :param par_names: list
+        Names of the parameters, in the order of the parameter array.
+    :param forecast: Callable[[int, np.ndarray], np.ndarray]
+    :param nb_forecast: numba compiled forecast.
+    :param initial_guess: list
+        Default initial guess, the initial rate is a multiplier of the first decline month.
+    :param bounds: list of tuples
+        Default (low, high) of every parameter.
+    :param jacobian: Callable[[int, np.ndarray], (np.ndarray, np.ndarray)]
+        Returns the forecast and its (npars, nwells, mprod) partial derivatives.
+        Forward differences of the forecast are used when None.
+    :param nb_jacobian: numba compiled jacobian.
+    """
+
+    def __init__(
+        self,
+        name,
+        par_names,
+        forecast,
+        nb_forecast,
+        initial_guess,
+        bounds,
+        jacobian=None,
+        nb_jacobian=None,
+    ):
+        self.name = name
+        self.par_names = list(par_names)
+        self.forecast = forecast
+        self.nb_forecast = nb_forecast
+        self.initial_guess = list(initial_guess)
+        self.bounds = list(bounds)
+        self._jacobian = jacobian
+        self.nb_jacobian = nb_jacobian
+
+    def __str__(self):
+        return f"{self.name} - ({', '.join(self.par_names)})"
+
+    def __repr__(self):
+        return f"DeclineModel({self.name})"
+
+    @property
+    def npars(self):
+        return len(self.par_names)
+
+    def jacobian(self, mprod, pars):
+        if self._jacobian is None:
+            return forward_difference_jacobian(self.forecast, mprod, pars)
+        return self._jacobian(mprod, pars)
+
+    def loss(self, pars, actual, mask=None, loss="rmse", loss_options=None):
+        """
+        Error of every well.
+
+        :param pars: np.ndarray (npars, nwells)
+        :param actual: np.ndarray (nwells, mprod)
+        :param mask: np.ndarray (nwells, mprod)
+            Only the months set to True contribute to the error, all when None.
+        :param loss: str
+            Name of a registered loss, see get_loss.
+        :param loss_options: dict
+            Keyword arguments of the loss, for example the delta of huber.
+        :return: np.ndarray (nwells,)
+        """
+        predicted = self.forecast(actual.shape[1], pars)
+        return _masked_loss(loss, predicted, actual, mask, loss_options)
+
+    def nb_loss(self, pars, actual, mask=None, loss="rmse", loss_options=None):
+        """
+        loss calculated with the numba compiled forecast.
+        """
+        predicted = self.nb_forecast(actual.shape[1], pars)
+        return _masked_loss(loss, predicted, actual, mask, loss_options)
+
+    def loss_and_grad(self, pars, actual, mask, loss="rmse", loss_options=None):
+        """
+        loss along with the gradient of every well.
+
+        The error of a well only depends on its own parameters,
+        so the gradient of the summed error is the gradient of every well's error.
+
+        :return: (np.ndarray (nwells,), np.ndarray (npars, nwells))
+        """
+        predicted, jacobian = self.jacobian(actual.shape[1], pars)
+        return get_loss(loss)(predicted, actual, mask, jacobian, **(loss_options or {}))
+
+
+def _masked_loss(loss, predicted, actual, mask, loss_options=None):
+    if mask is None:
+        mask = np.ones(actual.shape, dtype=bool)
+    return get_loss(loss)(predicted, actual, mask, **(loss_options or {}))
+
+
+def register_decline_model(model):
+    _DECLINE_MODELS[model.name] = model
+    return model
+
+
+def get_decline_model(name):
+    if name in _DECLINE_MODELS:
+        return _DECLINE_MODELS[name]
+    else:
+        raise TypeError(f"{name} not found.")
+
+
+def register_loss(func):
+    _LOSSES[func.__name__] = func
+    return func
+
+
+def get_loss(name):
+    if name in _LOSSES:
+        return _LOSSES[name]
+    else:
+        raise TypeError(f"{name} not found.")
+
+
+@register_loss
+def squares(predicted, actual, mask, jacobian=None):
+    """
+    Half the sum of squared errors of every well.
+
+    :param predicted: np.ndarray (nwells, mprod)
+    :param actual: np.ndarray (nwells, mprod)
+    :param mask: np.ndarray (nwells, mprod)
+        Only the months set to True contribute to the error.
+    :param jacobian: np.ndarray (npars, nwells, mprod)
+        Partial derivatives of predicted, the gradient is returned along with the loss
+        when given.
+    :return: np.ndarray (nwells,) or (np.ndarray (nwells,), np.ndarray (npars, nwells))
+    """
+    residual = np.where(mask, actual - predicted, 0)
+    loss = 0.5 * np.sum(np.square(residual), axis=1)
+    if jacobian is None:
+        return loss
+
+    grad = -np.sum(residual * jacobian, axis=2)
+    return loss, grad
+
+
+@register_loss
+def rmse(predicted, actual, mask, jacobian=None):
+    """
+    Root of the sum of squared errors of every well, the default loss.
+    Not smooth at a perfect fit, squares converges faster to the same parameters.
+    See squares for the parameters.
+    """
+    residual = np.where(mask, actual - predicted, 0)
+    loss = np.sqrt(np.sum(np.square(residual), axis=1))
+    if jacobian is None:
+        return loss
+
+    safe_loss = np.maximum(loss, np.finfo(loss.dtype).tiny)
+    grad = -np.sum(residual * jacobian, axis=2) / safe_loss
+    return loss, grad
+
+
+@register_loss
+def huber(predicted, actual, mask, jacobian=None, delta=0.1):
+    """
+    Huber loss of every well, quadratic for residuals below delta and linear above,
+    so months with partial downtime or flush production do not dominate the fit.
+
+    The fit normalizes every well by its first decline month,
+    so delta is a fraction of the first decline month there.
+    See squares for the other parameters.
+
+    :param delta: float
+        Residual where the loss turns from quadratic to linear.
+    """
+    residual = np.where(mask, actual - predicted, 0)
+    abs_residual = np.abs(residual)
+    loss = np.sum(
+        np.where(
+            abs_residual <= delta,
+            0.5 * np.square(residual),
+            delta * (abs_residual - 0.5 * delta),
+        ),
+        axis=1,
+    )
+    if jacobian is None:
+        return loss
+
+    grad = -np.sum(np.clip(residual, -delta, delta) * jacobian, axis=2)
+    return loss, grad
+
+
+@register_loss
+def log_squares(predicted, actual, mask, jacobian=None):
+    """
+    Half the sum of squared errors of the log production of every well.
+    Late months weigh as much as the early high rate months.
+
+    Months without production have no log and are left out.
+    See squares for the parameters.
+    """
+    tiny = np.finfo(predicted.dtype).tiny
+    valid = mask & (actual > 0)
+    safe_predicted = np.maximum(predicted, tiny)
+    residual = np.where(
+        valid, np.log(np.where(valid, actual, 1)) - np.log(safe_predicted), 0
+    )
+    loss = 0.5 * np.sum(np.square(residual), axis=1)
+    if jacobian is None:
+        return loss
+
+    grad = -np.sum(residual * jacobian / safe_predicted, axis=2)
+    return loss, grad
+
+
+def forward_difference_jacobian(forecast, mprod, pars, eps=1e-6):
+    """
+    Forward difference partial derivatives of a forecast.
+
+    Every parameter is stepped for all the wells at once, so the jacobian costs
+    npars + 1 forecasts whatever the number of wells.
+
+    :return: (np.ndarray, np.ndarray)
+        prod (nwells, mprod)
+        jacobian (npars, nwells, mprod)
+    """
+    prod = forecast(mprod, pars)
+    jacobian = np.empty((pars.shape[0],) + prod.shape, dtype=prod.dtype)
+    for i in range(pars.shape[0]):
+        step = eps * np.maximum(np.abs(pars[i]), 1)
+        shifted = pars.copy()
+        shifted[i] = pars[i] + step
+        jacobian[i] = (forecast(mprod, shifted) - prod) / step.reshape((-1, 1))
+    return prod, jacobian
+
+
+def np_sepd_fit(mprod, pars):
+    """
+    Stretched Exponential Production Decline.
+
+    q(t) = qi * exp(-(t / tau) ^ n)
+
+    :param mprod: int
+        Number of months to predict the production.
+    :param pars: np.array (3, nwells)
+        qi, tau, n
+
+        qi - Initial Production
+        tau - Characteristic number of months
+        n - Exponent, 1 is an exponential decline
+    """
+    pars_dtype = pars.dtype
+    qi = pars[0].reshape((-1, 1))
+    tau = pars[1].reshape((-1, 1))
+    n = pars[2].reshape((-1, 1))
+
+    months = np.arange(0, mprod, 1).astype(pars_dtype).reshape((1, -1))
+    return qi * np.exp(-np.power(months / tau, n))
+
+
+nb_sepd = jit(
+    np_sepd_fit, nopython=True, nogil=True, fastmath=True, error_model="numpy"
+)
+
+
+def np_sepd_jacobian(mprod, pars):
+    """
+    SEPD production and its closed form partial derivatives with respect to qi, tau, n.
+    """
+    pars_dtype = pars.dtype
+    one = pars_dtype.type(1)
+    qi = pars[0].reshape((-1, 1))
+    tau = pars[1].reshape((-1, 1))
+    n = pars[2].reshape((-1, 1))
+
+    months = np.arange(0, mprod, 1).astype(pars_dtype).reshape((1, -1))
+    ratio = months / tau
+    stretched = np.power(ratio, n)
+    prod = qi * np.exp(-stretched)
+
+    # (t / tau) ^ n * log(t / tau) goes to 0 at t = 0
+    log_ratio = np.log(np.where(ratio > 0, ratio, one))
+
+    jacobian = np.empty((3, prod.shape[0], prod.shape[1]), dtype=pars_dtype)
+    jacobian[0] = prod / qi
+    jacobian[1] = prod * stretched * n / tau
+    jacobian[2] = -prod * stretched * log_ratio
+    return prod, jacobian
+
+
+nb_sepd_jacobian = jit(
+    np_sepd_jacobian, nopython=True, fastmath=True, error_model="numpy"
+)
+
+
+def np_duong_fit(mprod, pars):
+    """
+    Duong decline for fracture dominated flow.
+
+    q(t) = q1 * t ^ -m * exp(a / (1 - m) * (t ^ (1 - m) - 1)), t in months starting at 1
+
+    :param mprod: int
+        Number of months to predict the production.
+    :param pars: np.array (3, nwells)
+        q1, a, m
+
+        q1 - Production of the first month
+        a - Intercept of the q / Gp against t log-log line
+        m - Slope of the q / Gp against t log-log line, greater than 1
+    """
+    pars_dtype = pars.dtype
+    one = pars_dtype.type(1)
+    q1 = pars[0].reshape((-1, 1))
+    a = pars[1].reshape((-1, 1))
+    m = pars[2].reshape((-1, 1))
+
+    t = np.arange(1, mprod + 1, 1).astype(pars_dtype).reshape((1, -1))
+    return q1 * np.power(t, -m) * np.exp(a / (one - m) * (np.power(t, one - m) - one))
+
+
+nb_duong = jit(
+    np_duong_fit, nopython=True, nogil=True, fastmath=True, error_model="numpy"
+)
+
+
+def np_duong_jacobian(mprod, pars):
+    """
+    Duong production and its closed form partial derivatives with respect to q1, a, m.
+    """
+    pars_dtype = pars.dtype
+    one = pars_dtype.type(1)
+    q1 = pars[0].reshape((-1, 1))
+    a = pars[1].reshape((-1, 1))
+    m = pars[2].reshape((-1, 1))
+
+    t = np.arange(1, mprod + 1, 1).astype(pars_dtype).reshape((1, -1))
+    log_t = np.log(t)
+    t_pow = np.power(t, one - m)
+    time_function = (t_pow - one) / (one - m)
+    prod = q1 * np.power(t, -m) * np.exp(a * time_function)
+
+    jacobian = np.empty((3, prod.shape[0], prod.shape[1]), dtype=pars_dtype)
+    jacobian[0] = prod / q1
+    jacobian[1] = prod * time_function
+    jacobian[2] = prod * (
+        -log_t + a * (time_function / (one - m) - t_pow * log_t / (one - m))
+    )
+    return prod, jacobian
+
+
+nb_duong_jacobian = jit(
+    np_duong_jacobian, nopython=True, fastmath=True, error_model="numpy"
+)
+
+
+def np_three_segment_fit(mprod, pars):
+    """
+    Three segment decline, a hyperbolic decline that changes its b factor
+    at a transition month and then switches to an exponential decline.
+
+        1. Hyperbolic decline with b1 from the IP to the transition month.
+        2. Hyperbolic decline with b2 starting from the rate and decline
+            at the end of the first segment.
+        3. Exponential decline once the decline of the second segment reaches
+            the final decline.
+
+    :param mprod: int
+        Number of months to predict the production.
+    :param pars: np.array (6, nwells)
+        ip, d_hyp_eff, d_exp_eff, b1, b2, t1
+
+        ip - Initial Production
+        d_hyp_eff - Inital Decline; Hyperbolic Effective decline Rate with b1
+        d_exp_eff - Final Decline; Exponential Effective decline Rate
+        b1 - b factor of the transient segment
+        b2 - b factor of the second segment
+        t1 - Transition month between the first and the second segment
+    """
+    pars_dtype = pars.dtype
+    # days in year
+    diy = pars_dtype.type(365)
+
+    # months in year
+    miy = pars_dtype.type(12)
+    one = pars_dtype.type(1)
+    zero = pars_dtype.type(0)
+    dim = diy / miy
+
+    ip = pars[0].reshape((-1, 1))
+    d_hyp_eff = pars[1].reshape((-1, 1))
+    d_exp_eff = pars[2].reshape((-1, 1))
+    b1 = pars[3].reshape((-1, 1))
+    b2 = pars[4].reshape((-1, 1))
+    t1 = pars[5].reshape((-1, 1)) * dim
+
+    # Effective to Nominal conversion
+    d_hyp_nom = ((np.power((one - d_hyp_eff), -b1) - one) / b1) / diy
+    d_exp_nom = -np.log(one - d_exp_eff) / diy
+
+    t = np.arange(0, mprod, 1).astype(pars_dtype).reshape((1, -1)) * dim
+
+    # Every segment scales the rate at the end of the previous one
+    seg1_t = np.minimum(t, t1)
+    seg1_prod = ip * np.power(one + b1 * d_hyp_nom * seg1_t, -one / b1)
+
+    d_t1 = d_hyp_nom / (one + b1 * d_hyp_nom * t1)
+    seg2_days = np.maximum((d_t1 / d_exp_nom - one) / (b2 * d_t1), zero)
+    seg2_t = np.minimum(np.maximum(t - t1, zero), seg2_days)
+    seg2_ratio = np.power(one + b2 * d_t1 * seg2_t, -one / b2)
+
+    seg3_t = np.maximum(t - t1 - seg2_days, zero)
+    seg3_ratio = np.exp(-d_exp_nom * seg3_t)
+
+    return seg1_prod * seg2_ratio * seg3_ratio
+
+
+nb_three_segment = jit(
+    np_three_segment_fit, nopython=True, nogil=True, fastmath=True, error_model="numpy"
+)
+
+
+def np_three_segment_jacobian(mprod, pars):
+    """
+    Three segment production and its closed form partial derivatives.
+
+    The log of the production is the sum of the log of the three segments. The decline
+    at the end of the first segment and the length of the second segment are chained
+    into the segments they start or end, the transition month moves the start of the
+    second and third segments.
+    """
+    pars_dtype = pars.dtype
+    # days in year
+    diy = pars_dtype.type(365)
+
+    # months in year
+    miy = pars_dtype.type(12)
+    one = pars_dtype.type(1)
+    zero = pars_dtype.type(0)
+    dim = diy / miy
+
+    ip = pars[0].reshape((-1, 1))
+    d_hyp_eff = pars[1].reshape((-1, 1))
+    d_exp_eff = pars[2].reshape((-1, 1))
+    b1 = pars[3].reshape((-1, 1))
+    b2 = pars[4].reshape((-1, 1))
+    t1 = pars[5].reshape((-1, 1)) * dim
+
+    # Effective to Nominal conversion and its derivatives
+    hyp_pow = np.power((one - d_hyp_eff), -b1)
+    d_hyp_nom = ((hyp_pow - one) / b1) / diy
+    d_exp_nom = -np.log(one - d_exp_eff) / diy
+
+    dhn_ddh = hyp_pow / (one - d_hyp_eff) / diy
+    dhn_db1 = (-np.log(one - d_hyp_eff) * hyp_pow * b1 - (hyp_pow - one)) / (
+        b1 * b1 * diy
+    )
+    den_dde = one / ((one - d_exp_eff) * diy)
+
+    t = np.arange(0, mprod, 1).astype(pars_dtype).reshape((1, -1)) * dim
+    ones = np.ones((pars.shape[1], mprod), dtype=pars_dtype)
+
+    # First segment, log(seg1_base) / b1 and its derivatives
+    seg1_t = np.minimum(t, t1)
+    seg1_base = one + b1 * d_hyp_nom * seg1_t
+    log_seg1 = np.log(seg1_base)
+    g1_dhn = seg1_t / seg1_base
+    g1_db1 = -log_seg1 / (b1 * b1) + d_hyp_nom * seg1_t / (b1 * seg1_base)
+    g1_dt1 = np.where(t > t1, d_hyp_nom / seg1_base, zero)
+
+    # Decline at the end of the first segment and its derivatives
+    t1_base = one + b1 * d_hyp_nom * t1
+    d_t1 = d_hyp_nom / t1_base
+    dd_t1_dhn = one / (t1_base * t1_base)
+    dd_t1_db1 = -d_hyp_nom * d_hyp_nom * t1 / (t1_base * t1_base)
+    dd_t1_dt1 = -b1 * d_hyp_nom * d_hyp_nom / (t1_base * t1_base)
+
+    # Length of the second segment and its derivatives
+    seg2_days = np.maximum((d_t1 / d_exp_nom - one) / (b2 * d_t1), zero)
+    has_seg2 = seg2_days > zero
+    ds2_dd = np.where(has_seg2, one / (b2 * d_t1 * d_t1), zero)
+    ds2_den = np.where(has_seg2, -one / (b2 * d_exp_nom * d_exp_nom), zero)
+    ds2_db2 = np.where(has_seg2, -seg2_days / b2, zero)
+
+    # Second segment, log(seg2_base) / b2 and its derivatives
+    seg2_elapsed = np.maximum(t - t1, zero)
+    seg2_t = np.minimum(seg2_elapsed, seg2_days)
+    seg2_base = one + b2 * d_t1 * seg2_t
+    g2_dd = seg2_t / seg2_base
+    g2_dt = d_t1 / seg2_base
+    g2_db2 = -np.log(seg2_base) / (b2 * b2) + d_t1 * seg2_t / (b2 * seg2_base)
+    in_seg2 = (t > t1) & (seg2_elapsed < seg2_days)
+
+    # Third segment, d_exp_nom * seg3_t and its derivatives
+    seg3_t = np.maximum(t - t1 - seg2_days, zero)
+    g3_dt = np.where(seg3_t > zero, d_exp_nom * ones, zero)
+
+    prod = (
+        ip
+        * np.power(seg1_base, -one / b1)
+        * np.power(seg2_base, -one / b2)
+        * np.exp(-d_exp_nom * seg3_t)
+    )
+
+    # The second segment ends at seg2_days once it is over
+    dg_ds2 = np.where(seg2_elapsed >= seg2_days, g2_dt, zero) - g3_dt
+    dg_dd = g2_dd + dg_ds2 * ds2_dd
+    dg_dhn = g1_dhn + dg_dd * dd_t1_dhn
+    dg_dt1 = g1_dt1 - np.where(in_seg2, g2_dt, zero) - g3_dt + dg_dd * dd_t1_dt1
+
+    jacobian = np.empty((6, prod.shape[0], prod.shape[1]), dtype=pars_dtype)
+    jacobian[0] = prod / ip
+    jacobian[1] = -prod * dg_dhn * dhn_ddh
+    jacobian[2] = -prod * (seg3_t + dg_ds2 * ds2_den) * den_dde
+    jacobian[3] = -prod * (g1_db1 + dg_dd * dd_t1_db1 + dg_dhn * dhn_db1)
+    jacobian[4] = -prod * (g2_db2 + dg_ds2 * ds2_db2)
+    jacobian[5] = -prod * dg_dt1 * dim
+    return prod, jacobian
+
+
+nb_three_segment_jacobian = jit(
+    np_three_segment_jacobian, nopython=True, fastmath=True, error_model="numpy"
+)
+
+register_decline_model(
+    DeclineModel(
+        "mod_arps",
+        ["ip", "d_hyp_eff", "d_exp_eff", "b"],
+        np_mod_arps_fit,
+        nb_mod_arps,
+        initial_guess=[1.0, 0.7, 0.08, 1.0],
+        bounds=[(0.5, 2.0), (0.3, 0.95), (0.04, 0.15), (0.5, 2.0)],
+        jacobian=np_mod_arps_jacobian,
+        nb_jacobian=nb_mod_arps_jacobian,
+    )
+)
+
+# Modified ARPS forecasting monthly volumes instead of the rate at the start of
+# every month, for wells fitted on and forecasted as monthly volumes.
+register_decline_model(
+    DeclineModel(
+        "mod_arps_volume",
+        ["ip", "d_hyp_eff", "d_exp_eff", "b"],
+        np_mod_arps_volumes,
+        nb_mod_arps_volumes,
+        initial_guess=[1.0, 0.7, 0.08, 1.0],
+        bounds=[(0.5, 2.0), (0.3, 0.95), (0.04, 0.15), (0.5, 2.0)],
+        jacobian=np_mod_arps_volumes_jacobian,
+    )
+)
+
+register_decline_model(
+    DeclineModel(
+        "sepd",
+        ["qi", "tau", "n"],
+        np_sepd_fit,
+        nb_sepd,
+        initial_guess=[1.0, 12.0, 0.5],
+        bounds=[(0.5, 2.0), (0.5, 600.0), (0.05, 1.0)],
+        jacobian=np_sepd_jacobian,
+        nb_jacobian=nb_sepd_jacobian,
+    )
+)
+
+register_decline_model(
+    DeclineModel(
+        "duong",
+        ["q1", "a", "m"],
+        np_duong_fit,
+        nb_duong,
+        initial_guess=[1.0, 1.0, 1.2],
+        bounds=[(0.5, 2.0), (0.01, 3.0), (1.001, 1.8)],
+        jacobian=np_duong_jacobian,
+        nb_jacobian=nb_duong_jacobian,
+    )
+)
+
+register_decline_model(
+    DeclineModel(
+        "three_segment",
+        ["ip", "d_hyp_eff", "d_exp_eff", "b1", "b2", "t1"],
+        np_three_segment_fit,
+        nb_three_segment,
+        initial_guess=[1.0, 0.7, 0.08, 1.2, 0.6, 12.0],
+        bounds=[
+            (0.5, 2.0),
+            (0.3, 0.95),
+            (0.04, 0.15),
+            (0.5, 2.0),
+            (0.1, 1.5),
+            (1.0, 36.0),
+        ],
+        jacobian=np_three_segment_jacobian,
+        nb_jacobian=nb_three_segment_jacobian,
+    )
+)
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from decline_models import get_decline_model
+
+
+class ForecastCache:
+    """
+    Least recently used cache of decline forecasts.
+
+    A forecast only depends on the decline model, the parameters of the well,
+    the number of months and the dtype, so every well is cached under
+    (model, parameter tuple, mprod, dtype). Flipping between wells and sections
+    asks for the same wells again and only the new wells are forecasted.
+
+    The cache is bounded by the bytes of the cached forecasts, the least recently
+    used wells are evicted first.
+
+    The store, if given, is a second level that outlives the cache, for example the
+    session file. It is any object with the two methods
+
+        load_forecasts(keys: List[str]) -> Dict[str, np.ndarray]
+        save_forecasts(forecasts: Dict[str, np.ndarray])
+
+    keyed by the string returned by key_str.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, store=None):
+        self.max_bytes = max_bytes
+        self.store = store
+
+        self._forecasts = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._forecasts)
+
+    def __contains__(self, key):
+        return key in self._forecasts
+
+    def __str__(self):
+        return (
+            f"ForecastCache({len(self)} forecasts, {self.nbytes / 2 ** 20:.1f}"
+            f" of {self.max_bytes / 2 ** 20:.1f} MB, {self.hits} hits,"
+            f" {self.misses} misses)"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    @staticmethod
+    def make_key(model, pars, mprod, dtype=np.float32):
+        """
+        Cache key of a single well.
+
+        :param model: str
+        :param pars: iterable of the npars parameters of the well
+        :param mprod: int
+        :param dtype: np.dtype
+        :return: tuple
+        """
+        return (
+            model,
+            tuple(float(par) for par in pars),
+            int(mprod),
+            np.dtype(dtype).str,
+        )
+
+    @staticmethod
+    def key_str(key):
+        """
+        String of a cache key used by the store.
+        """
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Cached forecast of a key, None if not cached. Marks the key as recently used.
+        """
+        forecast = self._forecasts.get(key)
+        if forecast is not None:
+            self._forecasts.move_to_end(key)
+        return forecast
+
+    def put(self, key, forecast):
+        """
+        Caches a forecast and evicts the least recently used ones above max_bytes.
+        A forecast larger than max_bytes is not cached.
+        """
+        if forecast.nbytes > self.max_bytes:
+            return
+
+        if key in self._forecasts:
+            self.nbytes -= self._forecasts.pop(key).nbytes
+
+        forecast = np.array(forecast)
+        forecast.setflags(write=False)
+        self._forecasts[key] = forecast
+        self.nbytes += forecast.nbytes
+
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._forecasts.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self._forecasts.clear()
+        self.nbytes = 0
+
+    def forecast(self, model, pars, mprod, dtype=np.float32):
+        """
+        Forecasts of the wells, only the wells not cached are forecasted.
+
+        The missing wells are looked up in the store and the rest are forecasted
+        together in a single call of the model and saved to the store.
+
+        :param model: str
+            Name of a registered decline model, see get_decline_model.
+        :param pars: np.ndarray (npars, nwells)
+        :param mprod: int
+        :param dtype: np.dtype
+        :return: np.ndarray (nwells, mprod)
+        """
+        pars = np.asarray(pars, dtype=np.float64)
+        nwells = pars.shape[1]
+        keys = [self.make_key(model, pars[:, i], mprod, dtype) for i in range(nwells)]
+
+        production = np.empty((nwells, mprod), dtype=dtype)
+        missing = list()
+        for i, key in enumerate(keys):
+            forecast = self.get(key)
+            if forecast is None:
+                missing.append(i)
+            else:
+                production[i] = forecast
+
+        self.hits += nwells - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return production
+
+        if self.store is not None:
+            key_strs = {self.key_str(keys[i]): i for i in missing}
+            loaded = set()
+            for key_str, forecast in self.store.load_forecasts(list(key_strs)).items():
+                i = key_strs[key_str]
+                production[i] = forecast
+                self.put(keys[i], forecast)
+                loaded.add(i)
+            missing = [i for i in missing if i not in loaded]
+
+        if missing:
+            forecasts = get_decline_model(model).forecast(mprod, pars[:, missing])
+            production[missing] = forecasts
+            for i in missing:
+                self.put(keys[i], production[i])
+
+            if self.store is not None:
+                self.store.save_forecasts(
+                    {self.key_str(keys[i]): production[i] for i in missing}
+                )
+
+            logging.debug(f"Forecasted {len(missing)} of {nwells} wells with {model}")
+        return production
@@ -1,10 +1,8 @@
-import logging
 import numpy as np
 from numba import jit
-from scipy.optimize import minimize
 
 
-def np_mod_arps_fit(mprod, pars):
+def np_mod_arps_fit(mprod, pars, out=None):
     """
         Given days and Modified ARPS parameters 2D array returns the predicted production
 
@@ -25,7 +23,11 @@ def np_mod_arps_fit(mprod, pars):
             d_hyp_eff - Inital Decline; Hyperbolic Effective decline Rate
             d_exp_eff - Final Decline; Exponential Effective decline Rate
             b = 0 when exponential, 1 when harmonic and < 1 when hyperbolic
+        :param out: np.array (nwells, mprod)
+            Buffer the production is written to, allocated when None.
         Code written to avoid for loop to get better performance.
+        The months broadcast against the per well parameters and the production is
+        built in place in out, so only two more arrays of the size of out are allocated.
 
         For more information,
         http://www.fekete.com/SAN/WebHelp/FeketeHarmony/Harmony_WebHelp/Content/HTML_Files/Reference_Material/Analysis_Method_Theory/Traditional_Decline_Theory.htm
@@ -55,35 +57,629 @@ def np_mod_arps_fit(mprod, pars):
 
     switch_month = switch_day * (miy / diy) - one
     # Hyperbolic and exponential months
-    month = np.arange(0, mprod, 1).astype(pars_dtype)
-    # months = month.reshape((1, -1))
-    months = np.reshape(np.tile(month, [batch_size]), [batch_size, mprod])
-
-    # exp_months = np.round(np.maximum(months - switch_month, zero))
-    exp_months = np.maximum(months - switch_month, zero)
-    switch_flag = np.minimum(exp_months, one)
+    months = np.arange(0, mprod, 1).astype(pars_dtype).reshape((1, -1))
 
     # IP at switch point
     switch_ip = ip / np.power(
         (one + ((b * switch_month * (diy / miy)) * d_hyp_nom)), (one / b)
     )
 
-    # Hyperbolic and Exponential prod
-    hyp_prod = ip / np.power(
-        (one + ((b * months * (diy / miy)) * d_hyp_nom)), (one / b)
-    )
-    exp_prod = switch_ip * np.exp(-d_exp_nom * exp_months * (diy / miy))
+    if out is None:
+        out = np.empty((batch_size, mprod), dtype=pars_dtype)
+
+    # Hyperbolic prod
+    np.multiply(months, (b * (diy / miy)) * d_hyp_nom, out=out)
+    np.add(out, one, out=out)
+    np.power(out, -one / b, out=out)
+    np.multiply(out, ip, out=out)
+
+    # exp_months = np.round(np.maximum(months - switch_month, zero))
+    exp_months = np.subtract(months, switch_month, dtype=out.dtype)
+    np.maximum(exp_months, zero, out=exp_months)
+
+    # Exponential prod
+    exp_prod = np.multiply(exp_months, -d_exp_nom * (diy / miy), dtype=out.dtype)
+    np.exp(exp_prod, out=exp_prod)
+    np.multiply(exp_prod, switch_ip, out=exp_prod)
 
     # combining Hyperbolic and exponential together
-    prod = (one - switch_flag) * hyp_prod + switch_flag * exp_prod
-    return prod
+    switch_flag = np.minimum(exp_months, one, out=exp_months)
+    np.multiply(exp_prod, switch_flag, out=exp_prod)
+    np.subtract(one, switch_flag, out=switch_flag)
+    np.multiply(out, switch_flag, out=out)
+    np.add(out, exp_prod, out=out)
+    return out
+
+
+@jit(nopython=True, nogil=True, fastmath=True, error_model="numpy")
+def _nb_mod_arps_kernel(mprod, pars, out):
+    """
+    Fused np_mod_arps_fit, every month is computed straight into out
+    without any temporary array.
+    """
+    diy = 365.0
+    miy = 12.0
+    dim = diy / miy
+
+    for i in range(pars.shape[1]):
+        ip = pars[0, i]
+        d_hyp_eff = pars[1, i]
+        d_exp_eff = pars[2, i]
+        b = pars[3, i]
+
+        d_hyp_nom = (((1.0 - d_hyp_eff) ** -b - 1.0) / b) / diy
+        d_exp_nom = -np.log(1.0 - d_exp_eff) / diy
+
+        switch_day = ((d_hyp_nom / d_exp_nom) - 1.0) / (d_hyp_nom * b)
+        switch_month = switch_day / dim - 1.0
+        switch_ip = ip / (1.0 + b * switch_month * dim * d_hyp_nom) ** (1.0 / b)
+
+        for j in range(mprod):
+            exp_month = max(j - switch_month, 0.0)
+            switch_flag = min(exp_month, 1.0)
+
+            prod = 0.0
+            if switch_flag < 1.0:
+                hyp_prod = ip / (1.0 + b * j * dim * d_hyp_nom) ** (1.0 / b)
+                prod += (1.0 - switch_flag) * hyp_prod
+            if switch_flag > 0.0:
+                exp_prod = switch_ip * np.exp(-d_exp_nom * exp_month * dim)
+                prod += switch_flag * exp_prod
+            out[i, j] = prod
+
+    return out
+
+
+def nb_mod_arps(mprod, pars, out=None):
+    """
+    np_mod_arps_fit computed by a numba kernel that writes every month straight
+    into out, peak memory is the size of out.
+
+    :param mprod: int
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param out: np.array (nwells, mprod)
+        Buffer the production is written to, allocated when None.
+    :return: np.array (nwells, mprod)
+    """
+    if out is None:
+        out = np.empty((pars.shape[1], mprod), dtype=pars.dtype)
+    elif out.shape != (pars.shape[1], mprod):
+        raise ValueError(
+            f"out has shape {out.shape}, expected {(pars.shape[1], mprod)}"
+        )
+    return _nb_mod_arps_kernel(mprod, pars, out)
+
+
+def _mod_arps_segments(pars):
+    """
+    Per well terms of the two Modified ARPS segments in float64, months as time unit.
+
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :return: tuple of np.array (nwells, 1)
+        ip, b, dh and de the nominal declines per month, switch_month,
+        switch_ip the rate at the switch month
+    """
+    pars = pars.astype(np.float64, copy=False)
+    # days in year
+    diy = 365.0
+
+    # months in year
+    miy = 12.0
+    dim = diy / miy
+
+    ip = pars[0].reshape((-1, 1))
+    d_hyp_eff = pars[1].reshape((-1, 1))
+    d_exp_eff = pars[2].reshape((-1, 1))
+    b = pars[3].reshape((-1, 1))
+
+    # Effective to Nominal conversion, per month
+    d_hyp_nom = ((np.power((1.0 - d_hyp_eff), -b) - 1.0) / b) / diy
+    d_exp_nom = -np.log(1.0 - d_exp_eff) / diy
+    dh = d_hyp_nom * dim
+    de = d_exp_nom * dim
+
+    # Same switch point as np_mod_arps_fit
+    switch_day = ((d_hyp_nom / d_exp_nom) - 1.0) / (d_hyp_nom * b)
+    switch_month = switch_day * (miy / diy) - 1.0
+    switch_ip = ip / np.power((1.0 + b * switch_month * dh), (1.0 / b))
+    return ip, b, dh, de, switch_month, switch_ip
+
+
+def np_mod_arps_cum(months, pars):
+    """
+    Analytic cumulative production of Modified ARPS from month 0 to the given months.
+
+    The rate of np_mod_arps_fit is integrated in closed form, hyperbolic up to the
+    switch month and exponential after it.
+
+        hyperbolic  ip / (dh * (1 - b)) * (1 - (1 + b * dh * t) ** (1 - 1 / b))
+                    ip / dh * log(1 + dh * t) when b is 1
+        exponential switch_ip / de * (1 - exp(-de * (t - switch_month)))
+
+    dh and de are the nominal declines per month.
+
+    Computed in float64 whatever the dtype of pars, the hyperbolic term is ill conditioned
+    for b close to 1 and the monthly volumes are differences of large cumulatives.
+
+    :param months: np.array (ntimes,) or (nwells, ntimes)
+        Months since the IP month, can be fractional.
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :return: np.array (nwells, ntimes) float64
+    """
+    ip, b, dh, de, switch_month, switch_ip = _mod_arps_segments(pars)
+
+    months = np.asarray(months, dtype=np.float64)
+    if months.ndim < 2:
+        months = months.reshape((1, -1))
+
+    # Hyperbolic cumulative up to the switch month
+    hyp_end = np.maximum(switch_month, 0.0)
+    hyp_x = 1.0 + b * dh * np.clip(months, 0.0, hyp_end)
+    harmonic = np.abs(1.0 - b) < 1e-6
+    safe_b = np.where(harmonic, 0.0, b)
+    hyp_cum = np.where(
+        harmonic,
+        ip / dh * np.log(hyp_x),
+        ip / (dh * (1.0 - safe_b)) * (1.0 - np.power(hyp_x, 1.0 - 1.0 / b)),
+    )
+
+    # Exponential cumulative after the switch month
+    exp_start = hyp_end - switch_month
+    exp_end = np.maximum(months, hyp_end) - switch_month
+    exp_cum = switch_ip / de * (np.exp(-de * exp_start) - np.exp(-de * exp_end))
+
+    return hyp_cum + exp_cum
+
+
+def np_mod_arps_econ_limit(pars, econ_limit):
+    """
+    Month the Modified ARPS rate falls to the economic limit, solved per well
+    by inverting the segment the limit falls in.
+
+        hyperbolic  ((ip / econ_limit) ** b - 1) / (b * dh)
+        exponential switch_month + log(switch_ip / econ_limit) / de
+
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param econ_limit: float or np.array (nwells,)
+        Economic limit rate, in the unit of ip.
+    :return: np.array (nwells,) float64
+        Months since the IP month, 0 for wells starting below the limit.
+    """
+    ip, b, dh, de, switch_month, switch_ip = _mod_arps_segments(pars)
+    econ_limit = np.broadcast_to(
+        np.asarray(econ_limit, dtype=np.float64), (ip.shape[0],)
+    ).reshape((-1, 1))
+
+    # Rate where the exponential segment starts, wells with a negative switch month
+    # are exponential from month 0
+    hyp_end = np.maximum(switch_month, 0.0)
+    hyp_end_rate = switch_ip * np.exp(-de * (hyp_end - switch_month))
+
+    with np.errstate(divide="ignore"):
+        hyp_month = (np.power(ip / econ_limit, b) - 1.0) / (b * dh)
+        exp_month = switch_month + np.log(switch_ip / econ_limit) / de
+
+    month = np.where(
+        econ_limit >= hyp_end_rate,
+        np.clip(hyp_month, 0.0, hyp_end),
+        np.maximum(exp_month, hyp_end),
+    )
+    return month.ravel()
+
+
+def np_mod_arps_eur(pars, econ_limit, elapsed_months=0, max_months=None):
+    """
+    Estimated ultimate recovery and remaining reserves of Modified ARPS wells
+    down to the economic limit.
+
+    The cutoff month is solved analytically, see np_mod_arps_econ_limit,
+    and the reserves are the cumulative production at the cutoff, see np_mod_arps_cum.
+
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param econ_limit: float or np.array (nwells,)
+        Economic limit rate, in the unit of ip.
+    :param elapsed_months: int or np.array (nwells,)
+        Months produced since the IP month.
+    :param max_months: int
+        Cap on the life of a well since the IP month, no cap when None.
+    :return: (np.array, np.array, np.array) (nwells,) float64
+        cutoff month since the IP month, EUR and remaining reserves
+
+    Examples
+    --------
+    >>> pars = np.array([[1000.0], [0.7], [0.08], [1.2]])
+    >>> cutoff, eur, remaining = np_mod_arps_eur(pars, 10.0, elapsed_months=12)
+    >>> bool(np.isclose(np_mod_arps_fit(int(cutoff[0]) + 2, pars)[0, -1], 10.0, rtol=0.05))
+    True
+    """
+    cutoff = np_mod_arps_econ_limit(pars, econ_limit)
+    if max_months is not None:
+        cutoff = np.minimum(cutoff, max_months)
+
+    elapsed = np.broadcast_to(
+        np.asarray(elapsed_months, dtype=np.float64), cutoff.shape
+    )
+    months = np.column_stack([np.minimum(elapsed, cutoff), cutoff])
+    cum = np_mod_arps_cum(months, pars)
+
+    eur = cum[:, 1]
+    remaining = cum[:, 1] - cum[:, 0]
+    return cutoff, eur, remaining
+
+
+def np_mod_arps_volumes(mprod, pars, step=1):
+    """
+    Production volumes of consecutive periods of step months, the difference of the
+    cumulative production at the period boundaries.
+
+    Unlike np_mod_arps_fit, which is the rate at the start of every month, the volumes
+    are exact for any step, so long tails can be forecasted by quarter or by year.
+
+    :param mprod: int
+        Number of months to forecast, the last period is shorter when step
+        does not divide it.
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param step: int
+        Months per period.
+    :return: np.array (nwells, ceil(mprod / step)) of the dtype of pars
+
+    Examples
+    --------
+    >>> pars = np.array([[1000.0], [0.7], [0.08], [1.0]])
+    >>> monthly = np_mod_arps_volumes(24, pars)
+    >>> quarterly = np_mod_arps_volumes(24, pars, step=3)
+    >>> bool(np.allclose(quarterly, monthly.reshape((1, 8, 3)).sum(axis=2)))
+    True
+    """
+    edges = np.minimum(np.arange(0, mprod + step, step), mprod)
+    edges = edges[: -(-mprod // step) + 1]
+    return np.diff(np_mod_arps_cum(edges, pars), axis=1).astype(pars.dtype)
+
+
+@jit(nopython=True, nogil=True, error_model="numpy")
+def _nb_mod_arps_cum(month, ip, b, dh, de, switch_month, switch_ip):
+    """
+    np_mod_arps_cum of a single well and month, see _mod_arps_segments for the terms.
+    """
+    hyp_end = max(switch_month, 0.0)
+    hyp_x = 1.0 + b * dh * min(max(month, 0.0), hyp_end)
+    if abs(1.0 - b) < 1e-6:
+        hyp_cum = ip / dh * np.log(hyp_x)
+    else:
+        hyp_cum = ip / (dh * (1.0 - b)) * (1.0 - hyp_x ** (1.0 - 1.0 / b))
+
+    exp_start = hyp_end - switch_month
+    exp_end = max(month, hyp_end) - switch_month
+    exp_cum = switch_ip / de * (np.exp(-de * exp_start) - np.exp(-de * exp_end))
+    return hyp_cum + exp_cum
+
+
+@jit(nopython=True, nogil=True, error_model="numpy")
+def _nb_mod_arps_volumes_kernel(mprod, pars, out):
+    """
+    Monthly np_mod_arps_volumes, the cumulative of every month boundary is computed
+    in float64 and differenced straight into out.
+    """
+    diy = 365.0
+    miy = 12.0
+    dim = diy / miy
+
+    for i in range(pars.shape[1]):
+        ip = float(pars[0, i])
+        d_hyp_eff = float(pars[1, i])
+        d_exp_eff = float(pars[2, i])
+        b = float(pars[3, i])
+
+        d_hyp_nom = (((1.0 - d_hyp_eff) ** -b - 1.0) / b) / diy
+        d_exp_nom = -np.log(1.0 - d_exp_eff) / diy
+        dh = d_hyp_nom * dim
+        de = d_exp_nom * dim
+
+        switch_day = ((d_hyp_nom / d_exp_nom) - 1.0) / (d_hyp_nom * b)
+        switch_month = switch_day * (miy / diy) - 1.0
+        switch_ip = ip / (1.0 + b * switch_month * dh) ** (1.0 / b)
+
+        cum = _nb_mod_arps_cum(0.0, ip, b, dh, de, switch_month, switch_ip)
+        for j in range(mprod):
+            next_cum = _nb_mod_arps_cum(j + 1.0, ip, b, dh, de, switch_month, switch_ip)
+            out[i, j] = next_cum - cum
+            cum = next_cum
+
+    return out
+
+
+def nb_mod_arps_volumes(mprod, pars, out=None):
+    """
+    Monthly np_mod_arps_volumes computed by a numba kernel, peak memory is the size
+    of out.
+
+    :param mprod: int
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param out: np.array (nwells, mprod)
+        Buffer the volumes are written to, allocated when None.
+    :return: np.array (nwells, mprod)
+    """
+    if out is None:
+        out = np.empty((pars.shape[1], mprod), dtype=pars.dtype)
+    elif out.shape != (pars.shape[1], mprod):
+        raise ValueError(
+            f"out has shape {out.shape}, expected {(pars.shape[1], mprod)}"
+        )
+    return _nb_mod_arps_volumes_kernel(mprod, pars, out)
+
+
+def np_mod_arps_volumes_jacobian(mprod, pars):
+    """
+    Monthly np_mod_arps_volumes and their closed form partial derivatives.
+
+    The derivatives of np_mod_arps_cum are taken at every month boundary and
+    differenced like the volumes. The switch month moves the end of the hyperbolic
+    cumulative and the start of the exponential one, the rate at the switch month
+    scales the whole exponential cumulative.
+
+    :param mprod: int
+        Number of months to forecast.
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :return: (np.array, np.array)
+        volumes (nwells, mprod)
+        jacobian (4, nwells, mprod) with respect to ip, d_hyp_eff, d_exp_eff, b
+    """
+    ip, b, dh, de, switch_month, switch_ip = _mod_arps_segments(pars)
+    d_hyp_eff = pars[1].astype(np.float64).reshape((-1, 1))
+    d_exp_eff = pars[2].astype(np.float64).reshape((-1, 1))
+    months = np.arange(0, mprod + 1).astype(np.float64).reshape((1, -1))
+
+    # Derivatives of the nominal declines per month
+    hyp_pow = np.power(1.0 - d_hyp_eff, -b)
+    ddh_ddh_eff = hyp_pow / ((1.0 - d_hyp_eff) * 12.0)
+    ddh_db = (-np.log(1.0 - d_hyp_eff) * hyp_pow * b - (hyp_pow - 1.0)) / (b * b * 12.0)
+    dde_dde_eff = 1.0 / ((1.0 - d_exp_eff) * 12.0)
+
+    # Derivatives of the switch month and of the log of the rate at the switch month
+    ds_ddh = 1.0 / (dh * dh * b)
+    ds_dde = -1.0 / (de * de * b)
+    ds_db = -(switch_month + 1.0) / b
+    switch_x = 1.0 + b * switch_month * dh
+    lsw_ddh = -(1.0 / de - b) / (b * switch_x)
+    lsw_dde = dh / (de * de * b * switch_x)
+    lsw_db = np.log(switch_x) / (b * b) + dh / (b * switch_x)
+
+    # Hyperbolic cumulative, ip / dh * (1 - x ** (1 - 1 / b)) / (1 - b)
+    hyp_end = np.maximum(switch_month, 0.0)
+    hyp_t = np.clip(months, 0.0, hyp_end)
+    log_x = np.log(1.0 + b * dh * hyp_t)
+    harmonic = np.abs(1.0 - b) < 1e-6
+    one_minus_b = np.where(harmonic, 1.0, 1.0 - b)
+    one_minus_pow = -np.expm1((1.0 - 1.0 / b) * log_x)
+    hyp_cum = np.where(
+        harmonic, ip / dh * log_x, ip / (dh * one_minus_b) * one_minus_pow
+    )
+    hyp_rate = ip * np.exp(-log_x / b)
+
+    # Derivative of the (1 - x ** (1 - 1 / b)) / (1 - b) factor at constant x
+    dfactor_db = np.where(
+        harmonic,
+        0.5 * log_x * log_x - log_x,
+        (one_minus_pow - one_minus_b * (1.0 - one_minus_pow) * log_x / (b * b))
+        / (one_minus_b * one_minus_b),
+    )
+    dhyp_ddh = (hyp_rate * hyp_t - hyp_cum) / dh
+    dhyp_db = ip / dh * dfactor_db + hyp_rate * hyp_t / b
+    dhyp_ds = np.where((months > hyp_end) & (switch_month > 0.0), hyp_rate, 0.0)
+
+    # Exponential cumulative
+    exp_start = hyp_end - switch_month
+    exp_end = np.maximum(months, hyp_end) - switch_month
+    start_decay = np.exp(-de * exp_start)
+    end_decay = np.exp(-de * exp_end)
+    exp_cum = switch_ip / de * (start_decay - end_decay)
+    dexp_dde = (
+        switch_ip / de * (exp_end * end_decay - exp_start * start_decay) - exp_cum / de
+    )
+    dstart_ds = np.where(switch_month < 0.0, -1.0, 0.0)
+    dend_ds = np.where(months > hyp_end, -1.0, dstart_ds)
+    dexp_ds = switch_ip * (end_decay * dend_ds - start_decay * dstart_ds)
+
+    cum = hyp_cum + exp_cum
+    dcum_ds = dhyp_ds + dexp_ds
+    dcum_ddh = dhyp_ddh + exp_cum * lsw_ddh + dcum_ds * ds_ddh
+    dcum_dde = dexp_dde + exp_cum * lsw_dde + dcum_ds * ds_dde
+    dcum_db = dhyp_db + exp_cum * lsw_db + dcum_ds * ds_db
+
+    jacobian = np.stack(
+        [
+            cum / ip,
+            dcum_ddh * ddh_ddh_eff,
+            dcum_dde * dde_dde_eff,
+            dcum_db + dcum_ddh * ddh_db,
+        ]
+    )
+    volumes = np.diff(cum, axis=1).astype(pars.dtype)
+    return volumes, np.diff(jacobian, axis=2).astype(pars.dtype)
+
+
+def np_mod_arps_jacobian(mprod, pars):
+    """
+    Given months and Modified ARPS parameters 2D array returns the predicted production
+    and its closed form partial derivatives.
+
+    Follows np_mod_arps_fit step by step. The derivatives of the effective to nominal
+    conversions and of the switch point are chained into the hyperbolic, switch and
+    exponential production, including the one month blend around the switch point.
+
+    :param mprod: int
+        Number of months to predict the production.
+    :param pars: np.array (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :return: (np.array, np.array)
+        prod (nwells, mprod)
+        jacobian (4, nwells, mprod) with respect to ip, d_hyp_eff, d_exp_eff, b
+    """
+    pars_dtype = pars.dtype
+    # days in year
+    diy = pars_dtype.type(365)
+
+    # months in year
+    miy = pars_dtype.type(12)
+    one = pars_dtype.type(1)
+    zero = pars_dtype.type(0)
+    dim = diy / miy
+
+    ip = pars[0].reshape((-1, 1))
+    d_hyp_eff = pars[1].reshape((-1, 1))
+    d_exp_eff = pars[2].reshape((-1, 1))
+    b = pars[3].reshape((-1, 1))
+
+    # Effective to Nominal conversion and its derivatives
+    hyp_pow = np.power((one - d_hyp_eff), -b)
+    d_hyp_nom = ((hyp_pow - one) / b) / diy
+    d_exp_nom = -np.log(one - d_exp_eff) / diy
+
+    dhn_ddh = hyp_pow / (one - d_hyp_eff) / diy
+    dhn_db = (-np.log(one - d_hyp_eff) * hyp_pow * b - (hyp_pow - one)) / (b * b * diy)
+    den_dde = one / ((one - d_exp_eff) * diy)
+
+    # Switch point and its derivatives
+    switch_day = ((d_hyp_nom / d_exp_nom) - one) / (d_hyp_nom * b)
+    switch_month = switch_day * (miy / diy) - one
+    switch_t = switch_month * dim
+
+    ds_dhn = one / (d_hyp_nom * d_hyp_nom * b)
+    ds_den = -one / (d_exp_nom * d_exp_nom * b)
+    ds_db = -switch_day / b
+
+    dst_ddh = ds_dhn * dhn_ddh
+    dst_dde = ds_den * den_dde
+    dst_db = ds_dhn * dhn_db + ds_db
+
+    months = np.arange(0, mprod, 1).astype(pars_dtype).reshape((1, -1))
+    t = months * dim
+
+    exp_months = np.maximum(months - switch_month, zero)
+    switch_flag = np.minimum(exp_months, one)
+    exp_t = exp_months * dim
+
+    # Hyperbolic prod and its log derivatives
+    hyp_base = one + b * t * d_hyp_nom
+    log_hyp_base = np.log(hyp_base)
+    hyp_prod = ip * np.exp(-log_hyp_base / b)
+    lhyp_dhn = -t / hyp_base
+    lhyp_db = log_hyp_base / (b * b) + (d_hyp_nom / b) * lhyp_dhn
+
+    # IP at switch point and its log derivatives
+    switch_base = one + b * switch_t * d_hyp_nom
+    switch_ip = ip / np.power(switch_base, (one / b))
+    lsw_dhn = -switch_t / switch_base
+    lsw_db = np.log(switch_base) / (b * b) - (switch_t * d_hyp_nom) / (b * switch_base)
+    lsw_dst = -d_hyp_nom / switch_base
+
+    # Exponential prod and its log derivatives
+    # Past the switch point exp_t moves against switch_t
+    exp_prod = switch_ip * np.exp(-d_exp_nom * exp_t)
+    hyp_weight = (one - switch_flag) * hyp_prod
+    exp_weight = switch_flag * exp_prod
+    prod = hyp_weight + exp_weight
+
+    # switch_flag moves against switch_month only inside the blend month
+    blend = (hyp_prod - exp_prod) * (miy / diy)
+    blend = np.where((exp_months > zero) & (exp_months < one), blend, zero)
+
+    jacobian = np.empty((4, prod.shape[0], prod.shape[1]), dtype=pars_dtype)
+    jacobian[0] = prod / ip
+
+    exp_dst = exp_weight * lsw_dst + d_exp_nom * exp_weight + blend
+    jacobian[1] = (
+        hyp_weight * lhyp_dhn * dhn_ddh
+        + exp_weight * (lsw_dhn * dhn_ddh)
+        + exp_dst * dst_ddh
+    )
+    jacobian[2] = exp_dst * dst_dde - exp_weight * exp_t * den_dde
+    jacobian[3] = (
+        hyp_weight * (lhyp_dhn * dhn_db + lhyp_db)
+        + exp_weight * (lsw_dhn * dhn_db + lsw_db)
+        + exp_dst * dst_db
+    )
+    return prod, jacobian
 
 
-nb_mod_arps = jit(np_mod_arps_fit, nopython=True, fastmath=True, error_model="numpy")
+nb_mod_arps_jacobian = jit(
+    np_mod_arps_jacobian, nopython=True, fastmath=True, error_model="numpy"
+)
 
 
 def modarps_rmse(pars, actual):
+    """
+    Root of the sum of squared errors of a single well.
+    Months without production are shut-in or missing months and are left out.
+    """
     pars = pars.reshape(-1, 1)
-    mprod = actual.shape[0]
+    actual = actual.reshape(1, -1)
+    mprod = actual.shape[1]
     predicted = np_mod_arps_fit(mprod, pars)
-    return np.sqrt(np.sum(np.square(actual - predicted)))
+    residual = np.where(actual > 0, actual - predicted, 0)
+    return np.sqrt(np.sum(np.square(residual)))
+
+
+def modarps_rmse_and_grad(pars, actual):
+    """
+    modarps_rmse along with its gradient, to be used with jac=True in scipy minimize.
+
+    :param pars: np.array (4,)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param actual: np.array (mprod,)
+    :return: (float, np.array (4,))
+    """
+    pars = pars.reshape(-1, 1)
+    actual = actual.reshape(1, -1)
+    mprod = actual.shape[1]
+    predicted, jacobian = np_mod_arps_jacobian(mprod, pars)
+
+    residual = np.where(actual > 0, actual - predicted, 0)
+    rmse = np.sqrt(np.sum(np.square(residual)))
+    grad = -np.sum(residual * jacobian, axis=(1, 2)) / max(rmse, np.finfo(float).tiny)
+    return rmse, grad
+
+
+def batch_modarps_rmse(pars, actual, mask):
+    """
+    Root of the sum of squared errors of every well, calculated in one forecast.
+
+    :param pars: np.ndarray (4, nwells)
+        ip, d_hyp_eff, d_exp_eff, b
+    :param actual: np.ndarray (nwells, nmonths)
+    :param mask: np.ndarray (nwells, nmonths)
+        Only the months set to True contribute to the error.
+    :return: np.ndarray (nwells,)
+    """
+    predicted = np_mod_arps_fit(actual.shape[1], pars)
+    residual = np.where(mask, actual - predicted, 0)
+    return np.sqrt(np.sum(np.square(residual), axis=1))
+
+
+def batch_modarps_rmse_and_grad(pars, actual, mask):
+    """
+    batch_modarps_rmse along with the gradient of every well.
+
+    The error of a well only depends on its own parameters,
+    so the gradient of the summed error is the gradient of every well's error.
+
+    :param pars: np.ndarray (4, nwells)
+    :param actual: np.ndarray (nwells, nmonths)
+    :param mask: np.ndarray (nwells, nmonths)
+    :return: (np.ndarray (nwells,), np.ndarray (4, nwells))
+    """
+    predicted, jacobian = np_mod_arps_jacobian(actual.shape[1], pars)
+    residual = np.where(mask, actual - predicted, 0)
+    loss = np.sqrt(np.sum(np.square(residual), axis=1))
+
+    safe_loss = np.maximum(loss, np.finfo(loss.dtype).tiny)
+    grad = -np.sum(residual * jacobian, axis=2) / safe_loss
+    return loss, grad
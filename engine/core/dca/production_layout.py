@@ -0,0 +1,123 @@
+"""
+Grouped, contiguous layout of the monthly production of all the wells.
+
+The monthly production is stored CSR style. Every stream is a single flat float32 buffer
+with the months of a well next to each other, and a well is located in the buffer by
+its offset and length. Slicing a well is O(1) and padding any subset of wells into a
+(nwells, nmonths) matrix is a single gather.
+"""
+
+from hashlib import blake2b
+
+import numpy as np
+
+
+class ProductionLayout:
+    def __init__(self, apis, offsets, lengths, streams):
+        """
+        :param apis: np.ndarray (nwells,)
+            Sorted unique apis
+        :param offsets: np.ndarray (nwells,)
+            Position of the first month of every well in the stream buffers
+        :param lengths: np.ndarray (nwells,)
+            Number of months of every well
+        :param streams: dict
+            Stream name to flat np.ndarray buffer, for example {"oil": ..., "gas": ...}
+        """
+        assert apis.shape == offsets.shape == lengths.shape
+        self.apis = apis
+        self.offsets = offsets
+        self.lengths = lengths
+        self.streams = streams
+
+    def __len__(self):
+        return self.apis.shape[0]
+
+    def __str__(self):
+        return f"{__class__.__name__}({len(self)} wells)"
+
+    def __repr__(self):
+        return f"{__class__.__name__}({len(self)} wells)"
+
+    def stream(self, i: int, product: str) -> np.ndarray:
+        """
+        View of the production of the ith well.
+        """
+        start = self.offsets[i]
+        return self.streams[product][start : start + self.lengths[i]]
+
+    def hash_wells(self, salt: bytes = b"") -> np.ndarray:
+        """
+        Content hash of the production streams of every well.
+
+        :param salt: bytes
+            Hashed along with the production, for example the fit settings,
+            so that a change in either gives a new hash.
+        :return: np.ndarray (nwells,) of hex digests
+        """
+        names = sorted(self.streams)
+        hashes = np.empty(len(self), dtype=object)
+        for i in range(len(self)):
+            digest = blake2b(salt, digest_size=16)
+            for name in names:
+                digest.update(self.stream(i, name).tobytes())
+            hashes[i] = digest.hexdigest()
+
+        return hashes
+
+    def to_padded(self, product: str, wells: np.ndarray = None):
+        """
+        Pads the production of the selected wells into a (nwells, nmonths) matrix.
+
+        :param product: str
+            Stream name
+        :param wells: np.ndarray
+            Indices of the wells to select, all the wells when None
+        :return: (np.ndarray, np.ndarray)
+            production (nwells, nmonths) and mask (nwells, nmonths),
+            mask is True for the months reported by the well.
+        """
+        offsets = self.offsets if wells is None else self.offsets[wells]
+        lengths = self.lengths if wells is None else self.lengths[wells]
+        buffer = self.streams[product]
+
+        nwells = lengths.shape[0]
+        nmonths = int(lengths.max()) if nwells else 0
+
+        rows = np.repeat(np.arange(nwells), lengths)
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cols = np.arange(rows.shape[0]) - starts
+
+        production = np.zeros((nwells, nmonths), dtype=buffer.dtype)
+        mask = np.zeros((nwells, nmonths), dtype=bool)
+        production[rows, cols] = buffer[np.repeat(offsets, lengths) + cols]
+        mask[rows, cols] = True
+        return production, mask
+
+
+def make_production_layout(api: np.ndarray, dtype=np.float32, **streams):
+    """
+    Builds a ProductionLayout from monthly rows already sorted by api and date.
+
+    :param api: np.ndarray (nrows,)
+        api of every monthly row, sorted
+    :param dtype:
+        dtype of the stream buffers
+    :param streams: np.ndarray (nrows,)
+        Production of every monthly row, for example oil=..., gas=...
+    :return: ProductionLayout
+
+    Examples
+    --------
+    >>> layout = make_production_layout(np.array([1, 1, 2]), oil=np.array([5, 4, 9]))
+    >>> layout.stream(0, "oil")
+    array([5., 4.], dtype=float32)
+    """
+    assert np.all(api[1:] >= api[:-1]), "monthlies should be sorted by api"
+
+    apis, offsets, lengths = np.unique(api, return_index=True, return_counts=True)
+    buffers = {
+        name: np.ascontiguousarray(stream, dtype=dtype)
+        for name, stream in streams.items()
+    }
+    return ProductionLayout(apis, offsets, lengths, buffers)
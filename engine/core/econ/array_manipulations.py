@@ -1,7 +1,9 @@
 import numpy as np
+from numba import jit
+from numpy.lib.stride_tricks import as_strided
 
 
-def accumulate_axis(array: np.ndarray, start: int, end: int):
+def accumulate_axis(array: np.ndarray, start: int, end: int, out=None):
     """
     Accumulate values from start to end in the second dimension of a 2D array and sets it at end index.
     Also sets the value from start to end-1 as 0.
@@ -9,18 +11,27 @@ def accumulate_axis(array: np.ndarray, start: int, end: int):
     :param array: np.ndarray
     :param start: int
     :param end: int
+    :param out: np.ndarray
+        Array the result is written to, can be array itself. A copy of array when None.
     :return:
 
     Examples
     --------
     >>> a = np.array([[1,2,3,4,5], [2,4,6,8,10], [3,6,9,12,15]])
-    >>> agg_axis(a, 0, 3)
+    >>> accumulate_axis(a, 0, 3)
     array([[ 0,  0,  6,  4,  5],
            [ 0,  0, 12,  8, 10],
            [ 0,  0, 18, 12, 15]])
     """
-    new_array = array.copy()
-    new_array[:, end - 1] = np.sum(new_array[:, start:end], axis=1)
+    if out is None:
+        new_array = array.copy()
+    else:
+        new_array = out
+        if new_array is not array:
+            new_array[...] = array
+    # float16 sums lose the small months, accumulated in float32
+    sum_dtype = np.float32 if array.dtype == np.float16 else array.dtype
+    new_array[:, end - 1] = np.sum(new_array[:, start:end], axis=1, dtype=sum_dtype)
     new_array[:, start : (end - 1)] = 0
     return new_array
 
@@ -30,6 +41,10 @@ def take_per_row_strided(array: np.ndarray, start_indices: np.ndarray, nelements
     Slice the first dimension of a 2D array starting from different position
     given by index and ending at num_element.
 
+    The rows are read through a read-only window view built from the own strides
+    of the array, the array is never reshaped or written and can have any strides,
+    e.g. a slice of the production tensor.
+
     :param array: np.ndarray
         2D
     :param start_indices: np.ndarray
@@ -37,6 +52,7 @@ def take_per_row_strided(array: np.ndarray, start_indices: np.ndarray, nelements
     :param num_elem: int
         Number of elements to select from each row starting from start_indices
     :return: np.ndarray
+        A new writable array, never a view of array.
 
     Examples
     -------
@@ -48,16 +64,25 @@ def take_per_row_strided(array: np.ndarray, start_indices: np.ndarray, nelements
            [3, 4, 5]])
 
     """
+    nrows, ncols = array.shape
+    start_indices = np.asarray(start_indices)
+    if start_indices.shape != (nrows,):
+        raise ValueError(
+            f"start_indices has shape {start_indices.shape}, expected {(nrows,)}"
+        )
+    if nrows == 0:
+        return np.empty((0, nelements), dtype=array.dtype)
+    if start_indices.min() < 0 or start_indices.max() + nelements > ncols:
+        raise ValueError(f"Rows run past the {ncols} columns of array")
 
-    row, cols = array.shape
-    array.shape = -1
-    s0 = array.strides[0]
-    l_index = start_indices + cols * np.arange(len(start_indices))
-    out = np.lib.stride_tricks.as_strided(
-        array, (len(array) - nelements + 1, nelements), (s0, s0)
-    )[l_index]
-    array.shape = row, cols
-    return out
+    row_stride, col_stride = array.strides
+    windows = as_strided(
+        array,
+        shape=(nrows, ncols - nelements + 1, nelements),
+        strides=(row_stride, col_stride, col_stride),
+        writeable=False,
+    )
+    return windows[np.arange(nrows), start_indices]
 
 
 def append_zeroes_front(array: np.ndarray, nzeros: np.ndarray, nelements):
@@ -81,8 +106,75 @@ def append_zeroes_front(array: np.ndarray, nzeros: np.ndarray, nelements):
            [0, 0, 0]])
     """
     assert np.all(nzeros <= nelements), "nzeroes cannot be more than nelements"
-    new_array = np.zeros_like(array)
-    for i in range(array.shape[0]):
-        new_array[i, nzeros[i] :] = array[i, : (array.shape[1] - nzeros[i])]
+    return shift_rows(array, np.zeros_like(nzeros), nzeros, array.shape[1])
 
-    return new_array
+
+@jit(nopython=True, nogil=True)
+def _shift_rows_kernel(array, pdp_shift, pud_shift, out):
+    """
+    Every element of out is written once, either a month of array or a zero.
+    """
+    for i in range(out.shape[0]):
+        pud = pud_shift[i]
+        offset = pdp_shift[i] - pud
+        for j in range(min(pud, out.shape[1])):
+            out[i, j] = 0
+        for j in range(pud, out.shape[1]):
+            out[i, j] = array[i, offset + j]
+
+    return out
+
+
+def shift_rows(array, pdp_shift, pud_shift, nelements, out=None):
+    """
+    PDP and PUD shift of every row in a single pass.
+
+    Row i starts at column pdp_shift[i] of array and is pushed right by pud_shift[i]
+    zeroes, the same as
+    append_zeroes_front(take_per_row_strided(array, pdp_shift, nelements), pud_shift, nelements)
+    without the intermediate array.
+
+    Works on arrays of any strides, e.g. slices of the production tensor.
+    float16 is not supported by numba, a float16 out is filled through a float32 buffer.
+
+    :param array: np.ndarray (nrows, ncols)
+    :param pdp_shift: np.ndarray (nrows,)
+        Columns skipped at the start of every row.
+    :param pud_shift: np.ndarray (nrows,)
+        Zeroes added at the start of every row.
+    :param nelements: int
+        Number of columns of the result.
+    :param out: np.ndarray (nrows, nelements)
+        Array the result is written to, allocated with the dtype of array when None.
+    :return: np.ndarray (nrows, nelements)
+
+    Examples
+    --------
+    >>> array = np.tile(np.arange(1, 6), 3).reshape(3, 5)
+    >>> shift_rows(array, np.array([0, 2, 1]), np.array([0, 0, 2]), 3)
+    array([[1, 2, 3],
+           [3, 4, 5],
+           [0, 0, 2]])
+    """
+    nrows, ncols = array.shape
+    if out is None:
+        out = np.empty((nrows, nelements), dtype=array.dtype)
+    elif out.shape != (nrows, nelements):
+        raise ValueError(f"out has shape {out.shape}, expected {(nrows, nelements)}")
+
+    pdp_shift = np.asarray(pdp_shift, dtype=np.int64)
+    pud_shift = np.asarray(pud_shift, dtype=np.int64)
+    if np.any(pdp_shift < 0) or np.any(pud_shift < 0):
+        raise ValueError("Shifts cannot be negative")
+    if np.any(pdp_shift + np.maximum(nelements - pud_shift, 0) > ncols):
+        raise ValueError(f"Shifted rows run past the {ncols} columns of array")
+
+    if array.dtype == np.float16:
+        array = array.astype(np.float32)
+    if out.dtype == np.float16:
+        out[...] = _shift_rows_kernel(
+            array, pdp_shift, pud_shift, np.empty(out.shape, dtype=np.float32)
+        )
+        return out
+
+    return _shift_rows_kernel(array, pdp_shift, pud_shift, out)
@@ -1,4 +1,16 @@
+from collections import namedtuple
+
 import numpy as np
+from numba import jit
+
+from precision import compute_dtype
+
+# Per well, or per section, totals of a cash flow run. Every field is of shape
+# (..., 2, nwells), interest (WI, non WI) by well, preceded by the scenario axis of a
+# price cube. npv has a leading discount rate axis.
+CashFlow = namedtuple(
+    "CashFlow", ["npv", "net_revenue", "severance", "loe", "cash_flow"]
+)
 
 
 def allocation_acre(acreage: np.ndarray, allocation: np.ndarray):
@@ -12,13 +24,254 @@ def allocation_acre(acreage: np.ndarray, allocation: np.ndarray):
     return (1 / acreage) * allocation
 
 
-def net_production(production: np.array, acreage, allocation):
+def net_production(
+    production: np.ndarray, acreage, allocation, net_acres=None, out=None
+):
     """
+    Production of the wells attributable to the net acres held in their sections.
 
-    :param production: np.ndarray (2, nwells, nmonths)
-        3D array containing oil and gas production for nwells for nmonths
-    :param acreage: np.ndarray (1, nwells)
-    :param allocation:
-    :return:
+    :param production: np.ndarray (..., nwells, nmonths)
+        e.g. the (2, 2, nwells, nmonths) production tensor
+    :param acreage: np.ndarray (nwells,)
+        Acres of the section of every well.
+    :param allocation: np.ndarray (nwells,)
+        Allocation of every well to its section.
+    :param net_acres: np.ndarray (nwells,)
+        Net acres held in the section of every well, the production per acre when None.
+    :param out: np.ndarray of the shape of production
+    :return: np.ndarray of the shape and dtype of production
+    """
+    if production.shape[-2] != acreage.shape[0]:
+        raise ValueError(
+            f"{acreage.shape[0]} acreages for {production.shape[-2]} wells."
+        )
+    decimal = allocation_acre(acreage, allocation)
+    if net_acres is not None:
+        decimal = decimal * net_acres
+    decimal = decimal.astype(compute_dtype(production.dtype))
+    return np.multiply(
+        production, decimal[:, None], out=out, dtype=production.dtype, casting="unsafe"
+    )
+
+
+def make_interests(net_acres, acreage, allocation, royalty):
+    """
+    Net revenue and working interests of holding net_acres leased at royalty.
+
+    The decimal interest in a well is its allocation per acre of the section times the
+    net acres. Participating (WI) the interest pays its share of the LOE and gets the
+    revenue net of the royalty, not participating (non WI) it only gets the royalty.
+
+    :param net_acres: np.ndarray (nwells,)
+    :param acreage: np.ndarray (nwells,)
+    :param allocation: np.ndarray (nwells,)
+    :param royalty: np.ndarray (nwells,)
+    :return: (nri, wi)
+        np.ndarray (2, nwells) each, WI and non WI.
+
+    Examples
+    --------
+    >>> nri, wi = make_interests(
+    ...     np.array([160.0]), np.array([640.0]), np.array([0.5]), np.array([0.2])
+    ... )
+    >>> nri
+    array([[0.1  ],
+           [0.025]])
+    >>> wi
+    array([[0.125],
+           [0.   ]])
+    """
+    decimal = allocation_acre(acreage, allocation) * net_acres
+    nri = np.array([decimal * (1 - royalty), decimal * royalty])
+    wi = np.array([decimal, np.zeros_like(decimal)])
+    return nri, wi
+
+
+def discount_factors(nmonths, discount_rates=(0.1,)):
+    """
+    Mid month discount factors of annual discount_rates, month 0 is the valuation month.
+
+    :return: np.ndarray (nrates, nmonths) float64
+
+    Examples
+    --------
+    >>> discount_factors(13, [0.0, 0.1])[:, [0, 12]].round(4)
+    array([[1.    , 1.    ],
+           [0.996 , 0.9055]])
+    """
+    rates = np.asarray(discount_rates, dtype=np.float64).reshape((-1, 1))
+    months = np.arange(nmonths) + 0.5
+    return (1 + rates) ** (-months / 12)
+
+
+@jit(nopython=True, nogil=True, fastmath=True)
+def _cash_flow_kernel(
+    production, pricing, tax_rate, nri, wi, fixed, var, discount, npv, totals
+):
+    nscenarios = pricing.shape[0]
+    nrates = discount.shape[0]
+    nmonths = production.shape[3]
+
+    # Discounted prices, the NPV of a scenario is then a dot product over the months
+    discounted = np.empty((nrates, nscenarios, 2, nmonths))
+    for r in range(nrates):
+        for s in range(nscenarios):
+            for p in range(2):
+                discounted[r, s, p] = pricing[s, p] * discount[r]
+
+    # Volumes net of NRI, net of NRI and severance, and LOE of a well by month
+    volumes = np.empty((2, nmonths))
+    taxed = np.empty((2, nmonths))
+    loe = np.empty(nmonths)
+    for k in range(2):
+        for i in range(production.shape[2]):
+            for j in range(nmonths):
+                oil = production[k, 0, i, j]
+                gas = production[k, 1, i, j]
+                volumes[0, j] = nri[k, i] * oil
+                volumes[1, j] = nri[k, i] * gas
+                taxed[0, j] = volumes[0, j] * (1 - tax_rate[k, 0, i, j])
+                taxed[1, j] = volumes[1, j] * (1 - tax_rate[k, 1, i, j])
+                loe[j] = wi[k, i] * (var[0, i] * oil + var[1, i] * gas)
+                if oil > 0 or gas > 0:
+                    loe[j] += wi[k, i] * fixed[i]
+            well_loe = loe.sum()
+
+            for s in range(nscenarios):
+                net_revenue = 0.0
+                after_tax = 0.0
+                for j in range(nmonths):
+                    net_revenue += (
+                        volumes[0, j] * pricing[s, 0, j]
+                        + volumes[1, j] * pricing[s, 1, j]
+                    )
+                    after_tax += (
+                        taxed[0, j] * pricing[s, 0, j] + taxed[1, j] * pricing[s, 1, j]
+                    )
+                totals[0, s, k, i] += net_revenue
+                totals[1, s, k, i] += net_revenue - after_tax
+                totals[2, s, k, i] += well_loe
+                totals[3, s, k, i] += after_tax - well_loe
+
+                for r in range(nrates):
+                    well_npv = 0.0
+                    for j in range(nmonths):
+                        well_npv += (
+                            taxed[0, j] * discounted[r, s, 0, j]
+                            + taxed[1, j] * discounted[r, s, 1, j]
+                            - loe[j] * discount[r, j]
+                        )
+                    npv[r, s, k, i] += well_npv
+
+
+def well_cash_flow(
+    pricing,
+    tax_rate,
+    production,
+    nri,
+    wi,
+    fixed,
+    var_oil,
+    var_gas,
+    discount_rates=(0.1,),
+    chunk_size=1024,
+):
+    """
+    NPV and cash flow totals of the wells in one pass over the production tensor.
+
+    Every month of every well is priced, burdened by its NRI and severance tax,
+    charged its share of the fixed and variable LOE and discounted in a single loop,
+    only the (2, nwells) totals are written. Fixed LOE is charged for the months the
+    well produces. Totals accumulate in float64.
+
+    A price cube of nscenarios strips, see pricing.make_pricing_cube, is evaluated
+    in the same pass, the production and tax of a month are read once for all of
+    the scenarios.
+
+    numba has no float16, float16 production and tax are computed chunk_size wells
+    at a time in float32.
+
+    :param pricing: np.ndarray (2, nmonths) or (nscenarios, 2, nmonths)
+    :param tax_rate: np.ndarray (2, 2, nwells, nmonths)
+        Severance tax rate, see workflow.make_tax.
+    :param production: np.ndarray (2, 2, nwells, nmonths)
+        Interest (WI, non WI), product (oil, gas), well, month.
+    :param nri: np.ndarray (2, nwells)
+        Net revenue interest of the WI and non WI, see make_interests.
+    :param wi: np.ndarray (2, nwells)
+        Working interest bearing the LOE.
+    :param fixed: np.ndarray (nwells,)
+        Fixed LOE per producing month of the 8/8ths of the well.
+    :param var_oil: np.ndarray (nwells,)
+        LOE per bbl.
+    :param var_gas: np.ndarray (nwells,)
+        LOE per mcf.
+    :param discount_rates: sequence of float
+        Annual discount rates, 0.1 for the PV10.
+    :return: CashFlow
+        npv (nrates, 2, nwells), net_revenue, severance, loe and undiscounted
+        cash_flow (2, nwells). With a price cube npv is (nrates, nscenarios, 2, nwells)
+        and the others (nscenarios, 2, nwells).
+    """
+    nwells, nmonths = production.shape[2:]
+    if tax_rate.shape != production.shape or production.shape[:2] != (2, 2):
+        raise ValueError(
+            f"Tax rates {tax_rate.shape} for production {production.shape}."
+        )
+    if pricing.shape[-2:] != (2, nmonths) or pricing.ndim not in (2, 3):
+        raise ValueError(f"Pricing {pricing.shape} for {nmonths} months.")
+
+    scenarios = pricing.shape[:-2]
+    pricing = pricing.reshape((-1, 2, nmonths)).astype(np.float64)
+    discount = discount_factors(nmonths, discount_rates)
+    npv = np.zeros((discount.shape[0], pricing.shape[0], 2, nwells))
+    totals = np.zeros((4, pricing.shape[0], 2, nwells))
+
+    nri = np.broadcast_to(np.asarray(nri, dtype=np.float64), (2, nwells))
+    wi = np.broadcast_to(np.asarray(wi, dtype=np.float64), (2, nwells))
+    fixed = np.broadcast_to(np.asarray(fixed, dtype=np.float64), (nwells,))
+    var = np.empty((2, nwells))
+    var[0], var[1] = var_oil, var_gas
+
+    if production.dtype == np.float16 or tax_rate.dtype == np.float16:
+        chunks = [slice(s, s + chunk_size) for s in range(0, nwells, chunk_size)]
+    else:
+        chunks = [slice(0, nwells)]
+
+    for wells in chunks:
+        _cash_flow_kernel(
+            production[:, :, wells].astype(compute_dtype(production.dtype), copy=False),
+            pricing,
+            tax_rate[:, :, wells].astype(compute_dtype(tax_rate.dtype), copy=False),
+            nri[:, wells],
+            wi[:, wells],
+            fixed[wells],
+            var[:, wells],
+            discount,
+            npv[..., wells],
+            totals[..., wells],
+        )
+
+    npv = npv.reshape((discount.shape[0],) + scenarios + (2, nwells))
+    totals = totals.reshape((4,) + scenarios + (2, nwells))
+    return CashFlow(npv, *totals)
+
+
+def section_cash_flow(cash_flow: CashFlow, section_idx, nsections):
+    """
+    Rolls a well CashFlow up to the sections of the wells.
+
+    :param cash_flow: CashFlow
+        See well_cash_flow.
+    :param section_idx: np.ndarray (nwells,)
+        Section index of every well.
+    :param nsections: int
+    :return: CashFlow
+        Every field of shape (..., 2, nsections).
     """
-    assert production.shape[1] == acreage
+    sections = list()
+    for well_totals in cash_flow:
+        totals = np.zeros(well_totals.shape[:-1] + (nsections,))
+        np.add.at(totals, (Ellipsis, section_idx), well_totals)
+        sections.append(totals)
+    return CashFlow(*sections)
@@ -1,8 +1,16 @@
+from collections import namedtuple
+
 import numpy as np
 from numba import jit
 
+from precision import econ_dtype, compute_dtype
+
 _PRICERS = dict()
 
+# Month start dates (datetime64[D]) and prices of a price strip.
+# Kept as two arrays, a single array of dates and prices is an object array.
+Pricing = namedtuple("Pricing", ["dates", "prices"])
+
 
 def register_pricer(func):
     _PRICERS[func.__name__] = func
@@ -16,41 +24,79 @@ def make_pricing(strategy, *args, **kwargs):
         raise TypeError(f"{strategy} not found.")
 
 
+def make_pricing_cube(scenarios, start_date, nmonths, dtype=np.float32):
+    """
+    Oil and gas strips of every price scenario, built by the registered pricers and
+    aligned on the nmonths months from start_date.
+
+    :param scenarios: sequence of (oil, gas)
+        oil and gas are dicts of the make_pricing arguments with the strategy under
+        "strategy", e.g. dict(strategy="flat_fill", periods=600, start_date=date,
+        value=60.0). dtype is passed to every pricer.
+    :param start_date: np.datetime64
+    :param nmonths: int
+    :return: Pricing
+        dates (nmonths,) and prices (nscenarios, 2, nmonths)
+    """
+    dtype = econ_dtype(dtype)
+    start_month = np.datetime64(start_date, "M")
+    dates = np.arange(start_month, start_month + np.timedelta64(nmonths, "M"))
+    prices = np.empty((len(scenarios), 2, nmonths), dtype=dtype)
+
+    for scenario, strips in enumerate(scenarios):
+        if len(strips) != 2:
+            raise ValueError(f"Scenario {scenario} is not an oil and gas pair.")
+        for product, kwargs in enumerate(strips):
+            kwargs = dict(kwargs)
+            strategy = kwargs.pop("strategy")
+            strip = make_pricing(strategy, dtype=dtype, **kwargs)
+
+            offset = (start_month - strip.dates[0].astype("datetime64[M]")).astype(int)
+            if offset < 0 or offset + nmonths > strip.prices.shape[0]:
+                raise ValueError(
+                    f"{strategy} strip of scenario {scenario} does not cover "
+                    f"{nmonths} months from {start_month}."
+                )
+            prices[scenario, product] = strip.prices[offset : offset + nmonths]
+
+    return Pricing(dates.astype("datetime64[D]"), prices)
+
+
 @register_pricer
 def flat_fill(periods: int, start_date: np.datetime64, value: float, dtype=np.float32):
-    price_strip = np.repeat(value, periods).astype(dtype)
+    price_strip = np.full(periods, value, dtype=econ_dtype(dtype))
 
     start_date = start_date.astype("datetime64[M]")
     end_date = start_date + np.timedelta64(periods, "M")
     date_strip = np.arange(start_date, end_date).astype("datetime64[D]")
 
-    pricing = np.array([date_strip, price_strip])
-    return pricing
+    return Pricing(date_strip, price_strip)
 
 
 @register_pricer
 def forward_flat_fill(
     periods: int, date_strip: np.ndarray, price_strip: np.ndarray, dtype=np.float32
 ):
-    assert date_strip.shape == price_strip
+    assert date_strip.shape == price_strip.shape
+    price_strip = price_strip.astype(econ_dtype(dtype), copy=False)
     filler = np.repeat(price_strip[-1], periods)
-    new_price_strip = np.concatenate((price_strip, filler), axis=None).astype(dtype)
+    new_price_strip = np.concatenate((price_strip, filler), axis=None)
 
     date_strip = date_strip.astype("datetime64[M]")
     delta = date_strip[-1] + np.timedelta64(periods + 1, "M")
     new_date_strip = np.arange(date_strip[0], delta).astype("datetime64[D]")
 
-    pricing = np.array([new_date_strip, new_price_strip])
-    return pricing
+    return Pricing(new_date_strip, new_price_strip)
 
 
 @register_pricer
 def backward_flat_fill(
     periods: int, date_strip: np.ndarray, price_strip: np.ndarray, dtype=np.float32
 ):
-    assert date_strip.shape == price_strip
+    assert date_strip.shape == price_strip.shape
+    price_strip = price_strip.astype(econ_dtype(dtype), copy=False)
     filler = np.repeat(price_strip[0], periods)
-    new_price_strip = np.concatenate((filler, price_strip), axis=None).astype(dtype)
+    new_price_strip = np.concatenate((filler, price_strip), axis=None)
 
     date_strip = date_strip.astype("datetime64[M]")
     delta = date_strip[0] - np.timedelta64(periods, "M")
@@ -58,8 +104,7 @@ def backward_flat_fill(
         "datetime64[D]"
     )
 
-    pricing = np.array([new_date_strip, new_price_strip])
-    return pricing
+    return Pricing(new_date_strip, new_price_strip)
 
 
 @register_pricer
@@ -70,16 +115,19 @@ def forward_esc_fill(
     escalation_factor: float,
     dtype=np.float32,
 ):
-    assert date_strip.shape == price_strip
-    escalation_strip = np.repeat(escalation_factor, periods).astype(dtype)
-    escalation_strip = np.cumsum(escalation_strip)
+    assert date_strip.shape == price_strip.shape
+    dtype = econ_dtype(dtype)
+    escalation_strip = np.arange(1, periods + 1, dtype=compute_dtype(dtype))
+    escalation_strip *= escalation_factor
 
     date_strip = date_strip.astype("datetime64[M]")
-    filler = price_strip[-1] + np.repeat(price_strip[-1], periods) * escalation_strip
-    new_price_strip = np.concatenate((price_strip, filler), axis=None).astype(dtype)
+    last_price = price_strip[-1].astype(escalation_strip.dtype)
+    filler = last_price + last_price * escalation_strip
+    new_price_strip = np.concatenate(
+        (price_strip.astype(dtype, copy=False), filler.astype(dtype)), axis=None
+    )
 
     delta = date_strip[-1] + np.timedelta64(periods + 1, "M")
     new_date_strip = np.arange(date_strip[0], delta).astype("datetime64[D]")
 
-    pricing = np.array([new_date_strip, new_price_strip])
-    return pricing
+    return Pricing(new_date_strip, new_price_strip)
@@ -1,5 +1,7 @@
 import numpy as np
 
+from precision import econ_dtype
+
 _TAXERS = dict()
 
 
@@ -20,9 +22,7 @@ def two_tax_regime(
     periods: int, switch_period: int, t1_tax: float, t2_tax: float, dtype=np.float32
 ):
     assert switch_period < periods
-    t1_tax_strip = np.repeat(t1_tax, switch_period)
-    t2_tax_strip = np.repeat(t2_tax, periods - switch_period)
-    tax_strip = np.concatenate((t1_tax_strip, t2_tax_strip), axis=None).astype(
-        dtype=dtype
-    )
+    tax_strip = np.empty(periods, dtype=econ_dtype(dtype))
+    tax_strip[:switch_period] = t1_tax
+    tax_strip[switch_period:] = t2_tax
     return tax_strip
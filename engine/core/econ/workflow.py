@@ -1,13 +1,15 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import numpy as np
 
-from array_manipulations import (
-    accumulate_axis,
-    take_per_row_strided,
-    append_zeroes_front,
-)
-from generic_fns import time_it
-from mod_arps import np_mod_arps_fit
-from pricing import flat_fill
+from array_manipulations import accumulate_axis, shift_rows
+from calculations import CashFlow, well_cash_flow
+from decline_models import get_decline_model
+from precision import econ_dtype, compute_dtype
+from pricing import flat_fill, make_pricing_cube
 from tax import two_tax_regime
 
 
@@ -35,13 +37,174 @@ def make_pricing(oil_flat_price, gas_flat_price, nmonths, start_date, dtype):
     gas_pricing = flat_fill(
         periods=nmonths, start_date=start_date, value=gas_flat_price, dtype=dtype
     )
-    dates = oil_pricing[0]
-    pricing = np.array([oil_pricing[1], gas_pricing[1]], dtype=dtype)
+    dates = oil_pricing.dates
+    pricing = np.array([oil_pricing.prices, gas_pricing.prices], dtype=dtype)
 
     assert dates.shape[0] == pricing.shape[1]
     return dates, pricing
 
 
+def make_pricing_scenarios(
+    oil_flat_prices, gas_flat_prices, nmonths, start_date, dtype
+):
+    """
+    Flat price scenarios, the i-th oil price with the i-th gas price.
+
+    :return: (dates, np.ndarray (nscenarios, 2, nmonths))
+    """
+    scenarios = [
+        [
+            dict(
+                strategy="flat_fill", periods=nmonths, start_date=start_date, value=oil
+            ),
+            dict(
+                strategy="flat_fill", periods=nmonths, start_date=start_date, value=gas
+            ),
+        ]
+        for oil, gas in zip(oil_flat_prices, gas_flat_prices)
+    ]
+    return make_pricing_cube(scenarios, start_date, nmonths, dtype)
+
+
+def _tax_strips(
+    tax_t1, tax_t2, tax_change_month, nwells, nmonths, non_par_start_month, dtype
+):
+    """
+    WI and non WI tax strips of the wells, a broadcast view of a single strip each.
+
+    :return: (np.ndarray (nwells, nmonths), np.ndarray (nwells, nmonths))
+    """
+    tax_strip = two_tax_regime(
+        periods=nmonths,
+        switch_period=tax_change_month,
+        t1_tax=tax_t1,
+        t2_tax=tax_t2,
+        dtype=compute_dtype(dtype),
+    )
+    agg_tax_strip = tax_strip.copy()
+    agg_tax_strip[:non_par_start_month] = 0
+
+    return (
+        np.broadcast_to(tax_strip, (nwells, nmonths)),
+        np.broadcast_to(agg_tax_strip, (nwells, nmonths)),
+    )
+
+
+def _tax_tasks(
+    tax,
+    tax_t1,
+    tax_t2,
+    tax_change_month,
+    nmonths,
+    non_par_start_month,
+    pdp_shift,
+    pud_shift,
+    chunk_size,
+):
+    """
+    Tasks shifting the WI and non WI tax of every chunk of wells, the gas tax is a
+    copy of the oil tax.
+
+    :param tax: np.ndarray (2, 2, nwells, given_nmonths)
+    :return: list of callables
+    """
+    nwells, given_nmonths = tax.shape[2:]
+    pdp_shift, pud_shift = np.asarray(pdp_shift), np.asarray(pud_shift)
+    well_taxes = _tax_strips(
+        tax_t1,
+        tax_t2,
+        tax_change_month,
+        nwells,
+        nmonths,
+        non_par_start_month,
+        tax.dtype,
+    )
+
+    def shift_tax(interest, wells):
+        shift_rows(
+            well_taxes[interest][wells],
+            pdp_shift[wells],
+            pud_shift[wells],
+            given_nmonths,
+            out=tax[interest, 0, wells],
+        )
+        tax[interest, 1, wells] = tax[interest, 0, wells]
+
+    return [
+        partial(shift_tax, interest, wells)
+        for wells in iter_well_chunks(nwells, chunk_size)
+        for interest in range(2)
+    ]
+
+
+def _production_tasks(
+    production,
+    oil_dca_pars,
+    gas_dca_pars,
+    nmonths,
+    non_par_start_month,
+    pdp_shift,
+    pud_shift,
+    chunk_size,
+    forecast_cache,
+    model,
+):
+    """
+    Tasks forecasting and shifting every product of every chunk of wells.
+
+    Without a cache the forecasts use the numba forecast of the model. The forecast
+    cache is not thread safe, it is used by a single task at a time.
+
+    :param production: np.ndarray (2, 2, nwells, given_nmonths)
+    :return: list of callables
+    """
+    nwells = production.shape[2]
+    pdp_shift, pud_shift = np.asarray(pdp_shift), np.asarray(pud_shift)
+    forecast = get_decline_model(model).nb_forecast
+    cache_lock = threading.Lock()
+
+    def forecast_production(product, wells):
+        dca_pars = [oil_dca_pars, gas_dca_pars][product][:, wells]
+        if forecast_cache is None:
+            prod = forecast(nmonths, dca_pars.astype(compute_dtype(production.dtype)))
+        else:
+            # Wells already forecasted by an earlier run are not forecasted again
+            with cache_lock:
+                prod = forecast_cache.forecast(
+                    model, dca_pars, nmonths, production.dtype
+                )
+        # (nwells * nmonths)
+
+        _shift_production(
+            prod,
+            non_par_start_month,
+            pdp_shift[wells],
+            pud_shift[wells],
+            production[:, product, wells],
+        )
+
+    return [
+        partial(forecast_production, product, wells)
+        for wells in iter_well_chunks(nwells, chunk_size)
+        for product in range(2)
+    ]
+
+
+def _run_tasks(tasks, workers):
+    """
+    Runs the tasks in order when workers is 1, on a pool of threads otherwise.
+    """
+    if workers == 1:
+        for task in tasks:
+            task()
+        return
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        for future in futures:
+            future.result()
+
+
 def make_tax(
     tax_t1,
     tax_t2,
@@ -54,51 +217,46 @@ def make_tax(
     pud_shift,
     dtype=np.float32,
 ):
-    oil_tax = np.tile(
-        two_tax_regime(
-            periods=nmonths,
-            switch_period=tax_change_month,
-            t1_tax=tax_t1,
-            t2_tax=tax_t2,
-            dtype=dtype,
-        ),
-        (nwells, 1),
-    )
-    gas_tax = np.tile(
-        two_tax_regime(
-            periods=nmonths,
-            switch_period=tax_change_month,
-            t1_tax=tax_t1,
-            t2_tax=tax_t2,
-            dtype=dtype,
-        ),
-        (nwells, 1),
-    )
-
-    assert nmonths >= given_nmonths
-    oil_agg_tax = oil_tax.copy()
-    gas_agg_tax = gas_tax.copy()
-    oil_agg_tax[:, :non_par_start_month] = 0
-    gas_agg_tax[:, :non_par_start_month] = 0
+    """
+    Participating and non participating tax rates of the wells, shifted for PDP and PUD.
 
-    oil_par_tax = take_per_row_strided(oil_tax, pdp_shift, given_nmonths)
-    gas_par_tax = take_per_row_strided(gas_tax, pdp_shift, given_nmonths)
+    The tax strip is the same for every well, the wells are a broadcast view of it
+    shifted straight into the tax tensor. Oil and gas share the tax regime, the
+    strips are shifted once and copied to gas.
 
-    oil_non_par_tax = take_per_row_strided(oil_agg_tax, pdp_shift, given_nmonths)
-    gas_non_par_tax = take_per_row_strided(gas_agg_tax, pdp_shift, given_nmonths)
+    :return: np.ndarray (2, 2, nwells, given_nmonths) of dtype
+    """
+    assert nmonths >= given_nmonths
+    tax = np.empty((2, 2, nwells, given_nmonths), dtype=econ_dtype(dtype))
+    tasks = _tax_tasks(
+        tax,
+        tax_t1,
+        tax_t2,
+        tax_change_month,
+        nmonths,
+        non_par_start_month,
+        pdp_shift,
+        pud_shift,
+        max(nwells, 1),
+    )
+    _run_tasks(tasks, workers=1)
+    return tax
 
-    oil_par_tax = append_zeroes_front(oil_par_tax, pud_shift, given_nmonths)
-    gas_par_tax = append_zeroes_front(gas_par_tax, pud_shift, given_nmonths)
 
-    oil_non_par_tax = append_zeroes_front(oil_non_par_tax, pud_shift, given_nmonths)
-    gas_non_par_tax = append_zeroes_front(gas_non_par_tax, pud_shift, given_nmonths)
+def _shift_production(prod, non_par_start_month, pdp_shift, pud_shift, out):
+    """
+    Shifts the forecast of one product into its WI and non WI production.
 
-    tax = np.array(
-        [[oil_par_tax, gas_par_tax], [oil_non_par_tax, gas_non_par_tax]], dtype=dtype
-    )
+    :param prod: np.ndarray (nwells, nmonths)
+        Forecast, overwritten by the non WI production.
+    :param out: np.ndarray (2, nwells, given_nmonths)
+    """
+    given_nmonths = out.shape[-1]
+    shift_rows(prod, pdp_shift, pud_shift, given_nmonths, out=out[0])
 
-    assert tax.shape == (2, 2, nwells, given_nmonths)
-    return tax
+    # Non WI do not get paid for the first n months
+    accumulate_axis(prod, 0, non_par_start_month, out=prod)
+    shift_rows(prod, pdp_shift, pud_shift, given_nmonths, out=out[1])
 
 
 def make_production(
@@ -110,68 +268,332 @@ def make_production(
     pdp_shift,
     pud_shift,
     dtype=np.float32,
+    forecast_cache=None,
+    model="mod_arps",
 ):
+    """
+    Participating and non participating production of the wells, shifted for PDP and PUD.
 
-    assert nmonths >= given_nmonths
-    oil_prod = np_mod_arps_fit(mprod=nmonths, pars=oil_dca_pars)  # (nwells * nmonths)
-    gas_prod = np_mod_arps_fit(mprod=nmonths, pars=gas_dca_pars)  # (nwells * nmonths)
-
-    # Non WI do not get paid for the first n months
-    oil_agg_prod = accumulate_axis(
-        oil_prod, 0, non_par_start_month
-    )  # (nwells * nmonths)
-    gas_agg_prod = accumulate_axis(
-        gas_prod, 0, non_par_start_month
-    )  # (nwells * nmonths)
+    The model is the decline model the DCA parameters were fitted with. mod_arps
+    forecasts the rate at the start of every month, mod_arps_volume forecasts
+    the monthly volumes, the difference of the cumulative production.
 
-    # Shifting Production
-    # Based on wells being PDP or PUD the production shifted.
+    The forecast runs in the compute dtype of dtype, see precision.
 
-    # PDP
-    oil_par_prod = take_per_row_strided(oil_prod, pdp_shift, given_nmonths)
-    gas_par_prod = take_per_row_strided(gas_prod, pdp_shift, given_nmonths)
+    :return: np.ndarray (2, 2, nwells, given_nmonths) of dtype
+    """
+    assert nmonths >= given_nmonths
+    nwells = oil_dca_pars.shape[1]
 
-    oil_non_par_prod = take_per_row_strided(oil_agg_prod, pdp_shift, given_nmonths)
-    gas_non_par_prod = take_per_row_strided(gas_agg_prod, pdp_shift, given_nmonths)
+    # Based on wells being PDP or PUD the production is shifted straight into
+    # the production tensor, PDP by skipping months and PUD by adding zeroes.
+    production = np.empty((2, 2, nwells, given_nmonths), dtype=econ_dtype(dtype))
+    tasks = _production_tasks(
+        production,
+        oil_dca_pars,
+        gas_dca_pars,
+        nmonths,
+        non_par_start_month,
+        pdp_shift,
+        pud_shift,
+        max(nwells, 1),
+        forecast_cache,
+        model,
+    )
+    _run_tasks(tasks, workers=1)
+    return production
 
-    # PUD
-    oil_par_prod = append_zeroes_front(oil_par_prod, pud_shift, given_nmonths)
-    gas_par_prod = append_zeroes_front(gas_par_prod, pud_shift, given_nmonths)
 
-    oil_non_par_prod = append_zeroes_front(oil_non_par_prod, pud_shift, given_nmonths)
-    gas_non_par_prod = append_zeroes_front(gas_non_par_prod, pud_shift, given_nmonths)
+def build_econ_tensors(
+    oil_dca_pars,
+    gas_dca_pars,
+    tax_t1,
+    tax_t2,
+    tax_change_month,
+    nmonths,
+    given_nmonths,
+    non_par_start_month,
+    pdp_shift,
+    pud_shift,
+    dtype=np.float32,
+    model="mod_arps",
+    workers=None,
+    chunk_size=5000,
+    forecast_cache=None,
+):
+    """
+    make_tax and make_production on a pool of threads.
+
+    Every task shifts the tax of an interest, or forecasts and shifts a product,
+    for a chunk of wells straight into the preallocated tensors, the same tasks
+    make_tax and make_production run in order. shift_rows and the numba forecasts
+    release the GIL.
+
+    :param workers: int
+        Number of threads, the number of cores when None.
+    :param chunk_size: int
+        Number of wells of a task.
+    :param forecast_cache: ForecastCache
+        See make_production.
+    :return: (tax, production)
+        See make_tax and make_production.
+    """
+    assert nmonths >= given_nmonths
+    dtype = econ_dtype(dtype)
+    nwells = oil_dca_pars.shape[1]
+    tax = np.empty((2, 2, nwells, given_nmonths), dtype=dtype)
+    production = np.empty((2, 2, nwells, given_nmonths), dtype=dtype)
 
-    production = np.array(
-        [[oil_par_prod, gas_par_prod], [oil_non_par_prod, gas_non_par_prod]],
-        dtype=dtype,
+    tasks = _tax_tasks(
+        tax,
+        tax_t1,
+        tax_t2,
+        tax_change_month,
+        nmonths,
+        non_par_start_month,
+        pdp_shift,
+        pud_shift,
+        chunk_size,
+    ) + _production_tasks(
+        production,
+        oil_dca_pars,
+        gas_dca_pars,
+        nmonths,
+        non_par_start_month,
+        pdp_shift,
+        pud_shift,
+        chunk_size,
+        forecast_cache,
+        model,
     )
-    assert production.shape == (2, 2, oil_prod.shape[0], given_nmonths)
+    _run_tasks(tasks, workers)
 
-    return production
+    return tax, production
 
 
 def well_econ(pricing, tax_rate, production):
+    """
+    Revenue, tax and profit of the wells.
+
+    Nothing is upcast, pricing and tax_rate are used in the dtype of the production
+    and the money is in its compute dtype, see precision.
+
+    :param pricing: np.ndarray (2, given_nmonths)
+    :param tax_rate: np.ndarray (2, 2, nwells, given_nmonths)
+    :param production: np.ndarray (2, 2, nwells, given_nmonths)
+    :return: (pricing, production, tax, revenue, profit_without_expense)
+    """
     assert pricing.shape[-1] == tax_rate.shape[-1] == production.shape[-1]
 
-    nwells = production.shape[-2]
     nmonths = production.shape[-1]
+    money_dtype = compute_dtype(production.dtype)
+    pricing = pricing.astype(production.dtype, copy=False)
 
     # Revenue
-    pricing.resize((2, 1, nmonths))
-    revenue = production * pricing
+    revenue = np.multiply(
+        production, pricing.reshape((2, 1, nmonths)), dtype=money_dtype
+    )
 
     # Tax
-    tax = revenue * tax_rate
+    tax = np.multiply(revenue, tax_rate, dtype=money_dtype)
 
     # Profit
-    profit_without_expense = revenue - tax
+    profit_without_expense = np.subtract(revenue, tax)
 
-    pricing.resize((2, nmonths))
-    assert tax.shape == revenue.shape == profit_without_expense
+    assert tax.shape == revenue.shape == profit_without_expense.shape
     return pricing, production, tax, revenue, profit_without_expense
 
 
-def sample_workflow(nwells=1000, nmonths=600, dtype=np.float32):
+def iter_well_chunks(nwells, chunk_size):
+    """
+    Slices of at most chunk_size wells covering nwells.
+
+    Examples
+    --------
+    >>> list(iter_well_chunks(5, 2))
+    [slice(0, 2, None), slice(2, 4, None), slice(4, 5, None)]
+    """
+    for start in range(0, nwells, chunk_size):
+        yield slice(start, min(start + chunk_size, nwells))
+
+
+def stream_production(
+    oil_dca_pars,
+    gas_dca_pars,
+    nmonths,
+    given_nmonths,
+    non_par_start_month,
+    pdp_shift,
+    pud_shift,
+    chunk_size=1000,
+    dtype=np.float32,
+    forecast_cache=None,
+    model="mod_arps",
+):
+    """
+    make_production one chunk of wells at a time.
+
+    :return: generator of (slice, np.ndarray (2, 2, chunk_size, given_nmonths))
+        wells of the chunk and their production
+    """
+    for wells in iter_well_chunks(oil_dca_pars.shape[1], chunk_size):
+        production = make_production(
+            oil_dca_pars[:, wells],
+            gas_dca_pars[:, wells],
+            nmonths,
+            given_nmonths,
+            non_par_start_month,
+            pdp_shift[wells],
+            pud_shift[wells],
+            dtype,
+            forecast_cache,
+            model,
+        )
+        yield wells, production
+
+
+def stream_well_econ(
+    production_stream,
+    pricing,
+    tax_t1,
+    tax_t2,
+    tax_change_month,
+    nmonths,
+    given_nmonths,
+    non_par_start_month,
+    pdp_shift,
+    pud_shift,
+    dtype=np.float32,
+):
+    """
+    Taxes and revenue of every chunk of a production stream.
+
+    :param production_stream: generator
+        See stream_production.
+    :return: generator of (slice, production, tax, revenue, profit_without_expense)
+        every array of shape (2, 2, chunk_size, given_nmonths)
+    """
+    for wells, production in production_stream:
+        tax_rate = make_tax(
+            tax_t1,
+            tax_t2,
+            tax_change_month,
+            production.shape[2],
+            nmonths,
+            given_nmonths,
+            non_par_start_month,
+            pdp_shift[wells],
+            pud_shift[wells],
+            dtype,
+        )
+        _, _, tax, revenue, profit_without_expense = well_econ(
+            pricing, tax_rate, production
+        )
+        yield wells, production, tax, revenue, profit_without_expense
+
+
+def accumulate_well_econ(econ_stream, given_nmonths, section_idx=None, nsections=0):
+    """
+    Running totals of an econ stream, only the totals are kept in memory.
+
+    :param econ_stream: generator
+        See stream_well_econ.
+    :param given_nmonths: int
+    :param section_idx: np.ndarray (nwells,)
+        Section index of every well, no section totals when None.
+    :param nsections: int
+    :return: (dict, dict)
+        production, tax, revenue and profit_without_expense totals
+        per month (2, 2, given_nmonths) and per section (nsections, 2, 2)
+    """
+    names = ["production", "tax", "revenue", "profit_without_expense"]
+    monthly = dict((name, np.zeros((2, 2, given_nmonths))) for name in names)
+    sections = dict((name, np.zeros((nsections, 2, 2))) for name in names)
+
+    for wells, *arrays in econ_stream:
+        for name, array in zip(names, arrays):
+            monthly[name] += np.sum(array, axis=2, dtype=np.float64)
+            if section_idx is not None:
+                well_totals = np.sum(array, axis=3, dtype=np.float64)
+                np.add.at(
+                    sections[name], section_idx[wells], well_totals.transpose(2, 0, 1)
+                )
+
+    return monthly, sections
+
+
+def stream_cash_flow(
+    production_stream,
+    pricing,
+    tax_t1,
+    tax_t2,
+    tax_change_month,
+    nmonths,
+    given_nmonths,
+    non_par_start_month,
+    pdp_shift,
+    pud_shift,
+    nri,
+    wi,
+    fixed,
+    var_oil,
+    var_gas,
+    discount_rates=(0.1,),
+    dtype=np.float32,
+):
+    """
+    well_cash_flow of every chunk of a production stream.
+
+    Only the tax tensor of the chunk is built next to its production, revenue, tax
+    and LOE are never held per month. Every scenario of a price cube is evaluated
+    on the same forecasts and shifts.
+
+    :param production_stream: generator
+        See stream_production.
+    :param pricing: np.ndarray (2, given_nmonths) or (nscenarios, 2, given_nmonths)
+    :param nri: np.ndarray (2, nwells)
+    :param wi: np.ndarray (2, nwells)
+        See calculations.make_interests.
+    :return: CashFlow
+        Per well, see calculations.well_cash_flow.
+    """
+    nwells = nri.shape[1]
+    shape = pricing.shape[:-2] + (2, nwells)
+    cash_flow = CashFlow(
+        np.zeros((len(discount_rates),) + shape), *[np.zeros(shape) for _ in range(4)]
+    )
+
+    for wells, production in production_stream:
+        tax_rate = make_tax(
+            tax_t1,
+            tax_t2,
+            tax_change_month,
+            production.shape[2],
+            nmonths,
+            given_nmonths,
+            non_par_start_month,
+            pdp_shift[wells],
+            pud_shift[wells],
+            dtype,
+        )
+        chunk = well_cash_flow(
+            pricing,
+            tax_rate,
+            production,
+            nri[:, wells],
+            wi[:, wells],
+            fixed[wells],
+            var_oil[wells],
+            var_gas[wells],
+            discount_rates,
+        )
+        for totals, chunk_totals in zip(cash_flow, chunk):
+            totals[..., wells] = chunk_totals
+
+    return cash_flow
+
+
+def sample_workflow(nwells=1000, nmonths=600, dtype=np.float32, workers=None):
 
     # Shift months indicate the month at which the production should be shifted to.
     # The value is relative to the current financial effective date.
@@ -196,29 +618,61 @@ def sample_workflow(nwells=1000, nmonths=600, dtype=np.float32):
     pdp_shift = np.where(shift_months < 0, -shift_months, 0)
     pud_shift = np.where(shift_months > 0, shift_months, 0)
 
-    # Tax
+    # Tax and production
     tax_t1 = 0.05
     tax_t2 = 0.036
     tax_change_month = 18
 
-    tax_rate = make_tax(
+    oil_dca_pars = make_dca_pars(nwells, compute_dtype(dtype))
+    gas_dca_pars = make_dca_pars(nwells, compute_dtype(dtype))
+
+    tax_rate, production = build_econ_tensors(
+        oil_dca_pars,
+        gas_dca_pars,
         tax_t1,
         tax_t2,
         tax_change_month,
-        nwells,
         nmonths,
         given_nmonths,
         non_par_start_month,
         pdp_shift,
         pud_shift,
         dtype,
+        workers=workers,
     )
 
-    # Production
-    oil_dca_pars = make_dca_pars(nwells, dtype)
-    gas_dca_pars = make_dca_pars(nwells, dtype)
+    assert dates.shape[0] == pricing.shape[1] == given_nmonths
+    assert tax_rate.shape == production.shape == (2, 2, nwells, given_nmonths)
+
+    pricing, production, tax, revenue, profit_without_expense = well_econ(
+        pricing, tax_rate, production
+    )
+
+    print("me")
+
+
+def sample_stream_workflow(
+    nwells=100000, nmonths=600, nsections=1000, chunk_size=1000, dtype=np.float32
+):
+    """
+    sample_workflow streamed in chunks of wells, the memory does not grow with nwells.
+    """
+    shift_months = np.random.randint(low=-60, high=60, size=nwells)
+    given_nmonths = nmonths
+    nmonths = int(np.abs(np.min(shift_months)) + nmonths)
+
+    start_date = np.datetime64("2019-06-01").astype("datetime64[D]")
+    dates, pricing = make_pricing(60.0, 2.5, given_nmonths, start_date, dtype)
+
+    non_par_start_month = 6
+    pdp_shift = np.where(shift_months < 0, -shift_months, 0)
+    pud_shift = np.where(shift_months > 0, shift_months, 0)
+
+    oil_dca_pars = make_dca_pars(nwells, compute_dtype(dtype))
+    gas_dca_pars = make_dca_pars(nwells, compute_dtype(dtype))
+    section_idx = np.random.randint(low=0, high=nsections, size=nwells)
 
-    production = make_production(
+    production_stream = stream_production(
         oil_dca_pars,
         gas_dca_pars,
         nmonths,
@@ -226,17 +680,23 @@ def sample_workflow(nwells=1000, nmonths=600, dtype=np.float32):
         non_par_start_month,
         pdp_shift,
         pud_shift,
+        chunk_size,
         dtype,
     )
-
-    assert dates.shape[0] == pricing.shape[1] == given_nmonths
-    assert tax_rate.shape == production.shape == (2, 2, nwells, given_nmonths)
-
-    pricing, tax, revenue, profit_without_expense = well_econ(
-        pricing, tax_rate, production
+    econ_stream = stream_well_econ(
+        production_stream,
+        pricing,
+        0.05,
+        0.036,
+        18,
+        nmonths,
+        given_nmonths,
+        non_par_start_month,
+        pdp_shift,
+        pud_shift,
+        dtype,
     )
-
-    print("me")
+    return accumulate_well_econ(econ_stream, given_nmonths, section_idx, nsections)
 
 
 # sample_workflow(nwells=100, nmonths=600)
@@ -1,13 +1,82 @@
 import numpy as np
-import datetime
 
-from numba import jit
+from numba import jit, prange
+
+# tolerance, spud_to_rig_release, frac_to_sales, permit_to_spud, idorder_to_spud,
+# idapp_to_spud, days_ntg_f1_pd, days_ntg_f2_pd
+TIMING_DAYS = (45, 20, 45, 180, 365, 545, 365 * 3, 365 * 6)
+
+# Date of the spud and sales dates that do not apply
+PLACEHOLDER_DATE = np.datetime64("1900-01-01", "D")
+
+TIMING_FIELDS = (
+    "nwells_curr",
+    "nwells_fut",
+    "spud_date_curr",
+    "sales_date_curr",
+    "spud_date_fut",
+    "sales_date_fut",
+    "nwells_curr_2",
+    "nwells_fut_2",
+    "spud_date_curr_2",
+    "sales_date_curr_2",
+    "spud_date_fut_2",
+    "sales_date_fut_2",
+)
+
+# Rows of well_numbers and well_dates, see timing_core
+WELL_NUMBER_FIELDS = (
+    "nwells_1",
+    "tolerance_1",
+    "nwells_2",
+    "tolerance_2",
+    "f1001_nwells",
+    "f1000_nwells",
+    "app_nwells",
+    "order_nwells",
+    "f1002a_nwells_f1",
+    "f1002a_nwells_f2",
+)
+WELL_DATE_FIELDS = (
+    "f1001_last_date",
+    "f1001_first_date",
+    "f1000_last_date",
+    "f1000_first_date",
+    "app_date",
+    "order_date",
+    "f1002a_last_date_f1",
+    "f1002a_last_date_f2",
+)
+
+_TIMING_METHODS = dict()
+
+
+def register_timing_method(func):
+    _TIMING_METHODS[func.__name__] = func
+    return func
+
+
+def timing_dtype(count_dtype=np.uint8) -> np.dtype:
+    """
+    Structured dtype of a timing result, the well counts are of count_dtype.
+
+    Examples
+    --------
+    >>> timing_dtype()["spud_date_curr"]
+    dtype('<M8[D]')
+    """
+    return np.dtype(
+        [
+            (name, count_dtype if name.startswith("nwells") else "M8[D]")
+            for name in TIMING_FIELDS
+        ]
+    )
 
 
-def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
+def timing_core(well_numbers, well_dates, timing_dates, valuation_date, ph_date):
     """
     The inputs should have the columns in the exact same order
-    :param well_numbers: np.array (9, nsections)
+    :param well_numbers: np.array (10, nsections)
         well_numbers = [
         "nwells_1", 0
         "tolerance_1", 1
@@ -19,7 +88,7 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
         "order_nwells", 7
         "f1002a_nwells_f1", 8
         "f1002a_nwells_f2", 9]
-    :param well_dates: np.array (7, nsections)
+    :param well_dates: np.array (8, nsections)
         well_dates = [
             "f1001_last_date", 0
             "f1001_first_date", 1
@@ -30,7 +99,7 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
             "f1002a_last_date_f1", 6
             "f1002a_last_date_f2", 7
         ]
-    :param timing_dates: np.array (7, 1)
+    :param timing_dates: np.array (8,)
         timing_dates = [
             tolerance, 0
             spud_to_rig_release, 1
@@ -41,30 +110,17 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
             days_ntg_f1_pd, 6
             days_ntg_f2_pd, 7
         ]
-    :param current_dates: np.array (nsections, 1)
-        current date repeated along the number of sections
-    :param ph_date: np.array (nsections, 1)
+    :param valuation_date: np.datetime64
+        Date the future wells are scheduled from.
+    :param ph_date: np.array (nsections,)
         placeholder date repeated along the number of sections
-    :return:
-        ["nwells_curr",
-        "nwells_fut",
-        "spud_date_curr",
-        "sales_date_curr",
-        "spud_date_fut",
-        "sales_date_fut",
-        "nwells_curr_2",
-        "nwells_fut_2",
-        "spud_date_curr_2",
-        "sales_date_fut_2",
-        "spud_date_fut_2",
-        "sales_date_fut_2"]
+    :return: tuple of np.array (nsections,) in the order of TIMING_FIELDS
     """
     nsections = well_numbers.shape[1]
 
     # Primary zone array initialization
     nwells_curr = np.zeros(shape=nsections, dtype=well_numbers.dtype)
     nwells_fut = np.zeros(shape=nsections, dtype=well_numbers.dtype)
-    formation = np.uint8(1) + np.zeros(shape=nsections, dtype=well_numbers.dtype)
 
     spud_date_curr = ph_date.copy()
     sales_date_curr = ph_date.copy()
@@ -75,7 +131,6 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
     # Secondary zone array initialization
     nwells_curr_2 = np.zeros(shape=nsections, dtype=well_numbers.dtype)
     nwells_fut_2 = np.zeros(shape=nsections, dtype=well_numbers.dtype)
-    formation_2 = np.uint8(2) + np.zeros(shape=nsections, dtype=well_numbers.dtype)
 
     spud_date_curr_2 = ph_date.copy()
     sales_date_curr_2 = ph_date.copy()
@@ -103,8 +158,6 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
     f1000_first_date = well_dates[3]
     app_date = well_dates[4]
     order_date = well_dates[5]
-    f1002a_last_date_f1 = well_dates[6]
-    f1002a_last_date_f2 = well_dates[7]
 
     # timing_dates
     tolerance = timing_dates[0]
@@ -116,7 +169,9 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
     days_ntg_f1_pd = timing_dates[6]
     days_ntg_f2_pd = timing_dates[7]
 
-    for i in range(nsections):
+    # Sections are independent, prange runs them in parallel when compiled with
+    # parallel=True and is a plain range otherwise.
+    for i in prange(nsections):
 
         # Primary Formation Calculation
         # Number of current wells is first calculated and then spud_date current based on that
@@ -174,22 +229,25 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
             )
 
         # If current wells and PDP wells are less than tolerance 1 then assign the difference as future wells.
+        # The counts are unsigned, no future wells when more are current than planned.
         if nwells_curr[i] + f1002a_nwells_f1[i] <= tolerance_1[i]:
-            nwells_fut[i] = nwells_1[i] - nwells_curr[i]
+            if nwells_1[i] > nwells_curr[i]:
+                nwells_fut[i] = nwells_1[i] - nwells_curr[i]
 
-        # If future wells exist then spud date for future wells is current date + days ntg f1 prod.
+        # If future wells exist then spud date for future wells is valuation date + days ntg f1 prod.
         if nwells_fut[i] > 0:
-            spud_date_fut[i] = current_dates[0] + days_ntg_f1_pd
+            spud_date_fut[i] = valuation_date + days_ntg_f1_pd
             sales_date_fut[i] = (
                 spud_date_fut[i] + (nwells_fut[i] * spud_to_rig_release) + frac_to_sales
             )
 
         # Secondary Formation Calculation
         if f1002a_nwells_f2[i] >= tolerance_2[i]:
-            nwells_fut_2[i] = np.uint8(0)
+            nwells_fut_2[i] = 0
         else:
-            nwells_fut_2[i] = nwells_2[i] - f1002a_nwells_f2[i]
-            spud_date_fut_2[i] = current_dates[0] + days_ntg_f2_pd
+            if nwells_2[i] > f1002a_nwells_f2[i]:
+                nwells_fut_2[i] = nwells_2[i] - f1002a_nwells_f2[i]
+            spud_date_fut_2[i] = valuation_date + days_ntg_f2_pd
             sales_date_fut_2[i] = (
                 spud_date_fut_2[i]
                 + (nwells_fut_2[i] * spud_to_rig_release)
@@ -206,7 +264,7 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
         nwells_curr_2,
         nwells_fut_2,
         spud_date_curr_2,
-        sales_date_fut_2,
+        sales_date_curr_2,
         spud_date_fut_2,
         sales_date_fut_2,
     )
@@ -214,80 +272,271 @@ def timing_core(well_numbers, well_dates, timing_dates, current_dates, ph_date):
 
 nb_timing_core = jit(timing_core, nopython=True, fastmath=True, error_model="numpy")
 
+nb_timing_core_parallel = jit(
+    timing_core, nopython=True, parallel=True, fastmath=True, error_model="numpy"
+)
+
 
-def timing(well_numbers, well_dates, timing_dates=None):
+@register_timing_method
+def serial(well_numbers, well_dates, timing_dates, valuation_date):
     """
-    For every section
-        For primary and secondary formation
-            For current and future wells
-                Number of Wells, Spud Date, Sales Date
+    nb_timing_core, a numba loop over the sections.
+    """
+    ph_date = np.full(well_numbers.shape[1], PLACEHOLDER_DATE)
+    return nb_timing_core(
+        well_numbers, well_dates, timing_dates, valuation_date, ph_date
+    )
 
-     The inputs should have the columns in the exact same order
-    :param well_numbers: np.array (9, nsections)
-        well_numbers = [
-        "nwells_1", 0
-        "tolerance_1", 1
-        "nwells_2", 2
-        "tolerance_2", 3
-        "f1001_nwells", 4
-        "f1000_nwells", 5
-        "app_nwells", 6
-        "order_nwells", 7
-        "f1002a_nwells_f1", 8
-        "f1002a_nwells_f2", 9]
-    :param well_dates: np.array (7, nsections)
-        well_dates = [
-            "f1001_last_date", 0
-            "f1001_first_date", 1
-            "f1000_last_date", 2
-            "f1000_first_date", 3
-            "app_date", 4
-            "order_date", 5
-            "f1002a_last_date_f1", 6
-            "f1002a_last_date_f2", 7
-        ]
-    :param timing_dates: np.array (7, 1)
-        timing_dates = [
-            tolerance, 0
-            spud_to_rig_release, 1
-            frac_to_sales, 2
-            permit_to_spud, 3
-            idorder_to_spud, 4
-            idapp_to_spud, 5
-            days_ntg_f1_pd, 6
-            days_ntg_f2_pd, 7
-        ]
-    :return:
-        ["nwells_curr",
-        "nwells_fut",
-        "spud_date_curr",
-        "sales_date_curr",
-        "spud_date_fut",
-        "sales_date_fut",
-        "nwells_curr_2",
-        "nwells_fut_2",
-        "spud_date_curr_2",
-        "sales_date_fut_2",
-        "spud_date_fut_2",
-        "sales_date_fut_2"]
+
+@register_timing_method
+def parallel(well_numbers, well_dates, timing_dates, valuation_date):
     """
-    # tolerance, spud_to_rig_release, frac_to_sales, permit_to_spud, idorder_to_spud,
-    # idapp_to_spud, days_ntg_f1_pd, days_ntg_f2_pd
+    nb_timing_core_parallel, the sections are spread over the numba threads.
+    """
+    ph_date = np.full(well_numbers.shape[1], PLACEHOLDER_DATE)
+    return nb_timing_core_parallel(
+        well_numbers, well_dates, timing_dates, valuation_date, ph_date
+    )
+
 
-    if timing_dates is None:
-        timing_dates = (45, 20, 45, 180, 365, 545, 365 * 3, 365 * 6)
+@register_timing_method
+def select(well_numbers, well_dates, timing_dates, valuation_date):
+    """
+    timing_core as whole array np.select and np.where calls, no loop over sections.
+    """
+    nwells_1, tolerance_1, nwells_2, tolerance_2 = well_numbers[:4]
+    f1001_nwells, f1000_nwells, app_nwells, order_nwells = well_numbers[4:8]
+    f1002a_nwells_f1, f1002a_nwells_f2 = well_numbers[8:10]
+    f1001_last_date, f1001_first_date = well_dates[:2]
+    f1000_last_date, f1000_first_date = well_dates[2:4]
+    app_date, order_date = well_dates[4:6]
+    (
+        tolerance,
+        spud_to_rig_release,
+        frac_to_sales,
+        permit_to_spud,
+        idorder_to_spud,
+        idapp_to_spud,
+        days_ntg_f1_pd,
+        days_ntg_f2_pd,
+    ) = timing_dates
+    zero = well_numbers.dtype.type(0)
+
+    # f1001 > f1000 > id order > id app
+    is_f1001 = f1001_nwells > 0
+    is_f1000 = f1000_nwells > 0
+    is_order = order_nwells > 0
+    is_app = app_nwells > 0
+    nwells_curr = np.select(
+        [
+            is_f1001 & is_f1000 & (f1001_last_date > f1000_last_date + tolerance),
+            is_f1001 & is_f1000,
+            is_f1001,
+            is_f1000 & is_order & (f1000_last_date > order_date + tolerance),
+            is_f1000 & is_order,
+            is_f1000,
+            is_order,
+            is_app,
+        ],
+        [
+            f1001_nwells,
+            f1000_nwells,
+            f1001_nwells,
+            f1000_nwells,
+            order_nwells,
+            f1000_nwells,
+            order_nwells,
+            app_nwells,
+        ],
+        zero,
+    )
+    spud_date_curr = np.select(
+        [
+            is_f1001 & ~np.isnat(f1001_first_date),
+            is_f1000 & ~np.isnat(f1000_first_date),
+            is_order & ~np.isnat(order_date),
+            is_app & ~np.isnat(app_date),
+        ],
+        [
+            f1001_first_date,
+            f1000_first_date + permit_to_spud,
+            order_date + idorder_to_spud,
+            app_date + idapp_to_spud,
+        ],
+        PLACEHOLDER_DATE,
+    )
+    sales_date_curr = np.where(
+        nwells_curr > 0,
+        spud_date_curr + nwells_curr * spud_to_rig_release + frac_to_sales,
+        PLACEHOLDER_DATE,
+    )
 
-    timing_dates = np.array([np.timedelta64(date, "D") for date in timing_dates])
+    # Primary future wells
+    nwells_fut = np.where(
+        (nwells_curr + f1002a_nwells_f1 <= tolerance_1) & (nwells_1 > nwells_curr),
+        nwells_1 - nwells_curr,
+        zero,
+    )
+    has_fut = nwells_fut > 0
+    spud_date_fut = np.where(has_fut, valuation_date + days_ntg_f1_pd, PLACEHOLDER_DATE)
+    sales_date_fut = np.where(
+        has_fut,
+        spud_date_fut + nwells_fut * spud_to_rig_release + frac_to_sales,
+        PLACEHOLDER_DATE,
+    )
 
-    current_dates = np.repeat(
-        np.datetime64((datetime.datetime.now()).strftime("%Y-%m-%d")).astype("<M8[D]"),
-        well_numbers.shape[1],
+    # Secondary future wells
+    below_2 = f1002a_nwells_f2 < tolerance_2
+    nwells_fut_2 = np.where(
+        below_2 & (nwells_2 > f1002a_nwells_f2), nwells_2 - f1002a_nwells_f2, zero
     )
-    ph_date = np.repeat(
-        np.datetime64("1900-01-01", type=current_dates.dtype), well_numbers.shape[1]
+    spud_date_fut_2 = np.where(
+        below_2, valuation_date + days_ntg_f2_pd, PLACEHOLDER_DATE
+    )
+    sales_date_fut_2 = np.where(
+        below_2,
+        spud_date_fut_2 + nwells_fut_2 * spud_to_rig_release + frac_to_sales,
+        PLACEHOLDER_DATE,
+    )
+
+    nsections = well_numbers.shape[1]
+    return (
+        nwells_curr,
+        nwells_fut,
+        spud_date_curr,
+        sales_date_curr,
+        spud_date_fut,
+        sales_date_fut,
+        np.zeros(nsections, dtype=well_numbers.dtype),
+        nwells_fut_2,
+        np.full(nsections, PLACEHOLDER_DATE),
+        np.full(nsections, PLACEHOLDER_DATE),
+        spud_date_fut_2,
+        sales_date_fut_2,
     )
 
-    timing_result = nb_timing_core(
-        well_numbers, well_dates, timing_dates, current_dates, ph_date
+
+def timing(
+    well_numbers,
+    well_dates,
+    valuation_date,
+    timing_dates=TIMING_DAYS,
+    method="parallel",
+):
+    """
+    For every section
+        For primary and secondary formation
+            For current and future wells
+                Number of Wells, Spud Date, Sales Date
+
+    The inputs should have the columns in the exact same order, see timing_core.
+    :param well_numbers: np.array (10, nsections)
+    :param well_dates: np.array (8, nsections) datetime64[D]
+    :param valuation_date: np.datetime64 or datetime.date
+        Date the future wells are scheduled from.
+    :param timing_dates: sequence of 8 days or np.timedelta64
+        Defaults to TIMING_DAYS.
+    :param method: str
+        parallel, serial or select, every method gives the same result.
+    :return: np.array (nsections,) of timing_dtype(well_numbers.dtype)
+    """
+    if method not in _TIMING_METHODS:
+        raise TypeError(f"{method} not found.")
+
+    well_dates = np.asarray(well_dates).astype("M8[D]", copy=False)
+    timing_dates = np.asarray(timing_dates).astype("m8[D]")
+    valuation_date = np.datetime64(valuation_date, "D")
+    if well_numbers.shape != (10, well_dates.shape[1]) or well_dates.shape[0] != 8:
+        raise ValueError(
+            f"well_numbers {well_numbers.shape} and well_dates {well_dates.shape} "
+            "are not (10, nsections) and (8, nsections)."
+        )
+
+    fields = _TIMING_METHODS[method](
+        well_numbers, well_dates, timing_dates, valuation_date
     )
-    return timing_result
+
+    result = np.empty(well_numbers.shape[1], dtype=timing_dtype(well_numbers.dtype))
+    for name, field in zip(TIMING_FIELDS, fields):
+        result[name] = field
+    return result
+
+
+class SectionTimingInputs:
+    def __init__(self, trsm_heh, well_numbers, well_dates):
+        """
+        Columnar timing inputs of nsections sections.
+
+        The counts and the dates are the rows of two contiguous blocks in the order of
+        WELL_NUMBER_FIELDS and WELL_DATE_FIELDS, a named column is a view of its row
+        and timing takes the blocks as they are.
+
+        :param trsm_heh: np.ndarray (nsections,)
+        :param well_numbers: np.ndarray (10, nsections) uint8
+        :param well_dates: np.ndarray (8, nsections) datetime64[D]
+        """
+        assert well_numbers.shape == (len(WELL_NUMBER_FIELDS), trsm_heh.shape[0])
+        assert well_dates.shape == (len(WELL_DATE_FIELDS), trsm_heh.shape[0])
+        assert well_numbers.dtype == np.uint8 and well_dates.dtype == "M8[D]"
+        self.trsm_heh = trsm_heh
+        self.well_numbers = well_numbers
+        self.well_dates = well_dates
+
+    def __len__(self):
+        return self.trsm_heh.shape[0]
+
+    def __str__(self):
+        return f"{__class__.__name__}({len(self)} sections)"
+
+    def __repr__(self):
+        return f"{__class__.__name__}({len(self)} sections)"
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        View of the column name, e.g. inputs["f1000_nwells"].
+        """
+        if name in WELL_NUMBER_FIELDS:
+            return self.well_numbers[WELL_NUMBER_FIELDS.index(name)]
+        if name in WELL_DATE_FIELDS:
+            return self.well_dates[WELL_DATE_FIELDS.index(name)]
+        raise KeyError(f"{name} not found.")
+
+    def timing(self, valuation_date, timing_dates=TIMING_DAYS, method="parallel"):
+        """
+        timing of the sections, see timing.
+        """
+        return timing(
+            self.well_numbers, self.well_dates, valuation_date, timing_dates, method
+        )
+
+
+def make_section_timing_inputs(trsm_heh, **columns) -> SectionTimingInputs:
+    """
+    Builds SectionTimingInputs from named columns of the sections.
+    Missing counts are 0, missing dates NaT, None dates are NaT.
+
+    Examples
+    --------
+    >>> inputs = make_section_timing_inputs(
+    ...     np.array(["A", "B"]), f1000_nwells=[2, 0], app_date=["2019-01-01", None]
+    ... )
+    >>> inputs["f1000_nwells"], inputs["app_date"]
+    (array([2, 0], dtype=uint8), array(['2019-01-01',        'NaT'], dtype='datetime64[D]'))
+    """
+    unknown = set(columns) - set(WELL_NUMBER_FIELDS) - set(WELL_DATE_FIELDS)
+    if unknown:
+        raise ValueError(f"{sorted(unknown)} not timing input columns.")
+
+    nsections = len(trsm_heh)
+    well_numbers = np.zeros((len(WELL_NUMBER_FIELDS), nsections), dtype=np.uint8)
+    well_dates = np.full((len(WELL_DATE_FIELDS), nsections), np.datetime64("NaT", "D"))
+    for i, name in enumerate(WELL_NUMBER_FIELDS):
+        if name in columns:
+            # Unknown counts, e.g. NULL in the session db, are 0
+            counts = np.asarray(columns[name], dtype=np.float64)
+            well_numbers[i] = np.nan_to_num(counts)
+    for i, name in enumerate(WELL_DATE_FIELDS):
+        if name in columns:
+            well_dates[i] = np.asarray(columns[name], dtype="M8[D]")
+
+    return SectionTimingInputs(np.asarray(trsm_heh), well_numbers, well_dates)
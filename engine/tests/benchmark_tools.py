@@ -0,0 +1,120 @@
+"""
+Timer, formatting and command line shared by the engine benchmarks.
+
+A benchmark module only supplies its input builder, the functions it times and a
+run function returning a dict, e.g. timing_benchmark.
+"""
+
+import argparse
+import time
+
+import pytest
+
+
+def timed(func, *args, **kwargs):
+    """
+    Result and wall time of a single call of func.
+
+    :return: (result, float)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def best_time(func, *args, repeat=3):
+    """
+    Best wall time of repeat calls of func(*args).
+    """
+    return min(timed(func, *args)[1] for _ in range(repeat))
+
+
+def time_functions(functions, args, repeat=3, warmup_args=None):
+    """
+    Best wall time of every function called on the same arguments.
+
+    :param functions: dict of str -> callable
+    :param args: tuple
+        Arguments of every function.
+    :param repeat: int
+    :param warmup_args: tuple
+        Arguments of an untimed first call of every function, e.g. a single row,
+        so that the numba kernels are compiled outside of the timings.
+    :return: dict of str -> float
+    """
+    if warmup_args is not None:
+        for func in functions.values():
+            func(*warmup_args)
+
+    return {
+        name: best_time(func, *args, repeat=repeat) for name, func in functions.items()
+    }
+
+
+def format_lines(title, rows):
+    """
+    Title followed by an aligned line of every row.
+
+    :param title: str
+    :param rows: dict of str -> str
+    :return: str
+
+    Examples
+    --------
+    >>> print(format_lines("10 sections", {"serial": "0.1000 s", "select": "0.2000 s"}))
+    10 sections
+      serial  0.1000 s
+      select  0.2000 s
+    """
+    width = max(map(len, rows), default=0) + 2
+    return "\n".join(
+        [title] + [f"  {label:<{width}}{text}" for label, text in rows.items()]
+    )
+
+
+def format_times(title, times):
+    """
+    format_lines of a dict of seconds, see time_functions.
+    """
+    return format_lines(
+        title, {name: f"{seconds:.4f} s" for name, seconds in times.items()}
+    )
+
+
+def benchmark_main(doc, run, format_result, options, argv=None):
+    """
+    Command line of a benchmark, prints format_result(run(**options)).
+
+    Every option is a --name argument of the type of its default. The option with
+    a list default takes several values and the benchmark is run for each of them.
+
+    :param doc: str
+        Docstring of the benchmark module, its first paragraph is the description.
+    :param run: callable
+    :param format_result: callable
+    :param options: dict of str -> default
+    :param argv: list of str
+    """
+    parser = argparse.ArgumentParser(description=doc.split("\n\n")[0].strip())
+    sweep = None
+    for name, default in options.items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(default, list):
+            sweep = name
+            parser.add_argument(flag, type=type(default[0]), nargs="+", default=default)
+        else:
+            parser.add_argument(flag, type=type(default), default=default)
+    kwargs = vars(parser.parse_args(argv))
+
+    for value in kwargs.pop(sweep) if sweep else [None]:
+        if sweep:
+            kwargs[sweep] = value
+        print(format_result(run(**kwargs)))
+
+
+def pytest_benchmark(request):
+    """
+    The benchmark fixture of pytest-benchmark, the test is skipped without it.
+    """
+    pytest.importorskip("pytest_benchmark")
+    return request.getfixturevalue("benchmark")
@@ -1,6 +1,22 @@
 import pytest
 import numpy as np
 
+# (low, high) of ip, d_hyp_eff, d_exp_eff and b of synthetic Modified ARPS wells
+MOD_ARPS_RANGES = [(100, 3000), (0.3, 0.9), (0.06, 0.08), (0.5, 1.5)]
+
+
+def make_random_pars(nwells, rng, ranges=MOD_ARPS_RANGES):
+    """
+    Decline parameters (npars, nwells) drawn uniformly within the range of every
+    parameter, in the order of ranges.
+
+    :param nwells: int
+    :param rng: np.random.RandomState
+    :param ranges: list of (low, high)
+    :return: np.ndarray (npars, nwells)
+    """
+    return np.array([rng.uniform(low, high, nwells) for low, high in ranges])
+
 
 @pytest.fixture(scope="session")
 def make_dca_pars(request):
@@ -0,0 +1,160 @@
+"""
+Decline fit benchmark.
+
+Generates synthetic wells from known parameters with noise and shut-in months,
+fits them with fit_decline_parallel and reports the wall time, wells per second,
+optimizer iterations and how well the parameters and the production are recovered.
+
+    python -m engine.tests.dca.decline_benchmark --nwells 2000 --model mod_arps
+
+The source roots (engine/core/dca, ...) have to be on PYTHONPATH, the same as for the tests.
+"""
+
+import numpy as np
+
+from engine.core.dca.decline_models import get_decline_model
+from engine.core.dca.decline_fit import fit_decline_parallel
+from engine.tests.configtest import MOD_ARPS_RANGES, make_random_pars
+from engine.tests.benchmark_tools import benchmark_main, format_lines, timed
+
+# Initial rate of the synthetic wells, the other parameters are drawn within the model bounds
+RATE_RANGE = MOD_ARPS_RANGES[0]
+
+
+def make_synthetic_wells(
+    nwells, mprod=120, model="mod_arps", noise=0.1, gap_rate=0.1, seed=0
+):
+    """
+    Synthetic decline streams starting at the IP month.
+
+    :param nwells: int
+    :param mprod: int
+        Number of months of the longest well, every well has at least 24 months.
+    :param model: str
+        Name of the registered decline model the wells are generated with.
+    :param noise: float
+        Standard deviation of the multiplicative log normal noise.
+    :param gap_rate: float
+        Probability of a month after the IP month being shut-in with zero production.
+    :param seed: int
+    :return: (np.ndarray, np.ndarray, np.ndarray, np.ndarray)
+        production (nwells, mprod) with noise and gaps, mask (nwells, mprod),
+        production without noise and gaps (nwells, mprod) and pars (npars, nwells)
+    """
+    rng = np.random.RandomState(seed)
+    model = get_decline_model(model)
+
+    # Away from the bounds so that the parameters can be recovered
+    ranges = [RATE_RANGE] + [
+        (low + 0.1 * (high - low), high - 0.1 * (high - low))
+        for low, high in model.bounds[1:]
+    ]
+    pars = make_random_pars(nwells, rng, ranges)
+
+    truth = model.forecast(mprod, pars)
+    production = truth * rng.lognormal(0, noise, truth.shape)
+
+    shut_in = rng.uniform(size=truth.shape) < gap_rate
+    shut_in[:, 0] = False
+    production[shut_in] = 0
+
+    nmonths = rng.randint(24, mprod + 1, (nwells, 1))
+    mask = np.arange(mprod).reshape((1, -1)) < nmonths
+    production = np.where(mask, production, 0)
+    return production, mask, truth, pars
+
+
+def run_decline_benchmark(
+    nwells=1000,
+    mprod=120,
+    model="mod_arps",
+    loss="rmse",
+    workers=1,
+    chunk_size=100,
+    noise=0.1,
+    gap_rate=0.1,
+    seed=0,
+):
+    """
+    Fits synthetic wells and measures the fit.
+
+    :return: dict
+        model, loss, nwells, workers, chunk_size,
+        wall_time - seconds spent in fit_decline_parallel
+        wells_per_second
+        iterations, evaluations, converged - see fit_decline_batch
+        production_error - median of the rmse against the production without noise,
+            relative to the initial rate
+        par_errors - median relative error of every parameter
+    """
+    production, mask, truth, pars = make_synthetic_wells(
+        nwells, mprod, model, noise, gap_rate, seed
+    )
+
+    (fit_pars, stats), wall_time = timed(
+        fit_decline_parallel,
+        production,
+        mask,
+        model=model,
+        loss=loss,
+        workers=workers,
+        chunk_size=chunk_size,
+        return_stats=True,
+    )
+
+    decline_model = get_decline_model(model)
+    fit_production = decline_model.forecast(mprod, fit_pars)
+    residual = np.where(mask, fit_production - truth, 0)
+    rmse = np.sqrt(np.sum(np.square(residual), axis=1) / np.sum(mask, axis=1))
+
+    par_errors = np.median(np.abs(fit_pars - pars) / np.abs(pars), axis=1)
+    return dict(
+        model=model,
+        loss=loss,
+        nwells=nwells,
+        workers=workers,
+        chunk_size=chunk_size,
+        wall_time=wall_time,
+        wells_per_second=nwells / wall_time,
+        iterations=stats["iterations"],
+        evaluations=stats["evaluations"],
+        converged=stats["converged"],
+        production_error=float(np.median(rmse / pars[0])),
+        par_errors=dict(zip(decline_model.par_names, par_errors.tolist())),
+    )
+
+
+def format_benchmark(result):
+    title = (
+        f"{result['model']} / {result['loss']}: {result['nwells']} wells,"
+        f" {result['workers']} workers, chunks of {result['chunk_size']}"
+    )
+    rows = {
+        "wall time": f"{result['wall_time']:.2f} s",
+        "wells per second": f"{result['wells_per_second']:.1f}",
+        "iterations": f"{result['iterations']}",
+        "evaluations": f"{result['evaluations']}",
+        "converged": f"{result['converged']}/{result['nwells']}",
+        "production error": f"{result['production_error']:.4f}",
+    }
+    rows.update((name, f"{error:.4f}") for name, error in result["par_errors"].items())
+    return format_lines(title, rows)
+
+
+def main(argv=None):
+    options = dict(
+        model=["mod_arps"],
+        nwells=1000,
+        mprod=120,
+        loss="rmse",
+        workers=1,
+        chunk_size=100,
+        noise=0.1,
+        gap_rate=0.1,
+        seed=0,
+    )
+    benchmark_main(__doc__, run_decline_benchmark, format_benchmark, options, argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import numpy as np
+from engine.tests.benchmark_tools import pytest_benchmark
+from engine.tests.dca.decline_benchmark import (
+    make_synthetic_wells,
+    run_decline_benchmark,
+    format_benchmark,
+)
+import pytest
+
+
+def test_make_synthetic_wells():
+    production, mask, truth, pars = make_synthetic_wells(200, 60, gap_rate=0.2)
+
+    assert production.shape == mask.shape == truth.shape == (200, 60)
+    assert pars.shape == (4, 200)
+    assert np.all(mask[:, :24]), "Wells shorter than 24 months"
+    assert np.all(production[~mask] == 0)
+    assert 0.1 < np.mean(production[mask] == 0) < 0.3, "Shut-in months not matching"
+
+
+@pytest.mark.parametrize("model", ["mod_arps", "sepd", "duong", "three_segment"])
+def test_decline_benchmark(model):
+    result = run_decline_benchmark(nwells=40, mprod=60, model=model, chunk_size=20)
+
+    assert result["wells_per_second"] > 0
+    assert result["iterations"] > 0
+    assert result["production_error"] < 0.1, "Production not recovered"
+    assert format_benchmark(result).startswith(f"{model} / rmse")
+
+
+def test_decline_benchmark_mod_arps_recovery():
+    result = run_decline_benchmark(nwells=100, mprod=120, noise=0.05)
+
+    assert result["converged"] >= 0.9 * result["nwells"]
+    assert result["production_error"] < 0.02
+    assert result["par_errors"]["ip"] < 0.05
+    assert result["par_errors"]["d_hyp_eff"] < 0.05
+
+
+def test_decline_benchmark_pytest_benchmark(request):
+    benchmark = pytest_benchmark(request)
+
+    result = benchmark.pedantic(
+        run_decline_benchmark, kwargs=dict(nwells=200), rounds=3, iterations=1
+    )
+    benchmark.extra_info.update(
+        wells_per_second=result["wells_per_second"],
+        iterations=result["iterations"],
+        production_error=result["production_error"],
+    )
@@ -0,0 +1,176 @@
+import multiprocessing.spawn
+import sys
+
+import numpy as np
+import pytest
+from engine.core.dca.mod_arps import np_mod_arps_fit, batch_modarps_rmse
+from engine.core.dca import decline_fit
+from engine.core.dca.decline_fit import (
+    align_decline_streams,
+    fit_decline_batch,
+    fit_decline_parallel,
+    worker_executable,
+)
+from engine.tests.configtest import make_random_pars
+
+
+def test_align_decline_streams():
+    production = np.array([[1.0, 3.0, 2.0, 0.0], [5.0, 4.0, 0.0, 0.0]])
+    mask = np.array([[True, True, True, False], [True, True, False, False]])
+    decline, decline_mask, ip_idx = align_decline_streams(production, mask)
+
+    assert np.all(ip_idx == [1, 0])
+    assert np.all(decline == [[3.0, 2.0, 0.0, 0.0], [5.0, 4.0, 0.0, 0.0]])
+    assert np.all(
+        decline_mask == [[True, True, False, False], [True, True, False, False]]
+    )
+
+
+def test_fit_decline_batch():
+    nwells = 50
+    mprod = 120
+    rng = np.random.RandomState(0)
+    pars = make_random_pars(nwells, rng)
+    production = np_mod_arps_fit(mprod, pars)
+    mask = np.arange(mprod).reshape((1, -1)) < rng.randint(24, mprod, (nwells, 1))
+
+    initial_guess = [1.0, 0.6, 0.07, 1.0]
+    bounds = [(0.5, 2.0), (0.1, 0.99), (0.05, 0.1), (0.1, 2.0)]
+    fit_pars = fit_decline_batch(production, mask, initial_guess, bounds)
+
+    assert fit_pars.shape == (4, nwells)
+    assert np.allclose(fit_pars[0], pars[0], rtol=0.05), "IP not recovered"
+    rmse = batch_modarps_rmse(fit_pars, production, mask)
+    assert np.all(rmse / pars[0] < 0.05), "Production not recovered"
+
+
+def test_fit_decline_parallel():
+    nwells = 30
+    mprod = 60
+    rng = np.random.RandomState(1)
+    pars = make_random_pars(nwells, rng)
+    production = np_mod_arps_fit(mprod, pars) * rng.normal(1, 0.05, (nwells, mprod))
+    mask = np.ones_like(production, dtype=bool)
+
+    initial_guess = [1.0, 0.6, 0.07, 1.0]
+    bounds = [(0.5, 2.0), (0.1, 0.99), (0.05, 0.1), (0.1, 2.0)]
+    progress = list()
+
+    serial_pars = fit_decline_parallel(
+        production, mask, initial_guess, bounds, workers=1, chunk_size=8
+    )
+    parallel_pars = fit_decline_parallel(
+        production,
+        mask,
+        initial_guess,
+        bounds,
+        workers=2,
+        chunk_size=8,
+        progress=lambda nwells_done, total: progress.append(nwells_done),
+        executable=sys.executable,
+    )
+
+    assert np.array_equal(serial_pars, parallel_pars), "Results depend on workers"
+    assert progress == [8, 16, 24, 30]
+
+
+def test_worker_executable():
+    executable = multiprocessing.spawn.get_executable()
+
+    with worker_executable("/venv/Scripts/pythonw.exe"):
+        assert "pythonw" in str(multiprocessing.spawn.get_executable())
+    assert multiprocessing.spawn.get_executable() == executable
+
+    with pytest.raises(ValueError):
+        with worker_executable("/venv/Scripts/pythonw.exe"):
+            raise ValueError
+    assert multiprocessing.spawn.get_executable() == executable, "Not restored"
+
+    with worker_executable(None):
+        assert multiprocessing.spawn.get_executable() == executable
+
+
+def test_fit_decline_batch_warm_start():
+    nwells = 20
+    mprod = 60
+    rng = np.random.RandomState(2)
+    pars = make_random_pars(nwells, rng)
+    production = np_mod_arps_fit(mprod, pars)
+    mask = np.ones_like(production, dtype=bool)
+
+    initial_guess = [1.0, 0.6, 0.07, 1.0]
+    bounds = [(0.5, 2.0), (0.1, 0.99), (0.05, 0.1), (0.1, 2.0)]
+
+    warm_start = pars.copy()
+    warm_start[:, 0] = np.nan
+    fit_pars = fit_decline_batch(
+        production, mask, initial_guess, bounds, warm_start=warm_start
+    )
+
+    rmse = batch_modarps_rmse(fit_pars, production, mask)
+    assert np.all(rmse / pars[0] < 0.05), "Production not recovered"
+
+
+def test_fit_decline_batch_warm_start_fallback(monkeypatch):
+    nwells = 20
+    mprod = 60
+    rng = np.random.RandomState(2)
+    pars = make_random_pars(nwells, rng)
+    expected = np_mod_arps_fit(mprod, pars)
+    production = expected * rng.normal(1, 0.05, expected.shape)
+    mask = np.ones_like(production, dtype=bool)
+
+    initial_guess = [1.0, 0.6, 0.07, 1.0]
+    bounds = [(0.5, 2.0), (0.1, 0.99), (0.05, 0.1), (0.1, 2.0)]
+
+    # The warm started fit stops at its starting point without converging
+    starts = []
+    minimize_batch = decline_fit._minimize_batch
+
+    def failing_warm_start(model, actual, mask, x0, *args):
+        starts.append(x0.copy())
+        if len(starts) == 1:
+            well_loss, _ = model.loss_and_grad(x0, actual, mask, *args[-2:])
+            return x0, well_loss, np.zeros(x0.shape[1], dtype=bool), dict()
+        return minimize_batch(model, actual, mask, x0, *args)
+
+    monkeypatch.setattr(decline_fit, "_minimize_batch", failing_warm_start)
+
+    warm_start = np.repeat(np.array([[2.0], [0.99], [0.1], [0.1]]), nwells, axis=1)
+    warm_start[0] = warm_start[0] * pars[0]
+    fit_pars, stats = fit_decline_batch(
+        production,
+        mask,
+        initial_guess,
+        bounds,
+        warm_start=warm_start,
+        return_stats=True,
+    )
+
+    assert len(starts) == 2
+    assert np.allclose(starts[1], np.reshape(initial_guess, (-1, 1)))
+    assert stats["converged"] == nwells
+
+    rmse = batch_modarps_rmse(fit_pars, expected, mask)
+    assert np.all(rmse / pars[0] < 0.1), "Production not recovered"
+
+
+@pytest.mark.parametrize("loss", ["squares", "huber", "log_squares", "rmse"])
+def test_fit_decline_batch_downtime(loss):
+    nwells = 20
+    mprod = 120
+    rng = np.random.RandomState(3)
+    pars = make_random_pars(nwells, rng)
+    production = np_mod_arps_fit(mprod, pars)
+    mask = np.ones_like(production, dtype=bool)
+
+    # Shut-in months are reported as zero production
+    downtime = production.copy()
+    downtime[:, 1:][rng.uniform(size=(nwells, mprod - 1)) < 0.15] = 0
+
+    initial_guess = [1.0, 0.6, 0.07, 1.0]
+    bounds = [(0.5, 2.0), (0.1, 0.99), (0.05, 0.1), (0.1, 2.0)]
+    fit_pars = fit_decline_batch(downtime, mask, initial_guess, bounds, loss=loss)
+
+    rmse = batch_modarps_rmse(fit_pars, production, mask)
+    assert np.all(rmse / pars[0] < 0.05), "Production not recovered"
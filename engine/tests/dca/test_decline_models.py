@@ -0,0 +1,129 @@
+import numpy as np
+from engine.core.dca.decline_models import (
+    get_decline_model,
+    get_loss,
+    forward_difference_jacobian,
+)
+from engine.core.dca.decline_fit import fit_decline_batch
+import pytest
+
+MODEL_PARS = {
+    "mod_arps": [[1000.0, 500.0], [0.6, 0.8], [0.07, 0.065], [1.2, 0.9]],
+    "sepd": [[1000.0, 500.0], [8.0, 20.0], [0.4, 0.7]],
+    "duong": [[1000.0, 500.0], [0.8, 0.5], [1.2, 1.1]],
+    "three_segment": [
+        [1000.0, 500.0],
+        [0.7, 0.8],
+        [0.07, 0.065],
+        [1.5, 1.2],
+        [0.5, 0.8],
+        [10.0, 18.0],
+    ],
+}
+
+
+def test_get_decline_model():
+    assert get_decline_model("sepd").par_names == ["qi", "tau", "n"]
+    with pytest.raises(TypeError):
+        get_decline_model("unknown")
+
+
+@pytest.mark.parametrize("name", ["mod_arps", "sepd", "duong", "three_segment"])
+def test_decline_model_forecast(name):
+    model = get_decline_model(name)
+    pars = np.array(MODEL_PARS[name])
+    prod = model.forecast(240, pars)
+
+    assert prod.shape == (2, 240)
+    assert np.allclose(prod[:, 0], pars[0]), "Initial rate not matching"
+    assert np.all(np.diff(prod, axis=1) <= 0), "Production not declining"
+    assert np.allclose(model.loss(pars, prod, loss="rmse"), 0)
+
+
+@pytest.mark.parametrize(
+    "name", ["mod_arps", "sepd", "duong", "three_segment", "mod_arps_volume"]
+)
+def test_decline_model_numba(name):
+    model = get_decline_model(name)
+    pars = np.array(MODEL_PARS.get(name, MODEL_PARS["mod_arps"]))
+    assert np.allclose(model.nb_forecast(240, pars), model.forecast(240, pars))
+
+    if model.nb_jacobian is not None:
+        _, jacobian = model.jacobian(240, pars)
+        _, nb_jacobian = model.nb_jacobian(240, pars)
+        assert np.allclose(nb_jacobian, jacobian), "Numba jacobian not matching"
+
+
+@pytest.mark.parametrize("name", ["sepd", "duong", "three_segment", "mod_arps_volume"])
+def test_decline_model_jacobian(name):
+    model = get_decline_model(name)
+    pars = np.array(MODEL_PARS.get(name, MODEL_PARS["mod_arps"]))
+    prod, jacobian = model.jacobian(240, pars)
+    _, finite_diff = forward_difference_jacobian(model.forecast, 240, pars)
+
+    assert np.allclose(prod, model.forecast(240, pars)), "Prod not matching"
+    for k in range(model.npars):
+        assert np.allclose(
+            jacobian[k],
+            finite_diff[k],
+            rtol=1e-4,
+            atol=1e-4 * np.abs(jacobian[k]).max(),
+        ), f"Derivative {k} not matching"
+
+
+@pytest.mark.parametrize("name", ["sepd", "duong", "three_segment", "mod_arps_volume"])
+def test_fit_decline_batch_models(name):
+    model = get_decline_model(name)
+    pars = np.array(MODEL_PARS.get(name, MODEL_PARS["mod_arps"]))
+    production = model.forecast(120, pars)
+    mask = np.ones_like(production, dtype=bool)
+
+    fit_pars = fit_decline_batch(production, mask, model=name)
+
+    assert fit_pars.shape == (model.npars, 2)
+    loss = model.loss(fit_pars, production, mask, loss="rmse")
+    assert np.all(loss / pars[0] < 0.05), "Production not recovered"
+
+
+@pytest.mark.parametrize("loss", ["squares", "huber", "log_squares", "rmse"])
+def test_loss_and_grad(loss):
+    model = get_decline_model("sepd")
+    pars = np.array(MODEL_PARS["sepd"])
+    rng = np.random.RandomState(0)
+    actual = model.forecast(120, pars) / pars[0].reshape((-1, 1))
+    actual = actual * rng.normal(1, 0.2, actual.shape)
+    mask = rng.uniform(size=actual.shape) > 0.1
+    pars[0] = 1.1
+
+    well_loss, grad = model.loss_and_grad(pars, actual, mask, loss)
+    assert np.allclose(well_loss, model.loss(pars, actual, mask, loss))
+
+    for k in range(model.npars):
+        step = 1e-6 * np.maximum(np.abs(pars[k]), 1)
+        stepped_pars = pars.copy()
+        stepped_pars[k] = stepped_pars[k] + step
+        finite_diff = (model.loss(stepped_pars, actual, mask, loss) - well_loss) / step
+        assert np.allclose(grad[k], finite_diff, rtol=1e-3, atol=1e-5)
+
+    with pytest.raises(TypeError):
+        get_loss("unknown")
+
+
+def test_huber_delta():
+    model = get_decline_model("sepd")
+    pars = np.array(MODEL_PARS["sepd"])
+    actual = model.forecast(120, pars) / pars[0].reshape((-1, 1))
+    pars[0] = 1.5
+
+    narrow = model.loss(pars, actual, loss="huber", loss_options={"delta": 0.01})
+    wide = model.loss(pars, actual, loss="huber", loss_options={"delta": 10.0})
+    assert np.all(narrow < wide)
+    assert np.allclose(wide, model.loss(pars, actual, loss="squares"))
+
+    mask = np.ones(actual.shape, dtype=bool)
+    well_loss, grad = model.loss_and_grad(
+        pars, actual, mask, "huber", loss_options={"delta": 0.01}
+    )
+    assert np.allclose(well_loss, narrow)
+    _, default_grad = model.loss_and_grad(pars, actual, mask, "huber")
+    assert not np.allclose(grad, default_grad)
@@ -0,0 +1,81 @@
+import numpy as np
+
+from engine.core.dca.decline_models import get_decline_model
+from engine.core.dca.forecast_cache import ForecastCache
+from engine.tests.configtest import make_random_pars
+
+
+class DictStore:
+    def __init__(self):
+        self.forecasts = dict()
+        self.loads = 0
+
+    def load_forecasts(self, keys):
+        self.loads += 1
+        return {key: self.forecasts[key] for key in keys if key in self.forecasts}
+
+    def save_forecasts(self, forecasts):
+        self.forecasts.update(forecasts)
+
+
+def make_pars(nwells, seed=0):
+    return make_random_pars(
+        nwells,
+        np.random.RandomState(seed),
+        [(100, 1000), (0.5, 0.9), (0.05, 0.1), (0.5, 1.5)],
+    )
+
+
+def test_forecast_cache():
+    pars = make_pars(10)
+    cache = ForecastCache()
+
+    production = cache.forecast("mod_arps", pars, 60)
+    expected = get_decline_model("mod_arps").forecast(60, pars)
+    assert production.shape == (10, 60)
+    assert production.dtype == np.float32
+    assert np.allclose(production, expected, rtol=1e-5)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 10, 10)
+
+    # Flipping back to a subset of the wells does not forecast them again
+    production = cache.forecast("mod_arps", pars[:, 3:7], 60)
+    assert np.allclose(production, expected[3:7], rtol=1e-5)
+    assert (cache.hits, cache.misses) == (4, 10)
+
+    # A different horizon or dtype is a different forecast
+    cache.forecast("mod_arps", pars[:, :2], 61)
+    cache.forecast("mod_arps", pars[:, :2], 60, np.float64)
+    assert (cache.hits, cache.misses, len(cache)) == (4, 14, 14)
+
+
+def test_forecast_cache_lru():
+    pars = make_pars(10)
+    row_bytes = 60 * 4
+    cache = ForecastCache(max_bytes=4 * row_bytes)
+
+    cache.forecast("mod_arps", pars[:, :4], 60)
+    cache.forecast("mod_arps", pars[:, :1], 60)
+    cache.forecast("mod_arps", pars[:, 4:6], 60)
+
+    assert cache.nbytes == 4 * row_bytes
+    keys = [ForecastCache.make_key("mod_arps", pars[:, i], 60) for i in range(6)]
+    assert [key in cache for key in keys] == [True, False, False, True, True, True]
+
+
+def test_forecast_cache_store():
+    pars = np.array([np.linspace(100, 800, 8), np.full(8, 0.9), np.full(8, 1.2)])
+    store = DictStore()
+
+    cache = ForecastCache(store=store)
+    expected = cache.forecast("duong", pars, 48)
+    assert len(store.forecasts) == 8
+
+    # A new cache, e.g. a restored session, reads the forecasts back from the store
+    restored = ForecastCache(store=store)
+    production = restored.forecast("duong", pars, 48)
+    assert np.array_equal(production, expected)
+    assert store.loads == 2
+    assert len(store.forecasts) == 8
+
+    restored.forecast("duong", pars, 48)
+    assert store.loads == 2, "Cached forecasts looked up in the store"
@@ -1,7 +1,20 @@
 import numpy as np
-from engine.core.dca.mod_arps import np_mod_arps_fit
-from engine.tests.configtest import make_dca_pars
+from engine.core.dca.mod_arps import (
+    np_mod_arps_fit,
+    nb_mod_arps,
+    np_mod_arps_jacobian,
+    nb_mod_arps_jacobian,
+    modarps_rmse,
+    modarps_rmse_and_grad,
+    np_mod_arps_cum,
+    np_mod_arps_volumes,
+    nb_mod_arps_volumes,
+    np_mod_arps_econ_limit,
+    np_mod_arps_eur,
+)
+from engine.tests.configtest import make_dca_pars, make_random_pars
 import pytest
+import tracemalloc
 
 
 @pytest.mark.parametrize("make_dca_pars", [(10000, np.float32)], indirect=True)
@@ -11,3 +24,183 @@ def test_np_mod_arps_fit(make_dca_pars):
 
     assert np.allclose(np_prod[:, 0], make_dca_pars[0]), "IP not matching"
     assert np.all(np_prod >= 0), "Prod not negative"
+
+
+@pytest.mark.parametrize("make_dca_pars", [(1000, np.float64)], indirect=True)
+def test_nb_mod_arps(make_dca_pars):
+    mprod = 600
+    np_prod = np_mod_arps_fit(mprod, make_dca_pars)
+    nb_prod = nb_mod_arps(mprod, make_dca_pars)
+    assert np.allclose(nb_prod, np_prod), "Numba prod not matching"
+
+    out = np.empty((make_dca_pars.shape[1], mprod), dtype=np.float32)
+    assert nb_mod_arps(mprod, make_dca_pars, out=out) is out
+    assert np.allclose(out, np_prod, rtol=1e-4)
+
+    with pytest.raises(ValueError):
+        nb_mod_arps(mprod + 1, make_dca_pars, out=out)
+
+
+def test_mod_arps_fit_memory():
+    nwells = 2000
+    mprod = 600
+    rng = np.random.RandomState(0)
+    pars = make_random_pars(nwells, rng).astype(np.float32)
+    out = np.empty((nwells, mprod), dtype=np.float32)
+    expected = np_mod_arps_fit(mprod, pars.astype(np.float64))
+
+    for forecast, max_temporaries in [(np_mod_arps_fit, 2.1), (nb_mod_arps, 0.1)]:
+        # Compiled before measuring
+        forecast(mprod, pars, out=out)
+        tracemalloc.start()
+        prod = forecast(mprod, pars, out=out)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        assert prod is out
+        assert np.allclose(out, expected, rtol=1e-3, atol=1e-3)
+        assert peak < max_temporaries * out.nbytes, f"{forecast.__name__} peak memory"
+
+
+def test_np_mod_arps_jacobian():
+    mprod = 240
+    pars = np.array(
+        [[1000.0, 500.0, 800.0], [0.6, 0.8, 0.5], [0.07, 0.065, 0.075], [1.2, 0.9, 0.4]]
+    )
+    prod, jacobian = np_mod_arps_jacobian(mprod, pars)
+    assert np.allclose(prod, np_mod_arps_fit(mprod, pars)), "Prod not matching"
+
+    for k in range(pars.shape[0]):
+        step = 1e-6 * np.maximum(np.abs(pars[k]), 1e-3)
+        stepped_pars = pars.copy()
+        stepped_pars[k] = stepped_pars[k] + step
+        finite_diff = (np_mod_arps_fit(mprod, stepped_pars) - prod) / step.reshape(
+            (-1, 1)
+        )
+        assert np.allclose(
+            jacobian[k], finite_diff, rtol=1e-4, atol=1e-4 * np.abs(jacobian[k]).max()
+        ), f"Derivative {k} not matching"
+
+    nb_prod, nb_jacobian = nb_mod_arps_jacobian(mprod, pars)
+    assert np.allclose(nb_jacobian, jacobian), "Numba jacobian not matching"
+
+
+def test_modarps_rmse_and_grad():
+    pars = np.array([1000.0, 0.6, 0.07, 1.2])
+    actual = np_mod_arps_fit(60, np.array([1100.0, 0.5, 0.06, 1.0]).reshape(-1, 1))
+    rmse, grad = modarps_rmse_and_grad(pars, actual)
+
+    assert np.isclose(rmse, modarps_rmse(pars, actual))
+    assert grad.shape == (4,)
+
+    # Central differences with a step relative to the size of every parameter
+    step = 1e-6 * np.abs(pars)
+    expected = np.empty(4)
+    for i in range(4):
+        shift = np.zeros(4)
+        shift[i] = step[i]
+        expected[i] = (
+            modarps_rmse(pars + shift, actual) - modarps_rmse(pars - shift, actual)
+        ) / (2 * step[i])
+    assert np.allclose(grad, expected, rtol=1e-4, atol=1e-6)
+
+
+def test_np_mod_arps_cum():
+    pars = np.array(
+        [
+            [1000.0, 500.0, 800.0, 800.0, 800.0],
+            [0.6, 0.8, 0.5, 0.5, 0.5],
+            [0.07, 0.065, 0.075, 0.075, 0.075],
+            [1.2, 0.9, 1.0, 1.0 - 1e-5, 1.0 + 1e-5],
+        ]
+    )
+    months = np.arange(1, 240)
+    cum = np_mod_arps_cum(months, pars)
+
+    # The rate is the derivative of the cumulative away from the switch month blend
+    h = 1e-3
+    rate = (np_mod_arps_cum(months + h, pars) - np_mod_arps_cum(months - h, pars)) / (
+        2 * h
+    )
+    expected = np_mod_arps_fit(240, pars)[:, 1:]
+    assert np.median(np.abs(rate - expected) / expected) < 1e-6
+    assert np.allclose(np_mod_arps_cum([0], pars), 0)
+    assert np.all(np.diff(cum, axis=1) > 0)
+    assert np.allclose(cum[3:], cum[2], rtol=1e-4), "Harmonic b not continuous"
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_np_mod_arps_volumes(dtype):
+    pars = np.array(
+        [[1000.0, 500.0, 800.0], [0.6, 0.8, 0.5], [0.07, 0.065, 0.075], [1.2, 0.9, 1.0]]
+    )
+    monthly = np_mod_arps_volumes(600, pars.astype(dtype))
+
+    assert monthly.shape == (3, 600)
+    assert monthly.dtype == dtype
+    assert np.allclose(
+        monthly.sum(axis=1, dtype=np.float64),
+        np_mod_arps_cum([600], pars)[:, 0],
+        rtol=1e-5,
+    )
+
+    # Coarser periods are the sums of the months in them
+    quarterly = np_mod_arps_volumes(600, pars.astype(dtype), step=3)
+    assert np.allclose(quarterly, monthly.reshape((3, 200, 3)).sum(axis=2), rtol=1e-5)
+    yearly = np_mod_arps_volumes(598, pars.astype(dtype), step=12)
+    assert yearly.shape == (3, 50)
+    assert np.allclose(yearly[:, -1], monthly[:, 588:598].sum(axis=1), rtol=1e-5)
+
+    out = np.empty((3, 600), dtype=dtype)
+    assert nb_mod_arps_volumes(600, pars.astype(dtype), out=out) is out
+    assert np.allclose(out, monthly, rtol=1e-5)
+    with pytest.raises(ValueError):
+        nb_mod_arps_volumes(601, pars.astype(dtype), out=out)
+
+
+def test_np_mod_arps_econ_limit():
+    # Hyperbolic, exponential, exponential from month 0 and below the limit from IP
+    pars = np.array(
+        [
+            [1000.0, 1000.0, 800.0, 5.0],
+            [0.6, 0.6, 0.3, 0.6],
+            [0.07, 0.07, 0.15, 0.07],
+            [1.2, 1.2, 2.0, 1.2],
+        ]
+    )
+    econ_limit = np.array([200.0, 5.0, 10.0, 10.0])
+    cutoff = np_mod_arps_econ_limit(pars, econ_limit)
+
+    h = 1e-4
+    months = np.column_stack([cutoff - h, cutoff + h])
+    cum = np_mod_arps_cum(months, pars)
+    rate = (cum[:, 1] - cum[:, 0]) / (2 * h)
+
+    assert np.allclose(rate[:3], econ_limit[:3], rtol=1e-6)
+    assert cutoff[3] == 0
+
+
+def test_np_mod_arps_eur():
+    rng = np.random.RandomState(0)
+    nwells = 1000
+    pars = make_random_pars(
+        nwells, rng, [(100, 1000), (0.3, 0.95), (0.04, 0.15), (0.5, 2.0)]
+    )
+    elapsed = rng.randint(0, 120, nwells)
+    cutoff, eur, remaining = np_mod_arps_eur(pars, 10.0, elapsed, max_months=600)
+
+    # Same as summing the monthly volumes of a long forecast up to the cutoff
+    monthly = np_mod_arps_volumes(600, pars)
+    months = np.arange(1, 601).reshape((1, -1))
+    full_months = np.floor(cutoff).astype(int)
+    expected = np.sum(np.where(months <= full_months.reshape((-1, 1)), monthly, 0), 1)
+    partial = (
+        np_mod_arps_cum(cutoff.reshape((-1, 1)), pars)[:, 0]
+        - np_mod_arps_cum(full_months.reshape((-1, 1)), pars)[:, 0]
+    )
+    assert np.allclose(eur, expected + partial)
+
+    assert np.all(cutoff <= 600)
+    produced = np_mod_arps_cum(np.minimum(elapsed, cutoff).reshape((-1, 1)), pars)
+    assert np.allclose(remaining, eur - produced[:, 0])
+    assert np.all(remaining[elapsed >= cutoff] == 0)
@@ -0,0 +1,41 @@
+import numpy as np
+from engine.core.dca.production_layout import make_production_layout
+
+
+def test_make_production_layout():
+    api = np.array([10, 10, 10, 20, 30, 30])
+    oil = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    gas = oil * 10
+    layout = make_production_layout(api, oil=oil, gas=gas)
+
+    assert len(layout) == 3
+    assert np.all(layout.apis == [10, 20, 30])
+    assert np.all(layout.offsets == [0, 3, 4])
+    assert np.all(layout.lengths == [3, 1, 2])
+    assert layout.streams["oil"].dtype == np.float32
+    assert np.all(layout.stream(2, "gas") == [50.0, 60.0])
+
+
+def test_to_padded():
+    api = np.array([10, 10, 10, 20, 30, 30])
+    oil = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    layout = make_production_layout(api, oil=oil)
+
+    production, mask = layout.to_padded("oil")
+    assert np.all(production == [[1, 2, 3], [4, 0, 0], [5, 6, 0]])
+    assert np.all(mask.sum(axis=1) == layout.lengths)
+
+    production, mask = layout.to_padded("oil", wells=np.array([2, 1]))
+    assert np.all(production == [[5, 6], [4, 0]])
+
+
+def test_hash_wells():
+    api = np.array([10, 10, 20, 30])
+    oil = np.array([1.0, 2.0, 3.0, 3.0])
+    layout = make_production_layout(api, oil=oil)
+    hashes = layout.hash_wells()
+
+    assert hashes.shape == (3,)
+    assert hashes[1] == hashes[2], "Same production should give the same hash"
+    assert hashes[0] != hashes[1]
+    assert np.all(layout.hash_wells(salt=b"settings") != hashes)
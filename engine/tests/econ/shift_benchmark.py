@@ -0,0 +1,108 @@
+"""
+take_per_row_strided benchmark.
+
+Times take_per_row_strided against the previous as_strided implementation,
+and shift_rows against the previous take_per_row_strided and append_zeroes_front
+pair, on (nwells, nmonths) float32 production.
+
+    python -m engine.tests.econ.shift_benchmark --nwells 10000 100000
+
+The source roots (engine/core/econ, ...) have to be on PYTHONPATH, the same as for the tests.
+"""
+
+import numpy as np
+
+from array_manipulations import take_per_row_strided, shift_rows
+from engine.tests.benchmark_tools import benchmark_main, format_times, time_functions
+
+
+def take_per_row_strided_legacy(array, start_indices, nelements):
+    """
+    take_per_row_strided before it was made safe, kept to benchmark against.
+    Reshapes its input in place and only works on C contiguous arrays.
+    """
+    row, cols = array.shape
+    array.shape = -1
+    s0 = array.strides[0]
+    l_index = start_indices + cols * np.arange(len(start_indices))
+    out = np.lib.stride_tricks.as_strided(
+        array, (len(array) - nelements + 1, nelements), (s0, s0)
+    )[l_index]
+    array.shape = row, cols
+    return out
+
+
+def append_zeroes_front_legacy(array, nzeros, nelements):
+    """
+    append_zeroes_front before it was vectorized, kept to benchmark against.
+    """
+    new_array = np.zeros_like(array)
+    for i in range(array.shape[0]):
+        new_array[i, nzeros[i] :] = array[i, : (array.shape[1] - nzeros[i])]
+    return new_array
+
+
+def make_shift_inputs(nwells, nmonths=600, max_shift=60, seed=0):
+    rng = np.random.RandomState(seed)
+    production = rng.uniform(0, 1000, (nwells, nmonths + max_shift))
+    production = production.astype(np.float32)
+    pdp_shift = rng.randint(0, max_shift + 1, nwells)
+    pud_shift = np.where(rng.uniform(size=nwells) < 0.5, pdp_shift, 0)
+    pdp_shift = np.where(pud_shift > 0, 0, pdp_shift)
+    return production, pdp_shift, pud_shift
+
+
+def shift_legacy(array, pdp_shift, pud_shift, nelements):
+    """
+    PDP and PUD shift before shift_rows, kept to benchmark against.
+    """
+    taken = take_per_row_strided_legacy(array, pdp_shift, nelements)
+    return append_zeroes_front_legacy(taken, pud_shift, nelements)
+
+
+# Every function takes (production, pdp_shift, pud_shift, nmonths)
+SHIFT_FUNCTIONS = dict(
+    take_legacy=lambda array, pdp, pud, n: take_per_row_strided_legacy(array, pdp, n),
+    take=lambda array, pdp, pud, n: take_per_row_strided(array, pdp, n),
+    shift_legacy=shift_legacy,
+    shift=shift_rows,
+)
+
+
+def run_shift_benchmark(nwells=10000, nmonths=600, repeat=3, seed=0):
+    """
+    Best wall time of repeat runs of every implementation.
+
+    :return: dict
+        nwells, nmonths and the seconds of
+        take_legacy, take - take_per_row_strided before and now
+        shift_legacy, shift - PDP and PUD shift before and with shift_rows
+    """
+    production, pdp_shift, pud_shift = make_shift_inputs(nwells, nmonths, seed=seed)
+    out = np.empty((nwells, nmonths), dtype=production.dtype)
+
+    def shift(array, pdp, pud, n):
+        return shift_rows(array, pdp, pud, n, out=out[: len(array)])
+
+    functions = dict(SHIFT_FUNCTIONS, shift=shift)
+    times = time_functions(
+        functions,
+        (production, pdp_shift, pud_shift, nmonths),
+        repeat,
+        warmup_args=(production[:1], pdp_shift[:1], pud_shift[:1], nmonths),
+    )
+    return dict(nwells=nwells, nmonths=nmonths, **times)
+
+
+def format_shift_benchmark(result):
+    times = {name: result[name] for name in SHIFT_FUNCTIONS}
+    return format_times(f"{result['nwells']} wells x {result['nmonths']} months", times)
+
+
+def main(argv=None):
+    options = dict(nwells=[10000, 100000], nmonths=600, repeat=3, seed=0)
+    benchmark_main(__doc__, run_shift_benchmark, format_shift_benchmark, options, argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from array_manipulations import (
+    accumulate_axis,
+    take_per_row_strided,
+    append_zeroes_front,
+    shift_rows,
+)
+
+
+def make_shifts(nrows, ncols, nelements, seed=0):
+    rng = np.random.RandomState(seed)
+    pdp_shift = rng.randint(0, ncols - nelements + 1, nrows)
+    pud_shift = rng.randint(0, nelements + 1, nrows)
+    return pdp_shift, pud_shift
+
+
+def test_shift_rows():
+    array = np.random.uniform(size=(500, 160)).astype(np.float32)
+    pdp_shift, pud_shift = make_shifts(500, 160, 120)
+
+    expected = append_zeroes_front(
+        take_per_row_strided(array, pdp_shift, 120), pud_shift, 120
+    )
+    out = np.full((500, 120), np.nan, dtype=np.float32)
+    shifted = shift_rows(array, pdp_shift, pud_shift, 120, out=out)
+
+    assert shifted is out
+    assert np.array_equal(shifted, expected)
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.float32, np.float64])
+def test_shift_rows_strided(dtype):
+    # Non WI oil of a (2, 2, nwells, nmonths) production tensor
+    production = np.random.uniform(size=(2, 2, 50, 90)).astype(np.float32)
+    pdp_shift, pud_shift = make_shifts(50, 90, 60)
+    out = np.empty((2, 50, 60), dtype=dtype)
+
+    shift_rows(production[1, 0], pdp_shift, pud_shift, 60, out=out[1])
+
+    for i in range(50):
+        row = production[1, 0, i, pdp_shift[i] :][: 60 - pud_shift[i]]
+        assert np.all(out[1, i, : pud_shift[i]] == 0)
+        assert np.allclose(out[1, i, pud_shift[i] :], row, rtol=1e-3)
+
+
+def test_shift_rows_errors():
+    array = np.ones((3, 10))
+    with pytest.raises(ValueError):
+        shift_rows(array, np.array([0, 0, 5]), np.zeros(3, dtype=int), 8)
+    with pytest.raises(ValueError):
+        shift_rows(array, np.zeros(3, dtype=int), np.zeros(3, dtype=int), 8, np.ones(8))
+
+
+def test_accumulate_axis_inplace():
+    array = np.arange(15, dtype=np.float32).reshape((3, 5))
+    expected = accumulate_axis(array, 0, 3)
+
+    assert accumulate_axis(array, 0, 3, out=array) is array
+    assert np.array_equal(array, expected)
+
+
+def test_take_per_row_strided():
+    array = np.random.uniform(size=(200, 90)).astype(np.float32)
+    start_indices = np.random.randint(0, 31, 200)
+    expected = np.array(
+        [row[start : start + 60] for row, start in zip(array, start_indices)]
+    )
+
+    # Non WI gas of a well major production tensor is not contiguous
+    production = np.zeros((200, 2, 2, 90), dtype=np.float32)
+    production[:, 1, 1] = array
+    strided = production[:, 1, 1]
+    taken = take_per_row_strided(strided, start_indices, 60)
+
+    assert not strided.flags.c_contiguous
+    assert np.array_equal(taken, expected)
+    assert strided.shape == (200, 90), "Input reshaped"
+    assert not np.shares_memory(taken, production)
+
+
+def test_take_per_row_strided_copy():
+    array = np.arange(50).reshape((5, 10))
+
+    for start_indices in [np.full(5, 3), np.array([3, 0, 6, 3, 1])]:
+        taken = take_per_row_strided(array, start_indices, 4)
+
+        assert not np.shares_memory(taken, array)
+        assert taken.flags.writeable and taken.flags.c_contiguous
+        assert np.array_equal(
+            taken, [row[start : start + 4] for row, start in zip(array, start_indices)]
+        )
+
+    with pytest.raises(ValueError):
+        take_per_row_strided(array, np.array([0, 0, 0, 0, 7]), 4)
@@ -0,0 +1,212 @@
+import numpy as np
+import pytest
+
+from calculations import (
+    net_production,
+    make_interests,
+    discount_factors,
+    well_cash_flow,
+    section_cash_flow,
+)
+from workflow import (
+    make_production,
+    make_tax,
+    make_pricing_scenarios,
+    stream_production,
+    stream_cash_flow,
+)
+from engine.tests.econ.test_workflow import make_inputs
+
+
+def make_terms(nwells, seed=0):
+    rng = np.random.RandomState(seed)
+    nri, wi = make_interests(
+        net_acres=rng.uniform(10, 320, nwells),
+        acreage=np.full(nwells, 640.0),
+        allocation=rng.uniform(0.2, 1, nwells),
+        royalty=rng.choice([0.125, 0.1875, 0.25], nwells),
+    )
+    return dict(
+        nri=nri,
+        wi=wi,
+        fixed=rng.uniform(5000, 15000, nwells),
+        var_oil=rng.uniform(1, 5, nwells),
+        var_gas=rng.uniform(0.1, 0.5, nwells),
+    )
+
+
+def reference_cash_flow(pricing, tax_rate, production, terms, discount_rates):
+    """Every intermediate as a full (2, 2, nwells, nmonths) array."""
+    nri = terms["nri"][:, None, :, None]
+    wi = terms["wi"][:, :, None]
+    var = np.array([terms["var_oil"], terms["var_gas"]])[None, :, :, None]
+
+    revenue = nri * production * pricing[None, :, None, :]
+    severance = revenue * tax_rate
+    producing = production.sum(axis=1) > 0
+    loe = wi * terms["fixed"][:, None] * producing + (
+        wi[:, None] * var * production
+    ).sum(axis=1)
+    cash_flow = revenue.sum(axis=1) - severance.sum(axis=1) - loe
+    discount = discount_factors(production.shape[-1], discount_rates)
+    npv = (cash_flow[None] * discount[:, None, None, :]).sum(axis=-1)
+    return npv, revenue.sum(axis=(1, 3)), cash_flow.sum(axis=-1)
+
+
+def make_econ(nwells, dtype=np.float32):
+    inputs = make_inputs(nwells)
+    shift = [
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    ]
+    production = make_production(
+        inputs["oil_dca_pars"], inputs["gas_dca_pars"], *shift, dtype=dtype
+    )
+    tax_rate = make_tax(0.05, 0.036, 18, nwells, *shift, dtype=dtype)
+    return inputs, production, tax_rate
+
+
+def test_net_production():
+    production = np.ones((2, 2, 3, 4), dtype=np.float32)
+    net = net_production(
+        production,
+        np.array([640.0, 640.0, 320.0]),
+        np.array([1.0, 0.5, 1.0]),
+        np.array([160.0, 160.0, 160.0]),
+    )
+    assert net.dtype == np.float32
+    assert np.allclose(net[1, 0, :, 0], [0.25, 0.125, 0.5])
+
+    with pytest.raises(ValueError):
+        net_production(production, np.ones(2), np.ones(2))
+
+
+def test_well_cash_flow():
+    nwells = 40
+    inputs, production, tax_rate = make_econ(nwells)
+    terms = make_terms(nwells)
+
+    cash_flow = well_cash_flow(
+        inputs["pricing"], tax_rate, production, discount_rates=(0.0, 0.1), **terms
+    )
+    npv, net_revenue, total = reference_cash_flow(
+        inputs["pricing"].astype(np.float64),
+        tax_rate.astype(np.float64),
+        production.astype(np.float64),
+        terms,
+        (0.0, 0.1),
+    )
+
+    assert cash_flow.npv.shape == (2, 2, nwells)
+    assert np.allclose(cash_flow.npv, npv)
+    assert np.allclose(cash_flow.net_revenue, net_revenue)
+    assert np.allclose(cash_flow.cash_flow, total)
+    assert np.allclose(cash_flow.npv[0], cash_flow.cash_flow)
+    assert np.all(np.abs(cash_flow.npv[1]) <= np.abs(cash_flow.npv[0]))
+    assert np.all(cash_flow.loe[1] == 0), "Non WI charged LOE"
+
+
+def test_well_cash_flow_float16():
+    nwells = 30
+    inputs, production, tax_rate = make_econ(nwells, np.float16)
+    terms = make_terms(nwells)
+
+    cash_flow = well_cash_flow(
+        inputs["pricing"], tax_rate, production, chunk_size=7, **terms
+    )
+    expected = well_cash_flow(
+        inputs["pricing"],
+        tax_rate.astype(np.float32),
+        production.astype(np.float32),
+        **terms,
+    )
+    for totals, expected_totals in zip(cash_flow, expected):
+        assert np.allclose(totals, expected_totals)
+
+
+def test_section_cash_flow():
+    nwells = 20
+    inputs, production, tax_rate = make_econ(nwells)
+    cash_flow = well_cash_flow(
+        inputs["pricing"], tax_rate, production, **make_terms(nwells)
+    )
+    section_idx = np.arange(nwells) % 3
+
+    sections = section_cash_flow(cash_flow, section_idx, 4)
+
+    assert sections.npv.shape == (1, 2, 4)
+    assert sections.loe.shape == (2, 4)
+    assert np.allclose(
+        sections.npv[..., 1], cash_flow.npv[..., section_idx == 1].sum(-1)
+    )
+    assert np.all(sections.cash_flow[:, 3] == 0)
+
+
+def test_stream_cash_flow():
+    nwells = 45
+    inputs, production, tax_rate = make_econ(nwells)
+    terms = make_terms(nwells)
+    shift = dict(
+        nmonths=inputs["nmonths"],
+        given_nmonths=inputs["given_nmonths"],
+        non_par_start_month=inputs["non_par_start_month"],
+        pdp_shift=inputs["pdp_shift"],
+        pud_shift=inputs["pud_shift"],
+    )
+
+    production_stream = stream_production(
+        inputs["oil_dca_pars"], inputs["gas_dca_pars"], chunk_size=10, **shift
+    )
+    streamed = stream_cash_flow(
+        production_stream, inputs["pricing"], 0.05, 0.036, 18, **shift, **terms
+    )
+    expected = well_cash_flow(inputs["pricing"], tax_rate, production, **terms)
+
+    for totals, expected_totals in zip(streamed, expected):
+        assert np.allclose(totals, expected_totals)
+
+    # Price scenarios reuse the forecasts and shifts of the stream
+    pricing = np.array([inputs["pricing"], 2 * inputs["pricing"]])
+    production_stream = stream_production(
+        inputs["oil_dca_pars"], inputs["gas_dca_pars"], chunk_size=10, **shift
+    )
+    streamed = stream_cash_flow(
+        production_stream, pricing, 0.05, 0.036, 18, **shift, **terms
+    )
+    assert streamed.npv.shape == (1, 2, 2, nwells)
+    assert np.allclose(streamed.npv[:, 0], expected.npv)
+    assert np.allclose(streamed.net_revenue[1], 2 * expected.net_revenue)
+
+
+def test_well_cash_flow_scenarios():
+    nwells = 25
+    inputs, production, tax_rate = make_econ(nwells)
+    terms = make_terms(nwells)
+    _, pricing = make_pricing_scenarios(
+        [40.0, 60.0, 80.0],
+        [2.0, 2.5, 3.0],
+        inputs["given_nmonths"],
+        np.datetime64("2019-06-01"),
+        np.float32,
+    )
+
+    cash_flow = well_cash_flow(
+        pricing, tax_rate, production, discount_rates=(0.0, 0.1), **terms
+    )
+
+    assert cash_flow.npv.shape == (2, 3, 2, nwells)
+    assert cash_flow.loe.shape == (3, 2, nwells)
+    for scenario in range(3):
+        expected = well_cash_flow(
+            pricing[scenario], tax_rate, production, discount_rates=(0.0, 0.1), **terms
+        )
+        assert np.allclose(cash_flow.npv[:, scenario], expected.npv)
+        assert np.allclose(cash_flow.cash_flow[scenario], expected.cash_flow)
+    assert np.all(np.diff(cash_flow.net_revenue, axis=0) > 0)
+
+    sections = section_cash_flow(cash_flow, np.arange(nwells) % 4, 4)
+    assert sections.npv.shape == (2, 3, 2, 4)
+    assert np.allclose(sections.npv.sum(axis=-1), cash_flow.npv.sum(axis=-1))
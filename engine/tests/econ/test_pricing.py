@@ -7,6 +7,7 @@ from pricing import (
     backward_flat_fill,
     forward_esc_fill,
     make_pricing,
+    make_pricing_cube,
 )
 from engine.tests.configtest import date_strip, price_strip
 
@@ -16,7 +17,9 @@ def test_flat_fill():
     start_date = np.datetime64("2019-01-01")
     value = 50.01
     pricing = flat_fill(periods=periods, start_date=start_date, value=value)
-    assert pricing.shape == (2, periods)
+    assert pricing.dates.shape == pricing.prices.shape == (periods,)
+    assert pricing.dates.dtype == np.dtype("datetime64[D]")
+    assert pricing.prices.dtype == np.float32
     assert np.isclose(pricing[1][1], value)
 
 
@@ -34,7 +37,9 @@ def test_forward_flat_fill(date_strip, price_strip):
         date_strip[-1].astype("datetime64[M]") + np.timedelta64(extend_by, "M")
     ).astype("datetime64[D]")
 
-    assert pricing.shape == (2, extend_by + date_strip.shape[0])
+    assert pricing.dates.shape == pricing.prices.shape
+    assert pricing.prices.shape == (extend_by + date_strip.shape[0],)
+    assert pricing.prices.dtype == np.float32
     assert np.all(pricing[1][-extend_by:] == pricing[1][-(extend_by + 1)])
     assert start_date == date_strip[0]
     assert end_date == pricing_end_date
@@ -60,7 +65,9 @@ def test_backward_flat_fill(date_strip, price_strip):
         date_strip[0].astype("datetime64[M]") - np.timedelta64(extend_by, "M")
     ).astype("datetime64[D]")
 
-    assert pricing.shape == (2, extend_by + date_strip.shape[0])
+    assert pricing.dates.shape == pricing.prices.shape
+    assert pricing.prices.shape == (extend_by + date_strip.shape[0],)
+    assert pricing.prices.dtype == np.float32
     assert np.all(pricing[1][:extend_by] == pricing[1][extend_by])
     assert end_date == date_strip[-1]
     assert start_date == pricing_start_date
@@ -81,10 +88,75 @@ def test_forward_esc_fill(date_strip, price_strip):
         date_strip[-1].astype("datetime64[M]") + np.timedelta64(extend_by, "M")
     ).astype("datetime64[D]")
 
-    assert pricing.shape == (2, extend_by + date_strip.shape[0])
-    assert (
-        pricing[1][-1]
-        == price_strip[-1] + price_strip[-1] * extend_by * escalation_factor
+    assert pricing.dates.shape == pricing.prices.shape
+    assert pricing.prices.shape == (extend_by + date_strip.shape[0],)
+    assert pricing.prices.dtype == np.float32
+    # Prices are float32
+    assert np.isclose(
+        pricing[1][-1],
+        price_strip[-1] + price_strip[-1] * extend_by * escalation_factor,
+        rtol=1e-6,
     )
     assert start_date == date_strip[0]
     assert end_date == pricing_end_date
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.float32, np.float64])
+@pytest.mark.parametrize(
+    "date_strip, price_strip",
+    [((np.datetime64("2019-01-01"), 10), (50, 60, 10))],
+    indirect=True,
+)
+def test_pricing_dtype(date_strip, price_strip, dtype):
+    pricers = [
+        ("flat_fill", dict(start_date=date_strip[0], value=50.0)),
+        ("forward_flat_fill", dict(date_strip=date_strip, price_strip=price_strip)),
+        ("backward_flat_fill", dict(date_strip=date_strip, price_strip=price_strip)),
+        (
+            "forward_esc_fill",
+            dict(
+                date_strip=date_strip, price_strip=price_strip, escalation_factor=0.03
+            ),
+        ),
+    ]
+    for strategy, kwargs in pricers:
+        pricing = make_pricing(strategy, periods=10, dtype=dtype, **kwargs)
+        assert pricing.prices.dtype == dtype, strategy
+        assert pricing.dates.dtype == np.dtype("datetime64[D]"), strategy
+
+    with pytest.raises(TypeError):
+        flat_fill(10, date_strip[0], 50.0, dtype=np.int64)
+
+
+@pytest.mark.parametrize(
+    "date_strip, price_strip",
+    [((np.datetime64("2019-01-01"), 10), (50, 60, 10))],
+    indirect=True,
+)
+def test_make_pricing_cube(date_strip, price_strip):
+    start_date = np.datetime64("2019-04-01")
+    flat_gas = dict(strategy="flat_fill", periods=24, start_date=start_date, value=2.5)
+    escalated_oil = dict(
+        strategy="forward_esc_fill",
+        periods=24,
+        date_strip=date_strip,
+        price_strip=price_strip,
+        escalation_factor=0.01,
+    )
+    scenarios = [
+        [dict(flat_gas, value=60.0), flat_gas],
+        [escalated_oil, dict(flat_gas, value=3.5)],
+    ]
+
+    pricing = make_pricing_cube(scenarios, start_date, 12)
+
+    assert pricing.prices.shape == (2, 2, 12)
+    assert pricing.prices.dtype == np.float32
+    assert pricing.dates[0] == start_date
+    assert np.all(pricing.prices[0, 0] == 60.0)
+    assert np.all(pricing.prices[1, 1] == 3.5)
+    escalated = forward_esc_fill(24, date_strip, price_strip, 0.01).prices
+    assert np.array_equal(pricing.prices[1, 0], escalated[3:15])
+
+    with pytest.raises(ValueError):
+        make_pricing_cube(scenarios, start_date, 36)
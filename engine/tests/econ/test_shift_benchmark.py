@@ -0,0 +1,39 @@
+import numpy as np
+
+from array_manipulations import take_per_row_strided, shift_rows
+from engine.tests.benchmark_tools import pytest_benchmark
+from engine.tests.econ.shift_benchmark import (
+    take_per_row_strided_legacy,
+    append_zeroes_front_legacy,
+    make_shift_inputs,
+    run_shift_benchmark,
+    format_shift_benchmark,
+)
+
+
+def test_shift_matches_legacy():
+    production, pdp_shift, pud_shift = make_shift_inputs(300, 120)
+
+    taken = take_per_row_strided(production, pdp_shift, 120)
+    assert np.array_equal(
+        taken, take_per_row_strided_legacy(production.copy(), pdp_shift, 120)
+    )
+    assert np.array_equal(
+        shift_rows(production, pdp_shift, pud_shift, 120),
+        append_zeroes_front_legacy(taken, pud_shift, 120),
+    )
+
+
+def test_shift_benchmark():
+    result = run_shift_benchmark(nwells=1000, nmonths=120, repeat=1)
+
+    assert result["take"] > 0 and result["shift"] > 0
+    assert format_shift_benchmark(result).startswith("1000 wells x 120 months")
+
+
+def test_shift_benchmark_pytest_benchmark(request):
+    benchmark = pytest_benchmark(request)
+
+    production, pdp_shift, pud_shift = make_shift_inputs(10000)
+    out = np.empty((10000, 600), dtype=production.dtype)
+    benchmark(shift_rows, production, pdp_shift, pud_shift, 600, out)
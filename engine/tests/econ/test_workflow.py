@@ -0,0 +1,237 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from forecast_cache import ForecastCache
+from workflow import (
+    make_dca_pars,
+    make_pricing,
+    make_production,
+    make_tax,
+    build_econ_tensors,
+    well_econ,
+    stream_production,
+    stream_well_econ,
+    accumulate_well_econ,
+    sample_stream_workflow,
+)
+
+
+def make_inputs(nwells, given_nmonths=120, seed=0):
+    np.random.seed(seed)
+    shift_months = np.random.randint(low=-24, high=24, size=nwells)
+    nmonths = int(np.abs(np.min(shift_months)) + given_nmonths)
+    start_date = np.datetime64("2019-06-01")
+    _, pricing = make_pricing(60.0, 2.5, given_nmonths, start_date, np.float32)
+
+    return dict(
+        oil_dca_pars=make_dca_pars(nwells, np.float32),
+        gas_dca_pars=make_dca_pars(nwells, np.float32),
+        pricing=pricing,
+        nmonths=nmonths,
+        given_nmonths=given_nmonths,
+        non_par_start_month=6,
+        pdp_shift=np.where(shift_months < 0, -shift_months, 0),
+        pud_shift=np.where(shift_months > 0, shift_months, 0),
+    )
+
+
+def run_stream(inputs, chunk_size, section_idx=None, nsections=0):
+    shift = dict(
+        nmonths=inputs["nmonths"],
+        given_nmonths=inputs["given_nmonths"],
+        non_par_start_month=inputs["non_par_start_month"],
+        pdp_shift=inputs["pdp_shift"],
+        pud_shift=inputs["pud_shift"],
+    )
+    production_stream = stream_production(
+        inputs["oil_dca_pars"], inputs["gas_dca_pars"], chunk_size=chunk_size, **shift
+    )
+    econ_stream = stream_well_econ(
+        production_stream, inputs["pricing"], 0.05, 0.036, 18, **shift
+    )
+    return accumulate_well_econ(
+        econ_stream, inputs["given_nmonths"], section_idx, nsections
+    )
+
+
+def test_well_econ():
+    inputs = make_inputs(10)
+    production = np.ones((2, 2, 10, 120), dtype=np.float32)
+    tax_rate = np.full((2, 2, 10, 120), 0.05, dtype=np.float32)
+    _, _, tax, revenue, profit = well_econ(inputs["pricing"], tax_rate, production)
+
+    assert np.allclose(revenue[:, 0], 60.0)
+    assert np.allclose(revenue[:, 1], 2.5)
+    assert np.allclose(profit, revenue - tax)
+
+
+def test_stream_well_econ():
+    nwells = 50
+    inputs = make_inputs(nwells)
+    section_idx = np.arange(nwells) % 7
+
+    production = make_production(
+        inputs["oil_dca_pars"],
+        inputs["gas_dca_pars"],
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    )
+    tax_rate = make_tax(
+        0.05,
+        0.036,
+        18,
+        nwells,
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    )
+    _, _, tax, revenue, profit = well_econ(inputs["pricing"], tax_rate, production)
+
+    monthly, sections = run_stream(inputs, 16, section_idx, 7)
+
+    assert np.allclose(monthly["production"], production.sum(axis=2), rtol=1e-5)
+    assert np.allclose(monthly["profit_without_expense"], profit.sum(axis=2), rtol=1e-5)
+    assert sections["revenue"].shape == (7, 2, 2)
+    assert np.allclose(sections["revenue"].sum(axis=0), revenue.sum(axis=(2, 3)))
+    assert np.allclose(
+        sections["tax"][3], tax[:, :, section_idx == 3].sum(axis=(2, 3)), rtol=1e-5
+    )
+
+
+def test_stream_memory():
+    peaks = list()
+    for nwells in [400, 1600]:
+        inputs = make_inputs(nwells)
+        tracemalloc.start()
+        run_stream(inputs, 100)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    assert peaks[1] < 1.2 * peaks[0], "Memory grows with the number of wells"
+
+
+def test_sample_stream_workflow():
+    monthly, sections = sample_stream_workflow(
+        nwells=300, nmonths=60, nsections=10, chunk_size=100
+    )
+    assert monthly["revenue"].shape == (2, 2, 60)
+    assert sections["revenue"].shape == (10, 2, 2)
+    assert np.isclose(monthly["revenue"].sum(), sections["revenue"].sum())
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.float32, np.float64])
+def test_econ_dtype(dtype):
+    inputs = make_inputs(20)
+    shift = [
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    ]
+    money_dtype = np.float32 if dtype == np.float16 else dtype
+
+    production = make_production(
+        inputs["oil_dca_pars"], inputs["gas_dca_pars"], *shift, dtype=dtype
+    )
+    tax_rate = make_tax(0.05, 0.036, 18, 20, *shift, dtype=dtype)
+    start_date = np.datetime64("2019-06-01")
+    _, pricing = make_pricing(60.0, 2.5, inputs["given_nmonths"], start_date, dtype)
+    pricing, production, tax, revenue, profit = well_econ(pricing, tax_rate, production)
+
+    assert production.dtype == tax_rate.dtype == pricing.dtype == dtype
+    assert tax.dtype == revenue.dtype == profit.dtype == money_dtype
+    assert np.all(np.isfinite(revenue)), "Revenue overflowed"
+
+    reference = make_production(
+        inputs["oil_dca_pars"], inputs["gas_dca_pars"], *shift, dtype=np.float64
+    )
+    rtol = 1e-2 if dtype == np.float16 else 1e-5
+    assert np.allclose(production, reference, rtol=rtol, atol=rtol)
+
+
+def test_make_tax_shared_products():
+    inputs = make_inputs(10)
+    tax_rate = make_tax(
+        0.05,
+        0.036,
+        18,
+        10,
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    )
+
+    assert tax_rate.shape == (2, 2, 10, inputs["given_nmonths"])
+    assert tax_rate.flags.writeable and tax_rate.flags.c_contiguous
+    assert np.array_equal(tax_rate[:, 0], tax_rate[:, 1])
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.float32])
+def test_build_econ_tensors(dtype):
+    nwells = 70
+    inputs = make_inputs(nwells)
+    shift = [
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    ]
+    dca_pars = [inputs["oil_dca_pars"], inputs["gas_dca_pars"]]
+
+    tax_rate, production = build_econ_tensors(
+        *dca_pars, 0.05, 0.036, 18, *shift, dtype=dtype, workers=3, chunk_size=16
+    )
+    serial = build_econ_tensors(
+        *dca_pars, 0.05, 0.036, 18, *shift, dtype=dtype, workers=1, chunk_size=nwells
+    )
+
+    assert production.dtype == tax_rate.dtype == dtype
+    assert np.array_equal(tax_rate, serial[0])
+    assert np.array_equal(production, serial[1]), "Result depends on the workers"
+    assert np.array_equal(
+        tax_rate, make_tax(0.05, 0.036, 18, nwells, *shift, dtype=dtype)
+    )
+    assert np.array_equal(production, make_production(*dca_pars, *shift, dtype=dtype))
+
+
+def test_build_econ_tensors_forecast_cache():
+    nwells = 40
+    inputs = make_inputs(nwells)
+    shift = [
+        inputs["nmonths"],
+        inputs["given_nmonths"],
+        inputs["non_par_start_month"],
+        inputs["pdp_shift"],
+        inputs["pud_shift"],
+    ]
+    dca_pars = [inputs["oil_dca_pars"], inputs["gas_dca_pars"]]
+    cache = ForecastCache()
+
+    _, production = build_econ_tensors(
+        *dca_pars,
+        0.05,
+        0.036,
+        18,
+        *shift,
+        workers=3,
+        chunk_size=16,
+        forecast_cache=cache,
+    )
+
+    assert cache.misses == 2 * nwells and len(cache) == 2 * nwells
+    assert np.array_equal(
+        production, make_production(*dca_pars, *shift, forecast_cache=cache)
+    )
+    assert cache.hits == 2 * nwells
+    assert np.allclose(production, make_production(*dca_pars, *shift), rtol=1e-4)
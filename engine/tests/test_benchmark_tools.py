@@ -0,0 +1,45 @@
+import numpy as np
+
+from engine.tests.benchmark_tools import (
+    benchmark_main,
+    best_time,
+    format_times,
+    time_functions,
+    timed,
+)
+
+
+def test_time_functions():
+    calls = list()
+
+    def record(*args):
+        calls.append(args)
+        return np.sum(args)
+
+    assert timed(record, 1, 2)[0] == 3
+    assert best_time(record, 1, 2, repeat=4) >= 0
+    assert len(calls) == 5
+
+    calls.clear()
+    times = time_functions(dict(a=record, b=record), (1, 2), repeat=2, warmup_args=(0,))
+
+    assert list(times) == ["a", "b"]
+    assert calls == [(0,), (0,), (1, 2), (1, 2), (1, 2), (1, 2)]
+    assert format_times("2 functions", dict(a=0.5, long_name=1.25)) == (
+        "2 functions\n  a          0.5000 s\n  long_name  1.2500 s"
+    )
+
+
+def test_benchmark_main(capsys):
+    runs = list()
+
+    def run(nwells, loss, noise):
+        runs.append((nwells, loss, noise))
+        return dict(nwells=nwells)
+
+    options = dict(nwells=[10, 20], loss="rmse", noise=0.1)
+    benchmark_main("Benchmark.\n\nMore.", run, str, options, ["--noise", "0.5"])
+    benchmark_main("Benchmark.", run, str, options, ["--nwells", "5"])
+
+    assert runs == [(10, "rmse", 0.5), (20, "rmse", 0.5), (5, "rmse", 0.1)]
+    assert capsys.readouterr().out.splitlines()[0] == "{'nwells': 10}"
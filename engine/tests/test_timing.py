@@ -0,0 +1,114 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from timing import (
+    timing,
+    timing_dtype,
+    make_section_timing_inputs,
+    TIMING_FIELDS,
+    WELL_NUMBER_FIELDS,
+    PLACEHOLDER_DATE,
+    _TIMING_METHODS,
+)
+from engine.tests.timing_benchmark import make_timing_inputs
+
+
+def make_section(**columns):
+    inputs = make_section_timing_inputs(np.array(["A"]), **columns)
+    return inputs.well_numbers, inputs.well_dates
+
+
+# Every method timed by the benchmark against the serial loop
+@pytest.mark.parametrize(
+    "method", [method for method in _TIMING_METHODS if method != "serial"]
+)
+def test_timing_methods(method):
+    well_numbers, well_dates = make_timing_inputs(5000)
+    valuation_date = np.datetime64("2020-01-01")
+
+    expected = timing(well_numbers, well_dates, valuation_date, method="serial")
+    result = timing(well_numbers, well_dates, valuation_date, method=method)
+
+    assert result.dtype == timing_dtype(np.uint8)
+    assert result.shape == (5000,)
+    for name in TIMING_FIELDS:
+        assert np.array_equal(result[name], expected[name]), name
+
+
+@pytest.mark.parametrize("method", ["serial", "select"])
+def test_timing_cascade(method):
+    # f1001 wells drilled after the f1000 permits win over them
+    well_numbers, well_dates = make_section(
+        nwells_1=6,
+        tolerance_1=5,
+        f1001_nwells=2,
+        f1000_nwells=3,
+        f1001_last_date="2019-06-01",
+        f1001_first_date="2019-01-01",
+        f1000_last_date="2019-01-01",
+    )
+    result = timing(well_numbers, well_dates, datetime.date(2020, 1, 1), method=method)
+
+    assert result["nwells_curr"][0] == 2
+    assert result["spud_date_curr"][0] == np.datetime64("2019-01-01")
+    assert result["sales_date_curr"][0] == np.datetime64("2019-01-01") + 2 * 20 + 45
+    assert result["nwells_fut"][0] == 4
+    assert result["spud_date_fut"][0] == np.datetime64("2020-01-01") + 365 * 3
+
+    # More current wells than planned leave no future wells
+    well_numbers[0] = 1
+    result = timing(well_numbers, well_dates, "2020-01-01", method=method)
+    assert result["nwells_fut"][0] == 0
+    assert result["spud_date_fut"][0] == PLACEHOLDER_DATE
+
+
+def test_timing_valuation_date():
+    well_numbers, well_dates = make_timing_inputs(100)
+    early = timing(well_numbers, well_dates, "2020-01-01")
+    late = timing(well_numbers, well_dates, "2021-01-01")
+
+    has_fut = early["nwells_fut"] > 0
+    assert np.all(
+        late["spud_date_fut"][has_fut] - early["spud_date_fut"][has_fut]
+        == np.timedelta64(366, "D")
+    )
+    assert np.array_equal(early["spud_date_curr"], late["spud_date_curr"])
+
+
+def test_timing_errors():
+    well_numbers, well_dates = make_timing_inputs(10)
+    with pytest.raises(TypeError):
+        timing(well_numbers, well_dates, "2020-01-01", method="loop")
+    with pytest.raises(ValueError):
+        timing(well_numbers[:9], well_dates, "2020-01-01")
+
+
+def test_section_timing_inputs():
+    inputs = make_section_timing_inputs(
+        np.array(["A", "B", "C"]),
+        nwells_1=[6, 4, None],
+        tolerance_1=[5, 3, 3],
+        f1000_nwells=[2, 0, 1],
+        f1000_last_date=[datetime.date(2019, 1, 1), None, "2018-06-01"],
+    )
+
+    assert len(inputs) == 3
+    assert inputs.well_numbers.shape == (len(WELL_NUMBER_FIELDS), 3)
+    assert inputs.well_numbers.dtype == np.uint8
+    assert inputs.well_dates.dtype == np.dtype("M8[D]")
+    assert np.array_equal(inputs["nwells_1"], [6, 4, 0])
+    assert np.isnat(inputs["f1000_last_date"][1])
+    assert np.all(np.isnat(inputs["order_date"]))
+
+    # Columns are views, the blocks are what timing consumes
+    inputs["app_nwells"][2] = 1
+    assert inputs.well_numbers[WELL_NUMBER_FIELDS.index("app_nwells"), 2] == 1
+    expected = timing(inputs.well_numbers, inputs.well_dates, "2020-01-01")
+    assert np.array_equal(inputs.timing("2020-01-01"), expected)
+
+    with pytest.raises(KeyError):
+        inputs["nwells_3"]
+    with pytest.raises(ValueError):
+        make_section_timing_inputs(np.array(["A"]), nwells_3=[1])
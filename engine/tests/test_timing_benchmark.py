@@ -0,0 +1,23 @@
+import numpy as np
+
+from timing import timing
+from engine.tests.benchmark_tools import pytest_benchmark
+from engine.tests.timing_benchmark import (
+    make_timing_inputs,
+    run_timing_benchmark,
+    format_timing_benchmark,
+)
+
+
+def test_timing_benchmark():
+    result = run_timing_benchmark(nsections=1000, repeat=1)
+
+    assert result["serial"] > 0 and result["select"] > 0
+    assert format_timing_benchmark(result).startswith("1000 sections")
+
+
+def test_timing_benchmark_pytest_benchmark(request):
+    benchmark = pytest_benchmark(request)
+
+    well_numbers, well_dates = make_timing_inputs(100000)
+    benchmark(timing, well_numbers, well_dates, np.datetime64("2020-01-01"))
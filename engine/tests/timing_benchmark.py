@@ -0,0 +1,67 @@
+"""
+Section timing benchmark.
+
+Times every timing method, the serial and parallel numba loops and the np.select
+formulation, on random sections.
+
+    python -m engine.tests.timing_benchmark --nsections 100000
+
+The source roots (engine/core, ...) have to be on PYTHONPATH, the same as for the tests.
+"""
+
+from functools import partial
+
+import numpy as np
+
+from timing import timing, _TIMING_METHODS
+from engine.tests.benchmark_tools import benchmark_main, format_times, time_functions
+
+
+def make_timing_inputs(nsections, seed=0):
+    """
+    Random well_numbers and well_dates, about a fifth of the dates are NaT and
+    every source of current wells is missing for half of the sections.
+    """
+    rng = np.random.RandomState(seed)
+    well_numbers = rng.randint(0, 8, (10, nsections)).astype(np.uint8)
+    well_numbers[4:8] *= (rng.uniform(size=(4, nsections)) < 0.5).astype(np.uint8)
+
+    well_dates = np.datetime64("2015-01-01", "D") + rng.randint(0, 2000, (8, nsections))
+    well_dates[rng.uniform(size=(8, nsections)) < 0.2] = np.datetime64("NaT")
+    return well_numbers, well_dates
+
+
+def run_timing_benchmark(nsections=100000, repeat=3, seed=0):
+    """
+    Best wall time of repeat runs of every timing method.
+
+    :return: dict
+        nsections and the seconds of every method
+    """
+    well_numbers, well_dates = make_timing_inputs(nsections, seed)
+    valuation_date = np.datetime64("2020-01-01")
+
+    functions = {method: partial(timing, method=method) for method in _TIMING_METHODS}
+    times = time_functions(
+        functions,
+        (well_numbers, well_dates, valuation_date),
+        repeat,
+        warmup_args=(well_numbers[:, :1], well_dates[:, :1], valuation_date),
+    )
+    return dict(nsections=nsections, **times)
+
+
+def format_timing_benchmark(result):
+    times = {method: result[method] for method in _TIMING_METHODS}
+    return format_times(f"{result['nsections']} sections", times)
+
+
+def main(argv=None):
+    options = dict(nsections=[100000], repeat=3, seed=0)
+    benchmark_main(
+        __doc__, run_timing_benchmark, format_timing_benchmark, options, argv
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Precision policy of the engine.
+
+Decline fits run in FIT_DTYPE, the optimizer takes differences of the losses of
+nearby parameters and needs float64.
+
+Forecasts and the econ stack run in one of ECON_DTYPES, float32 by default, and never
+upcast their intermediate arrays. float16 is a storage dtype: volumes, rates and
+prices are held in float16 but computed in float32, and money (revenue, tax, profit)
+stays in float32 as float16 overflows above 65504. Totals over wells are small and
+accumulate in float64.
+"""
+
+import numpy as np
+
+FIT_DTYPE = np.dtype(np.float64)
+ECON_DTYPES = (np.dtype(np.float16), np.dtype(np.float32), np.dtype(np.float64))
+
+
+def econ_dtype(dtype=np.float32) -> np.dtype:
+    """
+    Checks dtype is one of ECON_DTYPES.
+
+    Examples
+    --------
+    >>> econ_dtype("float16")
+    dtype('float16')
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in ECON_DTYPES:
+        raise TypeError(f"{dtype} not an econ dtype.")
+    return dtype
+
+
+def compute_dtype(dtype) -> np.dtype:
+    """
+    dtype the arithmetic of an econ dtype runs in, float16 is computed in float32.
+
+    Examples
+    --------
+    >>> compute_dtype(np.float16)
+    dtype('float32')
+    >>> compute_dtype(np.float64)
+    dtype('float64')
+    """
+    dtype = econ_dtype(dtype)
+    return np.dtype(np.float32) if dtype == np.float16 else dtype
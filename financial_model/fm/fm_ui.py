@@ -211,6 +211,55 @@ def set_dca_pars():
     )
 
 
+@xl_macro
+def set_dca_forecast():
+    """
+    Copies the forecasted production of the selected well and the sum of the PDP wells
+    of the selected section to the Producing sheet.
+    The forecasts come from the forecast cache of the data manager, flipping between
+    wells and sections does not forecast the wells again.
+    """
+    xl = xl_app()
+    dm = get_cached_object(get_value("data_obj_manager", xl=xl))
+    selected_well = get_value("fm_fn_producing_well_name", xl=xl)
+    selected_section = get_value("fm_fn_producing_section", xl=xl)
+    mprod = dm.get_forecast_months()
+
+    well_apis = np.array(
+        dm.session.query(Well_Oneline.api)
+        .filter(Well_Oneline.well_str == selected_well)
+        .all()
+    ).ravel()
+    section_apis = np.unique(
+        np.array(
+            dm.session.query(Well_Oneline.api)
+            .join(Section_Well)
+            .filter(
+                and_(
+                    Well_Oneline.well_type == "PDP",
+                    Section_Well.trsm_heh == selected_section,
+                )
+            )
+            .all()
+        )
+    )
+
+    forecast = pd.DataFrame({"Month": np.arange(1, mprod + 1)})
+    for product in ["oil", "gas"]:
+        well = dm.get_forecasts(well_apis, product, mprod)
+        section = dm.get_forecasts(section_apis, product, mprod)
+        forecast[f"Well {product.capitalize()}"] = np.nansum(well, axis=0)
+        forecast[f"Section {product.capitalize()}"] = np.nansum(section, axis=0)
+
+    copy_df_xl(
+        df=forecast,
+        sheet="Producing",
+        name="fm_fn_producing_dca_forecast",
+        copy_columns=True,
+        xl=xl,
+    )
+
+
 @xl_macro
 def set_well_list(xl=None):
     dm = get_cached_object(get_value("data_obj_manager", xl=xl))
@@ -15,9 +15,14 @@ from generic_tfs import (
 )
 from generic_type_hints import SQLTable
 from generic_utils import ccast
+from production_layout import ProductionLayout
 
 
 class FMDataLoader(DataLoader):
+    def __init__(self):
+        super(FMDataLoader, self).__init__()
+        self.production_layout = None  # type: ProductionLayout
+
     def sections(self, df: pd.DataFrame, table: SQLTable) -> pd.DataFrame:
         self._log.debug(f"Cleaning {whoami()}")
         if self.column_check(df.columns.tolist(), table):
@@ -88,6 +93,8 @@ class FMDataLoader(DataLoader):
 
             df = self.helper_add_missing_dates(df)
 
+            # Loads append, so the layout is rebuilt from the whole session table.
+            self.production_layout = None
             return df
 
     def increased_densities(self, df: pd.DataFrame, table: SQLTable) -> pd.DataFrame:
@@ -1,7 +1,23 @@
+import os
+import sqlite3
+import sys
 from datetime import datetime
+from itertools import chain
 
 import numpy as np
 import pandas as pd
+from sqlalchemy import (
+    String,
+    and_,
+    bindparam,
+    case,
+    distinct,
+    event,
+    func,
+    inspect,
+    select,
+    type_coerce,
+)
 
 from fm_data_model import (
     fm_data_formatter as data_formatter,
@@ -9,11 +25,51 @@ from fm_data_model import (
 )
 
 from generic_data_manager import DataManager
+from generic_exceptions import ErrorFindingProjectParameter
 from generic_fns import get_curr_first_dom, array_to_sql_string, ParametersParser
 from generic_objects import QueryManager, SourceConnector
+from generic_type_hints import SQLTable
 
-from fm_orm import Project_Parameter
+from fm_orm import (
+    Project_Parameter,
+    Well_Oneline,
+    Dca_Forecast,
+    Project_State_Asset,
+    Section,
+    Section_Assumption,
+    Section_Well,
+    Section_Oneline,
+    Section_Timing,
+    Increased_Density,
+    f1000,
+    f1001,
+    f1002,
+)
 import fm_orm as orm
+from decline_models import get_decline_model
+from forecast_cache import ForecastCache
+from production_layout import ProductionLayout, make_production_layout
+from timing import (
+    SectionTimingInputs,
+    make_section_timing_inputs,
+    timing_dtype,
+    TIMING_FIELDS,
+)
+
+# rank() over, used for the latest increased densities, came with SQLite 3.25
+SQLITE_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25)
+
+# Tables the section timing is built from, with the column tying their rows to the
+# sections and the columns the timing reads, None for all of them
+TIMING_SOURCES = {
+    "section_assumptions": ("trsm_heh", None),
+    "section_wells": ("trsm_heh", None),
+    "increased_densities": ("trsm_heh", None),
+    "f1000s": ("api", None),
+    "f1001s": ("api", None),
+    "f1002s": ("api", None),
+    "well_onelines": ("api", ["norm_formation"]),
+}
 
 
 class FMDataManager(DataManager):
@@ -33,12 +89,15 @@ class FMDataManager(DataManager):
     ):
 
         self._data_model = "fm"
-        self._data_model_version = "0.2"
+        self._data_model_version = "0.7"
 
         super(FMDataManager, self).__init__(cfg, qm, sc, dl, df, orm, restore, echo)
 
         self.did_data_change = False
         self.is_session_saved = False
+        self.forecast_cache = None  # type: ForecastCache
+
+        event.listen(self.session, "after_flush", self._set_flushed_timings_dirty)
 
     def check_compatibility(self):
         self.check_data_model()
@@ -89,6 +148,74 @@ class FMDataManager(DataManager):
     def get_apis(self) -> np.ndarray:
         return self["section_wells"].api.unique()
 
+    def get_production_layout(self) -> ProductionLayout:
+        """
+        Grouped production of every well in monthlies.
+        Built from the session db, and again after every load of monthlies.
+        """
+        if self.data_loader.production_layout is None:
+            df = self["monthlies"].sort_values(by=["api", "date"])
+            self.data_loader.production_layout = make_production_layout(
+                df.api.values, oil=df.oil.values, gas=df.gas.values
+            )
+
+        return self.data_loader.production_layout
+
+    def get_dca_pars(self, apis: np.ndarray, model: str = "mod_arps") -> dict:
+        """
+        Stored DCA parameters of the given apis to warm start a decline.
+
+        :param apis: np.ndarray (nwells,)
+        :param model: str
+            Decline model the parameters are fitted with.
+        :return: dict
+            product to np.ndarray (npars, nwells) of the model parameters.
+            NaN for wells that were never declined with the model.
+        """
+        npars = get_decline_model(model).npars
+        stored = {
+            api: (dca_model, pars_oil, pars_gas)
+            for api, dca_model, pars_oil, pars_gas in self._query_well_onelines(
+                apis,
+                Well_Oneline.dca_model,
+                Well_Oneline.dca_pars_oil,
+                Well_Oneline.dca_pars_gas,
+            )
+        }
+
+        dca_pars = dict(
+            oil=np.full((npars, apis.shape[0]), np.nan),
+            gas=np.full((npars, apis.shape[0]), np.nan),
+        )
+        for i, api in enumerate(apis.astype("int64")):
+            dca_model, pars_oil, pars_gas = stored.get(int(api), (None, None, None))
+            if dca_model == model:
+                dca_pars["oil"][:, i] = pars_oil
+                dca_pars["gas"][:, i] = pars_gas
+
+        return dca_pars
+
+    def _query_well_onelines(self, apis: np.ndarray, *columns) -> list:
+        """
+        api and the given columns of the well onelines of the given apis.
+        The apis are filtered in chunks of 500 to stay under the SQLite variable limit.
+        """
+        apis = [int(api) for api in np.unique(apis)]
+        rows = list()
+        for start in range(0, len(apis), 500):
+            rows.extend(
+                self.session.query(Well_Oneline.api, *columns)
+                .filter(Well_Oneline.api.in_(apis[start : start + 500]))
+                .all()
+            )
+        return rows
+
+    def get_dca_hashes(self) -> dict:
+        """
+        Hash stored with the DCA parameters of every well, None if never declined.
+        """
+        return dict(self.session.query(Well_Oneline.api, Well_Oneline.dca_hash).all())
+
     def set_par(self, name: str, value: str):
         self._log.info(f"Setting {name} to {value}")
         with self.session_scope() as session:
@@ -141,3 +268,675 @@ class FMDataManager(DataManager):
         ]
 
         return bounds
+
+    def get_dca_model(self) -> str:
+        """
+        Name of the decline model used to decline wells.
+        Read from the sett_dca_model project parameter, defaults to mod_arps.
+        """
+        try:
+            return self.get_par("sett_dca_model")
+        except ErrorFindingProjectParameter:
+            return "mod_arps"
+
+    def get_dca_loss(self) -> str:
+        """
+        Loss minimized to decline wells, rmse, squares, huber or log_squares.
+        Read from the sett_dca_loss project parameter, defaults to rmse.
+        """
+        try:
+            return self.get_par("sett_dca_loss")
+        except ErrorFindingProjectParameter:
+            return "rmse"
+
+    def get_dca_loss_options(self) -> dict:
+        """
+        Keyword arguments of the loss minimized to decline wells.
+        The delta of huber is read from the sett_dca_huber_delta project parameter,
+        defaults to 0.1.
+        """
+        if self.get_dca_loss() != "huber":
+            return dict()
+
+        try:
+            return dict(delta=self.get_par("sett_dca_huber_delta", tf=float))
+        except ErrorFindingProjectParameter:
+            return dict(delta=0.1)
+
+    def get_dca_workers(self) -> int:
+        """
+        Number of worker processes used to decline wells.
+        Read from dca_workers in the PROJECT section of the config, defaults to 1.
+        """
+        return self.cfg["PROJECT"].getint("dca_workers", fallback=1)
+
+    def get_dca_python(self) -> str:
+        """
+        Python interpreter of the decline worker processes, inside Excel the process
+        executable is Excel itself.
+        Read from dca_python in the PROJECT section of the config, defaults to the
+        pythonw.exe of the virtualenv, Scripts\\pythonw.exe, or of the python install.
+        """
+        configured = self.cfg["PROJECT"].get("dca_python", fallback=None)
+        if configured:
+            candidates = [configured]
+        else:
+            candidates = [
+                os.path.join(sys.exec_prefix, "Scripts", "pythonw.exe"),
+                os.path.join(sys.exec_prefix, "pythonw.exe"),
+            ]
+
+        for path in candidates:
+            if os.path.isfile(path):
+                return path
+        raise FileNotFoundError(
+            f"No python for the decline workers at {' or '.join(candidates)},"
+            f" set dca_python in the PROJECT section of the config"
+        )
+
+    def get_dca_warm_start(self) -> bool:
+        """
+        Whether a decline starts from the stored DCA parameters of the wells.
+        Read from dca_warm_start in the PROJECT section of the config, defaults to False.
+        """
+        return self.cfg["PROJECT"].getboolean("dca_warm_start", fallback=False)
+
+    def get_dca_chunk_size(self) -> int:
+        """
+        Number of wells fitted together in a single optimizer call.
+        Read from dca_chunk_size in the PROJECT section of the config, defaults to 100.
+        """
+        return self.cfg["PROJECT"].getint("dca_chunk_size", fallback=100)
+
+    def get_econ_limit(self, product: str) -> float:
+        """
+        Monthly rate below which a well is not economic.
+        Read from the sett_econ_limit_oil and sett_econ_limit_gas project parameters,
+        defaults to 30 bbl and 300 mcf.
+        """
+        try:
+            return float(self.get_par(f"sett_econ_limit_{product}"))
+        except ErrorFindingProjectParameter:
+            return dict(oil=30.0, gas=300.0)[product]
+
+    def get_max_well_life(self) -> int:
+        """
+        Cap on the months a well produces after its IP month.
+        Read from max_well_life in the PROJECT section of the config, defaults to 600.
+        """
+        return self.cfg["PROJECT"].getint("max_well_life", fallback=600)
+
+    def set_section_reserves(self) -> int:
+        """
+        Rolls the reserves of the wells up to their sections by trsm_heh, and writes
+        them to section_onelines in one statement. The counts and dates set by
+        set_section_onelines are kept.
+        Every well counts for its allocation to the section, the proxy allocation
+        when the allocation is unknown and fully when both are.
+
+        Returns
+        -------
+        Number of sections updated
+        """
+        allocation = func.coalesce(
+            Section_Well.allocation, Section_Well.proxy_allocation, 1.0
+        )
+        names = ["eur_oil", "eur_gas", "remaining_oil", "remaining_gas"]
+        reserves = (
+            self.session.query(
+                Section_Well.trsm_heh,
+                *[
+                    func.sum(getattr(Well_Oneline, name) * allocation).label(name)
+                    for name in names
+                ],
+            )
+            .join(Well_Oneline, Well_Oneline.api == Section_Well.api)
+            .group_by(Section_Well.trsm_heh)
+            .subquery()
+        )
+
+        # Replacing a row drops it, the columns not rolled up here are carried over.
+        table = Section_Oneline.__table__
+        columns = {name: column for name, column in reserves.c.items()}
+        for name in table.columns.keys():
+            if name not in columns:
+                columns[name] = table.c[name]
+
+        query = self.session.query(*columns.values()).outerjoin(
+            table, table.c.trsm_heh == reserves.c.trsm_heh
+        )
+        statement = (
+            table.insert()
+            .prefix_with("OR REPLACE")
+            .from_select(list(columns), query.statement)
+        )
+        with self.session_scope() as session:
+            nrows = session.execute(statement).rowcount
+
+        self._log.info(f"Rolled up the reserves of {nrows} sections")
+        return nrows
+
+    def get_well_interests(self) -> dict:
+        """
+        Terms of every asset held in the section of every well, the inputs of
+        calculations.make_interests and calculations.well_cash_flow.
+        A well in several sections, or in a section with several assets, has a row
+        for each. Unknown allocations are taken as in set_section_reserves and
+        unknown expenses as 0.
+
+        Returns
+        -------
+        dict of np.ndarray (nrows,)
+            api, trsm_heh, allocation, acreage, net_acres, royalty, fixed, var_oil
+            and var_gas
+        """
+        columns = {
+            "api": Section_Well.api,
+            "trsm_heh": Section_Well.trsm_heh,
+            "allocation": func.coalesce(
+                Section_Well.allocation, Section_Well.proxy_allocation, 1.0
+            ),
+            "acreage": func.coalesce(Section.acres, 640.0),
+            "net_acres": Project_State_Asset.net_acres,
+            "royalty": Project_State_Asset.royalty,
+            "fixed": func.coalesce(Project_State_Asset.fixed, 0.0),
+            "var_oil": func.coalesce(Project_State_Asset.var_oil, 0.0),
+            "var_gas": func.coalesce(Project_State_Asset.var_gas, 0.0),
+        }
+        rows = (
+            self.session.query(*columns.values())
+            .join(
+                Project_State_Asset,
+                Project_State_Asset.trsm_heh == Section_Well.trsm_heh,
+            )
+            .outerjoin(Section, Section.trsm_heh == Section_Well.trsm_heh)
+            .order_by(Section_Well.trsm_heh, Section_Well.api)
+            .all()
+        )
+
+        dtypes = dict(api=np.int64, trsm_heh=object)
+        values = list(zip(*rows)) if rows else [[] for _ in columns]
+        return {
+            name: np.array(column, dtype=dtypes.get(name, np.float64))
+            for name, column in zip(columns, values)
+        }
+
+    def get_section_timing_inputs(self, sections=None) -> SectionTimingInputs:
+        """
+        Timing inputs of every section with assumptions, aggregated in the session db.
+        Restricted to the trsm_heh selected by sections, a select, when given.
+
+        Per section, the f1000 permits and f1001 spuds are the wells with a date, and
+        the f1002 completions are split by the normalized formation of the well
+        (the reported one when not normalized) matching formation 1 or 2. The app
+        and order wells are the increased densities of the latest app and order.
+
+        Returns
+        -------
+        SectionTimingInputs ordered by trsm_heh
+        """
+        assumptions = self.session.query(
+            Section_Assumption.trsm_heh,
+            Section_Assumption.nwells_1,
+            Section_Assumption.tolerance_1,
+            Section_Assumption.nwells_2,
+            Section_Assumption.tolerance_2,
+        ).order_by(Section_Assumption.trsm_heh)
+        if sections is not None:
+            assumptions = assumptions.filter(Section_Assumption.trsm_heh.in_(sections))
+        assumptions = assumptions.all()
+
+        trsm_heh = [section.trsm_heh for section in assumptions]
+        columns = {
+            name: [getattr(section, name) for section in assumptions]
+            for name in ["nwells_1", "tolerance_1", "nwells_2", "tolerance_2"]
+        }
+
+        def by_section(query, names):
+            rows = {row[0]: row[1:] for row in query.all()}
+            for i, name in enumerate(names):
+                columns[name] = [
+                    rows[section][i] if section in rows else None
+                    for section in trsm_heh
+                ]
+
+        for form, date, prefix in [
+            (f1000, f1000.permit_date, "f1000"),
+            (f1001, f1001.spud_date, "f1001"),
+        ]:
+            by_section(
+                self._query_dated_wells(form, date, sections),
+                [f"{prefix}_nwells", f"{prefix}_last_date", f"{prefix}_first_date"],
+            )
+
+        formation = func.coalesce(Well_Oneline.norm_formation, f1002.formation)
+        completions = list()
+        for assumed in [Section_Assumption.formation_1, Section_Assumption.formation_2]:
+            in_formation = formation == assumed
+            completions += [
+                func.count(distinct(case([(in_formation, f1002.api)]))),
+                func.max(case([(in_formation, f1002.well_completion_date)])),
+            ]
+        completed = (
+            self.session.query(Section_Well.trsm_heh, *completions)
+            .join(f1002, f1002.api == Section_Well.api)
+            .join(
+                Section_Assumption,
+                Section_Assumption.trsm_heh == Section_Well.trsm_heh,
+            )
+            .outerjoin(Well_Oneline, Well_Oneline.api == f1002.api)
+            .filter(f1002.well_completion_date.isnot(None))
+            .group_by(Section_Well.trsm_heh)
+        )
+        if sections is not None:
+            completed = completed.filter(Section_Well.trsm_heh.in_(sections))
+        by_section(
+            completed,
+            [
+                "f1002a_nwells_f1",
+                "f1002a_last_date_f1",
+                "f1002a_nwells_f2",
+                "f1002a_last_date_f2",
+            ],
+        )
+
+        for date, prefix in [
+            (Increased_Density.app_date, "app"),
+            (Increased_Density.order_date, "order"),
+        ]:
+            by_section(
+                self._query_latest_increased_densities(date, sections),
+                [f"{prefix}_nwells", f"{prefix}_date"],
+            )
+
+        self._log.info(f"Aggregated the timing inputs of {len(trsm_heh)} sections")
+        return make_section_timing_inputs(np.array(trsm_heh, dtype=object), **columns)
+
+    def set_section_onelines(self) -> int:
+        """
+        Builds the well counts and dates of every section of the section wells in
+        the session db, and writes them to section_onelines in one statement. The
+        reserves set by set_section_reserves are kept.
+
+        Per section, the permits, spuds and completions are the wells of the f1000s,
+        f1001s and f1002s with a date, counted and dated from the first to the last.
+        The app and order wells are the increased densities of the latest app and
+        order. Sections without any are counted 0 and left undated.
+
+        Returns
+        -------
+        Number of sections written
+        """
+        sections = self.session.query(Section_Well.trsm_heh).distinct().subquery()
+        forms = [
+            ("no_wells_permitted", "permit", f1000, f1000.permit_date),
+            ("no_wells_spud", "spud", f1001, f1001.spud_date),
+            ("no_wells_completed", "completion", f1002, f1002.well_completion_date),
+        ]
+        densities = [
+            ("app", Increased_Density.app_date),
+            ("order", Increased_Density.order_date),
+        ]
+
+        columns = {"trsm_heh": sections.c.trsm_heh}
+        subqueries = list()
+        for nwells, name, form, date in forms:
+            wells = self._query_dated_wells(form, date).subquery()
+            columns[nwells] = func.coalesce(wells.c.nwells, 0)
+            columns[f"date_first_{name}"] = wells.c.first_date
+            columns[f"date_last_{name}"] = wells.c.last_date
+            subqueries.append(wells)
+        for name, date in densities:
+            latest = self._query_latest_increased_densities(date).subquery()
+            columns[f"inc_den_{name}_nwells"] = func.coalesce(latest.c.nwells, 0)
+            columns[f"date_inc_den_{name}"] = latest.c.date
+            subqueries.append(latest)
+
+        # Replacing a row drops it, the columns not built here are carried over.
+        table = Section_Oneline.__table__
+        for name in table.columns.keys():
+            if name not in columns:
+                columns[name] = table.c[name]
+
+        query = self.session.query(*columns.values())
+        for subquery in subqueries:
+            query = query.outerjoin(
+                subquery, subquery.c.trsm_heh == sections.c.trsm_heh
+            )
+        query = query.outerjoin(table, table.c.trsm_heh == sections.c.trsm_heh)
+
+        statement = (
+            table.insert()
+            .prefix_with("OR REPLACE")
+            .from_select(list(columns), query.statement)
+        )
+        with self.session_scope() as session:
+            nrows = session.execute(statement).rowcount
+
+        self._log.info(f"Built the onelines of {nrows} sections")
+        return nrows
+
+    def _query_dated_wells(self, form, date, sections=None):
+        """
+        Wells of a form with a date per section: trsm_heh, nwells, last_date and
+        first_date.
+        """
+        query = (
+            self.session.query(
+                Section_Well.trsm_heh,
+                func.count(distinct(form.api)).label("nwells"),
+                func.max(date).label("last_date"),
+                func.min(date).label("first_date"),
+            )
+            .join(form, form.api == Section_Well.api)
+            .filter(date.isnot(None))
+            .group_by(Section_Well.trsm_heh)
+        )
+        if sections is not None:
+            query = query.filter(Section_Well.trsm_heh.in_(sections))
+        return query
+
+    def _query_latest_increased_densities(self, date, sections=None):
+        """
+        Increased densities at the latest date per section: trsm_heh, nwells and
+        date. Ranked in a window, or without window functions, before SQLite 3.25,
+        joined back to the latest date of every section.
+        """
+        if not SQLITE_WINDOW_FUNCTIONS:
+            latest = self.session.query(
+                Increased_Density.trsm_heh, func.max(date).label("date")
+            ).filter(date.isnot(None))
+            if sections is not None:
+                latest = latest.filter(Increased_Density.trsm_heh.in_(sections))
+            latest = latest.group_by(Increased_Density.trsm_heh).subquery()
+            return (
+                self.session.query(
+                    latest.c.trsm_heh,
+                    func.count().label("nwells"),
+                    func.max(latest.c.date).label("date"),
+                )
+                .join(
+                    Increased_Density,
+                    and_(
+                        Increased_Density.trsm_heh == latest.c.trsm_heh,
+                        date == latest.c.date,
+                    ),
+                )
+                .group_by(latest.c.trsm_heh)
+            )
+
+        ranked = self.session.query(
+            Increased_Density.trsm_heh,
+            date.label("date"),
+            func.rank()
+            .over(partition_by=Increased_Density.trsm_heh, order_by=date.desc())
+            .label("rank"),
+        ).filter(date.isnot(None))
+        if sections is not None:
+            ranked = ranked.filter(Increased_Density.trsm_heh.in_(sections))
+        ranked = ranked.subquery()
+        return (
+            self.session.query(
+                ranked.c.trsm_heh,
+                func.count().label("nwells"),
+                func.max(ranked.c.date).label("date"),
+            )
+            .filter(ranked.c.rank == 1)
+            .group_by(ranked.c.trsm_heh)
+        )
+
+    def get_section_timings(self, valuation_date=None) -> tuple:
+        """
+        Timing of every section with assumptions at valuation_date, the first of the
+        current month by default.
+        Only the dirty sections, see get_dirty_sections, are aggregated and timed.
+        Their timings are stored and the rest are read back.
+
+        Returns
+        -------
+        tuple of np.ndarray (nsections,)
+            trsm_heh and the timing of timing_dtype, ordered by trsm_heh
+        """
+        if valuation_date is None:
+            valuation_date = get_curr_first_dom()
+        valuation_date = np.datetime64(valuation_date, "D").astype(object)
+
+        dirty = self._query_dirty_sections(valuation_date)
+        if dirty.first() is not None:
+            inputs = self.get_section_timing_inputs(sections=dirty.statement)
+            timings = inputs.timing(valuation_date)
+
+            fields = [timings[name].tolist() for name in TIMING_FIELDS]
+            rows = [
+                dict(
+                    zip(TIMING_FIELDS, values),
+                    trsm_heh=trsm_heh,
+                    valuation_date=valuation_date,
+                )
+                for trsm_heh, *values in zip(inputs.trsm_heh, *fields)
+            ]
+            with self.db_engine.begin() as connection:
+                connection.execute(
+                    Section_Timing.__table__.insert().prefix_with("OR REPLACE"), rows
+                )
+            self._log.info(f"Timed {len(rows)} dirty sections")
+
+        # The dates are read as the ISO strings SQLite keeps, numpy parses them at once.
+        dtype = timing_dtype()
+        columns = [
+            (
+                type_coerce(getattr(Section_Timing, name), String)
+                if dtype[name].kind == "M"
+                else getattr(Section_Timing, name)
+            )
+            for name in TIMING_FIELDS
+        ]
+        rows = (
+            self.session.query(Section_Timing.trsm_heh, *columns)
+            .join(
+                Section_Assumption,
+                Section_Assumption.trsm_heh == Section_Timing.trsm_heh,
+            )
+            .filter(Section_Timing.valuation_date == valuation_date)
+            .order_by(Section_Timing.trsm_heh)
+            .all()
+        )
+        values = list(zip(*rows)) if rows else [[] for _ in range(len(columns) + 1)]
+
+        result = np.empty(len(rows), dtype=dtype)
+        for name, column in zip(TIMING_FIELDS, values[1:]):
+            result[name] = np.array(column, dtype=dtype[name])
+        return np.array(values[0], dtype=object), result
+
+    def get_dirty_sections(self, valuation_date=None) -> np.ndarray:
+        """
+        Sections with assumptions and no stored timing at valuation_date, the first
+        of the current month by default.
+        Those are new, or had their timing dropped by set_timings_dirty since the
+        last get_section_timings.
+        """
+        if valuation_date is None:
+            valuation_date = get_curr_first_dom()
+        valuation_date = np.datetime64(valuation_date, "D").astype(object)
+
+        dirty = self._query_dirty_sections(valuation_date).order_by(
+            Section_Assumption.trsm_heh
+        )
+        return np.array([trsm_heh for trsm_heh, in dirty], dtype=object)
+
+    def set_timings_dirty(self, trsm_heh=(), apis=()) -> int:
+        """
+        Drops the stored timings of the given sections and of the sections of the
+        given wells. Loads and session edits of the TIMING_SOURCES call it.
+
+        Returns
+        -------
+        Number of timings dropped
+        """
+        with self.db_engine.begin() as connection:
+            ndropped = self._drop_timings(connection, trsm_heh, apis)
+
+        if ndropped:
+            self._log.info(f"Dropped the timings of {ndropped} sections")
+        return ndropped
+
+    def clean_data(
+        self, df: pd.DataFrame, table: SQLTable, table_name: str
+    ) -> pd.DataFrame:
+        df = super(FMDataManager, self).clean_data(df, table, table_name)
+        self._set_loaded_timings_dirty(table_name, df)
+        return df
+
+    def bulk_update(self, table_name: str, key: str, df: pd.DataFrame) -> int:
+        nrows = super(FMDataManager, self).bulk_update(table_name, key, df)
+        self._set_loaded_timings_dirty(table_name, df)
+        return nrows
+
+    def _query_dirty_sections(self, valuation_date):
+        return (
+            self.session.query(Section_Assumption.trsm_heh)
+            .outerjoin(
+                Section_Timing,
+                and_(
+                    Section_Timing.trsm_heh == Section_Assumption.trsm_heh,
+                    Section_Timing.valuation_date == valuation_date,
+                ),
+            )
+            .filter(Section_Timing.trsm_heh.is_(None))
+        )
+
+    def _drop_timings(self, connection, trsm_heh, apis) -> int:
+        table = Section_Timing.__table__
+        ndropped = 0
+
+        # The where bind parameters cannot share the name of a column.
+        trsm_heh = [{"_trsm_heh": section} for section in set(trsm_heh)]
+        if trsm_heh:
+            statement = table.delete().where(table.c.trsm_heh == bindparam("_trsm_heh"))
+            ndropped += connection.execute(statement, trsm_heh).rowcount
+
+        apis = [{"_api": int(api)} for api in set(apis)]
+        if apis:
+            sections = select([Section_Well.trsm_heh]).where(
+                Section_Well.api == bindparam("_api")
+            )
+            statement = table.delete().where(table.c.trsm_heh.in_(sections))
+            ndropped += connection.execute(statement, apis).rowcount
+
+        return ndropped
+
+    def _set_loaded_timings_dirty(self, table_name: str, df: pd.DataFrame):
+        key, columns = TIMING_SOURCES.get(table_name, (None, None))
+        if key is None or df is None or key not in df:
+            return
+        if columns is not None and not any(column in df for column in columns):
+            return
+
+        if key == "trsm_heh":
+            self.set_timings_dirty(trsm_heh=df[key].values)
+        else:
+            self.set_timings_dirty(apis=df[key].values)
+
+    def _set_flushed_timings_dirty(self, session, flush_context):
+        """
+        Drops the timings of the sections whose timing sources are edited in the
+        flush, in its transaction. An edited key drops the timings of its old and
+        new values, e.g. both sections of a well moved from one to the other.
+        """
+        dirty = dict(trsm_heh=set(), api=set())
+        for instance in chain(session.new, session.dirty, session.deleted):
+            key, columns = TIMING_SOURCES.get(instance.__tablename__, (None, None))
+            if key is None:
+                continue
+            state = inspect(instance)
+            if columns is not None and instance not in session.deleted:
+                if not any(state.attrs[c].history.has_changes() for c in columns):
+                    continue
+            dirty[key].add(getattr(instance, key))
+            dirty[key].update(state.attrs[key].history.deleted)
+
+        if dirty["trsm_heh"] or dirty["api"]:
+            self._drop_timings(session.connection(), dirty["trsm_heh"], dirty["api"])
+
+    def get_forecast_months(self) -> int:
+        """
+        Number of months the wells are forecasted for on the Producing sheet.
+        Read from forecast_months in the PROJECT section of the config, defaults to 360.
+        """
+        return self.cfg["PROJECT"].getint("forecast_months", fallback=360)
+
+    def get_forecast_cache(self) -> ForecastCache:
+        """
+        Forecast cache of the session, created on first use.
+        Bounded by forecast_cache_mb in the PROJECT section of the config, defaults to 256.
+        With forecast_cache_persist the forecasts are also saved in the session db
+        and survive a save and restore of the session, defaults to False.
+        """
+        if self.forecast_cache is None:
+            max_mb = self.cfg["PROJECT"].getint("forecast_cache_mb", fallback=256)
+            persist = self.cfg["PROJECT"].getboolean(
+                "forecast_cache_persist", fallback=False
+            )
+            self.forecast_cache = ForecastCache(
+                max_bytes=max_mb * 2 ** 20, store=self if persist else None
+            )
+
+        return self.forecast_cache
+
+    def load_forecasts(self, keys: list) -> dict:
+        """
+        Forecasts saved in the session db, see ForecastCache.
+        """
+        forecasts = dict()
+        for start in range(0, len(keys), 500):
+            forecasts.update(
+                self.session.query(Dca_Forecast.key, Dca_Forecast.forecast)
+                .filter(Dca_Forecast.key.in_(keys[start : start + 500]))
+                .all()
+            )
+        return forecasts
+
+    def save_forecasts(self, forecasts: dict):
+        """
+        Saves forecasts in the session db, see ForecastCache.
+        """
+        with self.session_scope() as session:
+            for key, forecast in forecasts.items():
+                session.merge(Dca_Forecast(key=key, forecast=forecast))
+
+    def get_forecasts(self, apis: np.ndarray, product: str, mprod: int) -> np.ndarray:
+        """
+        Forecasted production of the given apis from their stored DCA parameters.
+        The forecasts are cached, going back to a well or a section does not
+        forecast the wells again.
+
+        :param apis: np.ndarray (nwells,)
+        :param product: str
+            oil or gas
+        :param mprod: int
+        :return: np.ndarray (nwells, mprod)
+            NaN for wells that were never declined.
+        """
+        cache = self.get_forecast_cache()
+        stored = {
+            int(api): (dca_model, pars)
+            for api, dca_model, pars in self._query_well_onelines(
+                apis,
+                Well_Oneline.dca_model,
+                getattr(Well_Oneline, f"dca_pars_{product}"),
+            )
+        }
+
+        wells = [stored.get(int(api), (None, None)) for api in apis.astype("int64")]
+        production = np.full((len(wells), mprod), np.nan, dtype=np.float32)
+        for model in set(dca_model for dca_model, _ in wells if dca_model is not None):
+            idx = [
+                i
+                for i, (dca_model, pars) in enumerate(wells)
+                if dca_model == model and pars is not None and np.all(np.isfinite(pars))
+            ]
+            if idx:
+                pars = np.stack([wells[i][1] for i in idx], axis=1)
+                production[idx] = cache.forecast(model, pars, mprod)
+
+        return production
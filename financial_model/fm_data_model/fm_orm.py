@@ -16,11 +16,16 @@ class NumpyType(TypeDecorator):
     """
 
     impl = LargeBinary
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
         return zlib.compress(value.dumps(), 9)
 
     def process_result_value(self, value, dialect):
+        if value is None:
+            return None
         return pickle.loads(zlib.decompress(value))
 
 
@@ -74,7 +79,10 @@ class Section_Well(base):
 
     api = Column(Integer, primary_key=True)
     trsm_heh = Column(
-        String, ForeignKey("project_state_assets.trsm_heh"), primary_key=True
+        String,
+        ForeignKey("project_state_assets.trsm_heh"),
+        primary_key=True,
+        index=True,
     )
     allocation = Column(Float)
     proxy_allocation = Column(Float)
@@ -141,7 +149,7 @@ class Increased_Density(base):
     __tablename__ = "increased_densities"
 
     cause_number = Column(Integer, primary_key=True)
-    trsm_heh = Column(String, ForeignKey("project_state_assets.trsm_heh"))
+    trsm_heh = Column(String, ForeignKey("project_state_assets.trsm_heh"), index=True)
     nwells = Column(Integer)
     app_order = Column(String)
     order_type = Column(String)
@@ -306,6 +314,33 @@ class Section_Oneline(base):
     date_inc_den_app = Column(Date)
     date_inc_den_order = Column(Date)
 
+    # Reserves of the section wells weighted by their allocation
+    eur_oil = Column(Float)
+    eur_gas = Column(Float)
+    remaining_oil = Column(Float)
+    remaining_gas = Column(Float)
+
+
+class Section_Timing(base):
+    __tablename__ = "section_timings"
+
+    # Timing of the section at valuation_date, dropped when any of its inputs change
+    trsm_heh = Column(String, primary_key=True)
+    valuation_date = Column(Date)
+
+    nwells_curr = Column(Integer)
+    nwells_fut = Column(Integer)
+    spud_date_curr = Column(Date)
+    sales_date_curr = Column(Date)
+    spud_date_fut = Column(Date)
+    sales_date_fut = Column(Date)
+    nwells_curr_2 = Column(Integer)
+    nwells_fut_2 = Column(Integer)
+    spud_date_curr_2 = Column(Date)
+    sales_date_curr_2 = Column(Date)
+    spud_date_fut_2 = Column(Date)
+    sales_date_fut_2 = Column(Date)
+
 
 class Well_Oneline(base):
     __tablename__ = "well_onelines"
@@ -353,3 +388,27 @@ class Well_Oneline(base):
     dmin_gas = Column(Float)
     b_gas = Column(Float)
     ip_gas_idx = Column(Integer)
+
+    # Parameters of the decline model, di, dmin and b are only set for mod_arps
+    dca_model = Column(String)
+    dca_pars_oil = Column(NumpyType)
+    dca_pars_gas = Column(NumpyType)
+
+    # Hash of the production and the fit settings the DCA parameters were fitted on
+    dca_hash = Column(String)
+
+    # Reserves down to the economic limit, econ_life in months since the IP month
+    eur_oil = Column(Float)
+    eur_gas = Column(Float)
+    remaining_oil = Column(Float)
+    remaining_gas = Column(Float)
+    econ_life_oil = Column(Float)
+    econ_life_gas = Column(Float)
+
+
+class Dca_Forecast(base):
+    __tablename__ = "dca_forecasts"
+
+    # ForecastCache.key_str of the (model, parameters, mprod, dtype) of the forecast
+    key = Column(String, primary_key=True)
+    forecast = Column(NumpyType)
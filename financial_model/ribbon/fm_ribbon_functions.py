@@ -5,7 +5,6 @@ from pyxll import xl_app, reload, xl_macro
 import pydevd
 import logging
 
-from scipy.optimize import minimize
 import numpy as np
 
 from fm_orm import Well_Oneline, Section_Assumption, Section_Well, Project_State_Asset
@@ -29,7 +28,10 @@ from generic_type_hints import w32
 from generic_ui import load_config_xl
 from fm_ui import create_fm_data_manager, read_project_settings, set_default_formulae
 from fm_data_manager import FMDataManager
-from mod_arps import modarps_rmse
+from decline_fit import align_decline_streams, fit_decline_parallel
+from decline_models import get_decline_model
+from mod_arps import np_mod_arps_eur
+from production_layout import ProductionLayout
 
 _log = logging.getLogger(__name__)
 
@@ -134,6 +136,7 @@ def get_data(trigger):
         type_curves=type_curves,
         section_assumptions=section_assumptions,
     )
+    data_manager.set_section_onelines()
     data_manager.data_formatter.project_state_assets(xl=xl)
     data_manager.data_formatter.project_parameters(xl=xl)
 
@@ -194,12 +197,7 @@ def normalize_formation(trigger):
     ]
     df = df.loc[:, formation_columns]
 
-    with dm.session_scope() as session:
-        for i, row in df.iterrows():
-            selected_well = (
-                session.query(Well_Oneline).filter(Well_Oneline.api == row["api"]).one()
-            )  # type: Well_Oneline
-            selected_well.norm_formation = row.norm_formation
+    dm.bulk_update("well_onelines", "api", df.loc[:, ["api", "norm_formation"]])
 
     set_formation_normalizer()
 
@@ -248,76 +246,176 @@ def decline_wells(trigger):
     xl = xl_app()
 
     dm = get_cached_object(get_value("data_obj_manager", xl=xl))  # type: FMDataManager
-    df = dm["monthlies"]
-    api_list = df.api.unique()
-
-    oil_list, gas_list = run_arps(df, api_list, dm.get_initial_guess(), dm.get_bounds())
-
-    with dm.session_scope() as session:
-        for i, selected_api in enumerate(api_list):
-            selected_well = (
-                session.query(Well_Oneline)
-                .filter(Well_Oneline.api == str(selected_api))
-                .one()
-            )  # type: Well_Oneline
-
-            selected_well.ip_final_oil = oil_list[i][0]
-            selected_well.di_oil = oil_list[i][1]
-            selected_well.dmin_oil = oil_list[i][2]
-            selected_well.b_oil = oil_list[i][3]
-            selected_well.ip_oil_idx = oil_list[i][4]
-
-            selected_well.ip_final_gas = gas_list[i][0]
-            selected_well.di_gas = gas_list[i][1]
-            selected_well.dmin_gas = gas_list[i][2]
-            selected_well.b_gas = gas_list[i][3]
-            selected_well.ip_gas_idx = oil_list[i][4]
-
-            # selected_well.well_type = "Declined"
-
-    logging.info(f"Declined {api_list.shape[0]} wells")
-    set_producing_sections(xl=xl)
-
-
-def run_arps(df, api_list, initial_guess, bounds):
-
-    oil_list = [None] * api_list.shape[0]
-    gas_list = [None] * api_list.shape[0]
-
-    for i, api in enumerate(api_list):
-        test_df = df.query("api == @api")
-
-        for product in ["oil", "gas"]:
-            well_initial_guess = initial_guess.copy()
-            well_bounds = bounds.copy()
+    layout = dm.get_production_layout()
+    model = get_decline_model(dm.get_dca_model())
+    # Modified ARPS fitted on rates or on volumes share their parameters
+    is_mod_arps = model.name in ["mod_arps", "mod_arps_volume"]
+    if is_mod_arps:
+        initial_guess = dm.get_initial_guess()
+        bounds = dm.get_bounds()
+    else:
+        initial_guess = model.initial_guess
+        bounds = model.bounds
+    loss = dm.get_dca_loss()
+    loss_options = dm.get_dca_loss_options()
+
+    # Only wells whose production, fit or reserves settings changed since the last
+    # decline are refitted.
+    salt = repr(
+        (
+            model.name,
+            loss,
+            sorted(loss_options.items()),
+            initial_guess,
+            bounds,
+            dm.get_econ_limit("oil"),
+            dm.get_econ_limit("gas"),
+            dm.get_max_well_life(),
+        )
+    ).encode()
+    dca_hashes = layout.hash_wells(salt=salt)
+    stored_hashes = dm.get_dca_hashes()
+    wells = np.array(
+        [
+            i
+            for i, api in enumerate(layout.apis)
+            if stored_hashes.get(int(api)) != dca_hashes[i]
+        ],
+        dtype=np.int64,
+    )
+    logging.info(f"{len(layout) - wells.shape[0]} wells unchanged since last decline")
 
-            stream = test_df[product].values
-            ip_start_idx = np.argmax(stream)
-            decline_stream = stream[ip_start_idx:]
-            actual = decline_stream.reshape(-1, 1)
-            well_initial_guess[0] = well_initial_guess[0] * decline_stream[0]
-            well_bounds[0] = (
-                well_bounds[0][0] * decline_stream[0],
-                well_bounds[0][1] * decline_stream[0],
-            )
+    if wells.shape[0] == 0:
+        set_producing_sections(xl=xl)
+        return
 
-            result = minimize(
-                modarps_rmse,
-                x0=well_initial_guess,
-                args=actual,
-                method="L-BFGS-B",
-                bounds=well_bounds,
-                options={"maxiter": 1000, "eps": 0.0001},
+    warm_start = None
+    if dm.get_dca_warm_start():
+        warm_start = dm.get_dca_pars(layout.apis[wells], model.name)
+
+    workers = dm.get_dca_workers()
+    executable = dm.get_dca_python() if workers > 1 else None
+
+    def progress(nwells_done, nwells):
+        xl.StatusBar = f"Declining Wells {nwells_done}/{nwells}"
+
+    try:
+        oil_list, gas_list = run_arps(
+            layout,
+            initial_guess,
+            bounds,
+            model=model.name,
+            loss=loss,
+            loss_options=loss_options,
+            wells=wells,
+            warm_start=warm_start,
+            workers=workers,
+            chunk_size=dm.get_dca_chunk_size(),
+            progress=progress,
+            executable=executable,
+        )
+    finally:
+        xl.StatusBar = False
+
+    # di, dmin and b only hold Modified ARPS parameters,
+    # dca_pars keeps the parameters of any model.
+    dca_pars = dict(api=layout.apis[wells].astype("int64"))
+    for product, fitted in [("oil", oil_list), ("gas", gas_list)]:
+        dca_pars[f"ip_final_{product}"] = fitted[:, 0]
+        dca_pars[f"di_{product}"] = fitted[:, 1] if is_mod_arps else np.nan
+        dca_pars[f"dmin_{product}"] = fitted[:, 2] if is_mod_arps else np.nan
+        dca_pars[f"b_{product}"] = fitted[:, 3] if is_mod_arps else np.nan
+        dca_pars[f"ip_{product}_idx"] = fitted[:, -1].astype("int64")
+        dca_pars[f"dca_pars_{product}"] = list(fitted[:, :-1])
+
+        # The economic limit month is only solved analytically for Modified ARPS
+        if is_mod_arps:
+            econ_life, eur, remaining = np_mod_arps_eur(
+                fitted[:, :4].T,
+                dm.get_econ_limit(product),
+                elapsed_months=layout.lengths[wells] - fitted[:, -1],
+                max_months=dm.get_max_well_life(),
             )
+        else:
+            econ_life = eur = remaining = np.nan
+        dca_pars[f"econ_life_{product}"] = econ_life
+        dca_pars[f"eur_{product}"] = eur
+        dca_pars[f"remaining_{product}"] = remaining
+    dca_pars = pd.DataFrame(dca_pars)
+    dca_pars["dca_model"] = model.name
+    dca_pars["dca_hash"] = dca_hashes[wells]
+    dm.bulk_update("well_onelines", "api", dca_pars)
+    dm.set_section_reserves()
+
+    logging.info(f"Declined {wells.shape[0]} wells")
+    set_producing_sections(xl=xl)
 
-            result_pars = result.x.tolist()
-            result_pars.append(int(ip_start_idx))
 
-            if product == "oil":
-                oil_list[i] = result_pars
-            else:
-                gas_list[i] = result_pars
+def run_arps(
+    layout: ProductionLayout,
+    initial_guess,
+    bounds,
+    model="mod_arps",
+    loss="rmse",
+    loss_options=None,
+    wells=None,
+    warm_start=None,
+    workers=1,
+    chunk_size=100,
+    progress=None,
+    executable=None,
+):
+    """
+    Fits a decline model for oil and gas of the wells in the production layout.
+    The wells are fitted in chunks spread across workers processes.
+
+    :param model: str
+        Name of a registered decline model, Modified ARPS by default.
+    :param loss: str
+        Name of a registered loss, rmse, squares, huber or log_squares.
+    :param loss_options: dict
+        Keyword arguments of the loss, for example the delta of huber.
+    :param wells: np.ndarray
+        Indices of the wells in the layout to fit, all the wells when None
+    :param warm_start: dict
+        product to np.ndarray (npars, nwells) of stored parameters to start the fit from.
+    :param progress: Callable[[int, int], None]
+        Called after every chunk with the number of fits done and the total number of fits.
+    :param executable: str
+        Python interpreter of the worker processes, see fit_decline_parallel.
+    :return: (np.ndarray, np.ndarray)
+        oil and gas arrays of shape (nwells, npars + 1) with the model parameters
+        and ip month index
+    """
+    nwells = len(layout) if wells is None else wells.shape[0]
+    results = list()
+    for i, product in enumerate(["oil", "gas"]):
+        production, mask = layout.to_padded(product, wells)
+        decline, decline_mask, ip_idx = align_decline_streams(production, mask)
+
+        product_progress = None
+        if progress is not None:
+
+            def product_progress(nwells_done, _, offset=i * nwells):
+                progress(offset + nwells_done, 2 * nwells)
+
+        pars = fit_decline_parallel(
+            decline,
+            decline_mask,
+            initial_guess,
+            bounds,
+            model=model,
+            workers=workers,
+            chunk_size=chunk_size,
+            progress=product_progress,
+            warm_start=None if warm_start is None else warm_start[product],
+            loss=loss,
+            loss_options=loss_options,
+            executable=executable,
+        )
+        results.append(np.column_stack([pars.T, ip_idx]))
 
+    oil_list, gas_list = results
     return oil_list, gas_list
 
 
@@ -79,13 +79,11 @@ def process_section_online(df_i_w_l, df_f1000, df_f1001, df_f1002, df_inc_den):
     df_1002A = transform_table(df_i_w_l, df_f1002)
     df_i_density = transform_table(df_i_w_l, df_inc_den)
 
-    print("processing data")
     apis_list = df_index_well_land["api"].tolist()
     trsm_heh_list = df_index_well_land["trsm_heh"].tolist()
 
     # ## calculating latest, oldest dates, wells count for form 1000
 
-    print("processing required information from production data")
     df_1000_permit_dates = (
         df_1000[["trsm_heh", "permit_date"]]
         .dropna(subset=["permit_date"], how="all")
@@ -100,7 +98,6 @@ def process_section_online(df_i_w_l, df_f1000, df_f1001, df_f1002, df_inc_den):
         .reset_index(name="no_wells_permitted")
     )
 
-    print(df_1000_permit_dates.shape)
     df_1000_permit_dates["permit_date"] = pd.to_datetime(
         df_1000_permit_dates["permit_date"]
     )
@@ -126,14 +123,12 @@ def process_section_online(df_i_w_l, df_f1000, df_f1001, df_f1002, df_inc_den):
 
     # ## calculating latest, oldest dates, wells count for form 1001
 
-    print("processing required information from form 1001")
     df_1001_spud_dates = (
         df_1001[["trsm_heh", "spud_date"]]
         .dropna(subset=["spud_date"], how="all")
         .reset_index(drop=True)
     )
     df_1001_spud_dates = df_1001_spud_dates.drop_duplicates()
-    print(df_1001_spud_dates.shape)
 
     df_1001_wells_count = df_1001_spud_dates[["trsm_heh"]]
     df_1001_wells_count = (
@@ -165,7 +160,6 @@ def process_section_online(df_i_w_l, df_f1000, df_f1001, df_f1002, df_inc_den):
 
     # ## calculating latest, oldest dates, wells count for form 1002A
 
-    print("processing required information from production data")
     df_1002A_completion_dates = (
         df_1002A[["api", "well_completion_date"]]
         .dropna(subset=["well_completion_date"], how="all")
@@ -189,7 +183,6 @@ def process_section_online(df_i_w_l, df_f1000, df_f1001, df_f1002, df_inc_den):
         .reset_index(name="no_wells_completed")
     )
 
-    print(df_1002A_completion_dates.shape)
     df_1002A_completion_dates["well_completion_date"] = pd.to_datetime(
         df_1002A_completion_dates["well_completion_date"]
     )
@@ -420,7 +413,6 @@ def process_section_online(df_i_w_l, df_f1000, df_f1001, df_f1002, df_inc_den):
     for date_col in date_cols:
         df_timing_data[date_col] = pd.to_datetime(df_timing_data[date_col])
 
-    print("processing timing data is successful")
 
     non_date_cols = [col for col in df_timing_data.columns if col not in date_cols]
 
@@ -452,3 +444,53 @@ def test_kiran(xl, fm_data_manager_xl, make_dca_pars, caplog):
 
     assert result_df.shape[0] == result_df.trsm_heh.unique().shape[0]
     dm["section_onelines"] = result_df
+
+
+@pytest.mark.parametrize(
+    "xl, fm_data_manager_xl, caplog", [(None, None, None)], indirect=True
+)
+def test_section_onelines(xl, fm_data_manager_xl, caplog):
+    caplog.set_level(logging.INFO)
+    dm = fm_data_manager_xl  # type: FMDataManager
+
+    tables = [
+        dm[name]
+        for name in [
+            "section_wells",
+            "f1000s",
+            "f1001s",
+            "f1002s",
+            "increased_densities",
+        ]
+    ]
+    dm.set_section_onelines()
+
+    expected = process_section_online(*tables).set_index("trsm_heh").sort_index()
+    result = dm["section_onelines"].set_index("trsm_heh").loc[expected.index]
+
+    # pandas fills some of the missing dates with 0, compares the dated sections.
+    date_cols = [col for col in expected.columns if col.startswith("date_")]
+    for date_col in date_cols:
+        dated = result[date_col].notnull()
+        assert (
+            pd.to_datetime(result.loc[dated, date_col])
+            == pd.to_datetime(expected.loc[dated, date_col])
+        ).all(), date_col
+
+    # pandas counts the distinct permit and spud dates, the wells are distinct apis.
+    section_wells, f1000s, f1001s = tables[:3]
+    for col, form, date_col in [
+        ("no_wells_permitted", f1000s, "permit_date"),
+        ("no_wells_spud", f1001s, "spud_date"),
+    ]:
+        dated = form.loc[form[date_col].notnull(), ["api"]]
+        nwells = (
+            section_wells[["api", "trsm_heh"]]
+            .merge(dated, on="api")
+            .groupby("trsm_heh")
+            .api.nunique()
+            .reindex(expected.index, fill_value=0)
+        )
+        assert (result[col].values == nwells.values).all(), col
+    for col in ["no_wells_completed", "inc_den_app_nwells", "inc_den_order_nwells"]:
+        assert (result[col].values == expected[col].values).all(), col
@@ -1,3 +1,5 @@
+from configparser import ConfigParser
+
 import pytest
 
 from fm_data_formatter import FMDataFormatter
@@ -120,3 +122,16 @@ def fm_data_manager_xl(
         )
 
     return dm
+
+
+@pytest.fixture
+def fm_data_manager(tmp_path) -> FMDataManager:
+    """
+    Session db in a temporary folder, without Excel or source connections.
+    """
+    cfg = ConfigParser()
+    cfg["PROJECT"] = {"backup": f"{tmp_path}/"}
+
+    return FMDataManager(
+        cfg=cfg, qm=None, sc=None, dl=FMDataLoader(), df=FMDataFormatter()
+    )
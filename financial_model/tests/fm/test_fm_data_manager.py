@@ -0,0 +1,434 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from decline_models import get_decline_model
+from sqlalchemy import select
+
+from fm_orm import (
+    Increased_Density,
+    Project_State_Asset,
+    Section,
+    Section_Assumption,
+    Section_Oneline,
+    Section_Well,
+    Well_Oneline,
+    f1000,
+    f1001,
+    f1002,
+)
+
+from financial_model.tests.configtest import *
+
+
+def test_production_layout_after_appended_loads(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+
+    dm["monthlies"] = pd.DataFrame(
+        {
+            "api": [35011000020000] * 2,
+            "date": ["2019-01-01", "2019-02-01"],
+            "oil": [100.0, 90.0],
+            "gas": [200.0, 180.0],
+        }
+    )
+    assert np.array_equal(dm.get_production_layout().apis, [35011000020000])
+
+    dm["monthlies"] = pd.DataFrame(
+        {
+            "api": [35011000010000] * 3,
+            "date": ["2019-01-01", "2019-02-01", "2019-03-01"],
+            "oil": [300.0, 250.0, 220.0],
+            "gas": [600.0, 500.0, 440.0],
+        }
+    )
+    layout = dm.get_production_layout()
+
+    assert np.array_equal(layout.apis, [35011000010000, 35011000020000])
+    assert np.array_equal(layout.offsets, [0, 3])
+    assert np.array_equal(layout.lengths, [3, 2])
+    assert np.allclose(layout.streams["oil"], [300.0, 250.0, 220.0, 100.0, 90.0])
+
+
+def test_get_dca_pars(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+
+    with dm.session_scope() as session:
+        session.add_all(
+            [
+                Well_Oneline(
+                    api=1,
+                    dca_model="mod_arps",
+                    dca_pars_oil=np.array([100.0, 0.6, 0.07, 1.0]),
+                    dca_pars_gas=np.array([200.0, 0.5, 0.06, 1.1]),
+                ),
+                Well_Oneline(
+                    api=2,
+                    dca_model="three_segment",
+                    dca_pars_oil=np.ones(7),
+                    dca_pars_gas=np.ones(7),
+                ),
+                Well_Oneline(
+                    api=3,
+                    dca_model="mod_arps",
+                    dca_pars_oil=np.array([300.0, 0.7, 0.08, 0.9]),
+                    dca_pars_gas=np.array([400.0, 0.8, 0.07, 1.2]),
+                ),
+            ]
+        )
+
+    dca_pars = dm.get_dca_pars(np.array([3, 2, 4, 1]), "mod_arps")
+
+    assert dca_pars["oil"].shape == (4, 4)
+    assert np.allclose(dca_pars["oil"][:, 0], [300.0, 0.7, 0.08, 0.9])
+    assert np.allclose(dca_pars["gas"][:, 3], [200.0, 0.5, 0.06, 1.1])
+    assert np.all(np.isnan(dca_pars["oil"][:, 1:3]))
+
+
+def test_bulk_update(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+
+    with dm.session_scope() as session:
+        session.add_all(
+            [
+                Well_Oneline(api=1, norm_formation="WOODFORD", ip_oil=100.0),
+                Well_Oneline(api=2, norm_formation="WOODFORD", ip_oil=200.0),
+                Well_Oneline(api=3, norm_formation="WOODFORD", ip_oil=300.0),
+            ]
+        )
+
+    # Loaded in the session before the update
+    well = dm.session.query(Well_Oneline).filter(Well_Oneline.api == 2).one()
+    assert well.ip_oil == 200.0
+
+    # The key column shares its name with a column of the table
+    df = pd.DataFrame({"api": [2, 3, 4], "ip_oil": [250.0, 350.0, 450.0]})
+    assert dm.bulk_update("well_onelines", "api", df) == 2
+
+    assert well.ip_oil == 250.0
+    assert dict(dm.session.query(Well_Oneline.api, Well_Oneline.ip_oil)) == {
+        1: 100.0,
+        2: 250.0,
+        3: 350.0,
+    }
+
+    assert dm.bulk_update("well_onelines", "api", df.iloc[:0]) == 0
+
+
+def test_dca_loss_options(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+
+    assert dm.get_dca_loss() == "rmse"
+    assert dm.get_dca_loss_options() == dict()
+
+    dm.set_par("sett_dca_loss", "huber")
+    assert dm.get_dca_loss_options() == dict(delta=0.1)
+
+    dm.set_par("sett_dca_huber_delta", "0.25")
+    assert dm.get_dca_loss_options() == dict(delta=0.25)
+
+
+def test_get_forecasts(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+    pars = np.array([[100.0, 300.0], [0.6, 0.7], [0.07, 0.08], [1.0, 0.9]])
+
+    with dm.session_scope() as session:
+        session.add_all(
+            [
+                Well_Oneline(api=1, dca_model="mod_arps", dca_pars_oil=pars[:, 0]),
+                Well_Oneline(api=2, dca_model="mod_arps"),
+                Well_Oneline(api=3, dca_model="mod_arps", dca_pars_oil=pars[:, 1]),
+            ]
+        )
+
+    production = dm.get_forecasts(np.array([3, 2, 4, 1]), "oil", 60)
+    expected = get_decline_model("mod_arps").forecast(60, pars)
+
+    assert production.shape == (4, 60)
+    assert np.allclose(production[0], expected[1], rtol=1e-5)
+    assert np.allclose(production[3], expected[0], rtol=1e-5)
+    assert np.all(np.isnan(production[1:3]))
+
+
+def test_set_section_reserves(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+
+    with dm.session_scope() as session:
+        session.add_all(
+            [
+                Section_Well(api=1, trsm_heh="A", allocation=0.5),
+                Section_Well(api=2, trsm_heh="A", proxy_allocation=0.25),
+                Section_Well(api=3, trsm_heh="B"),
+                Well_Oneline(api=1, eur_oil=100.0, eur_gas=1000.0, remaining_oil=10.0),
+                Well_Oneline(api=2, eur_oil=200.0, eur_gas=2000.0, remaining_oil=20.0),
+                Well_Oneline(api=3, eur_oil=50.0, eur_gas=500.0, remaining_oil=5.0),
+                Section_Oneline(trsm_heh="A", no_wells_permitted=3, eur_oil=1.0),
+            ]
+        )
+
+    assert dm.set_section_reserves() == 2
+
+    rows = {
+        row.trsm_heh: row
+        for row in dm.session.query(Section_Oneline).order_by(Section_Oneline.trsm_heh)
+    }
+    assert list(rows) == ["A", "B"]
+    assert np.allclose(
+        [rows["A"].eur_oil, rows["A"].eur_gas, rows["A"].remaining_oil],
+        [100.0, 1000.0, 10.0],
+    )
+    assert np.allclose([rows["B"].eur_oil, rows["B"].eur_gas], [50.0, 500.0])
+    assert rows["A"].no_wells_permitted == 3
+    assert rows["B"].no_wells_permitted is None
+    assert rows["A"].remaining_gas is None
+
+
+def test_get_well_interests(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+
+    with dm.session_scope() as session:
+        session.add_all(
+            [
+                Section(trsm_heh="A", acres=320.0),
+                Section(trsm_heh="B"),
+                Section_Well(api=1, trsm_heh="A", allocation=0.5),
+                Section_Well(api=2, trsm_heh="B", proxy_allocation=0.25),
+                Section_Well(api=3, trsm_heh="C"),
+                Project_State_Asset(
+                    trsm_heh="A", net_acres=40.0, royalty=0.25, fixed=1000.0
+                ),
+                Project_State_Asset(trsm_heh="A", net_acres=20.0, royalty=0.2),
+                Project_State_Asset(
+                    trsm_heh="B", net_acres=10.0, royalty=0.1875, var_oil=2.0
+                ),
+            ]
+        )
+
+    interests = dm.get_well_interests()
+
+    # C holds no asset, A holds two
+    assert list(interests["api"]) == [1, 1, 2]
+    assert list(interests["trsm_heh"]) == ["A", "A", "B"]
+    assert np.allclose(interests["allocation"], [0.5, 0.5, 0.25])
+    assert np.allclose(interests["acreage"], [320.0, 320.0, 640.0])
+    assert sorted(interests["net_acres"][:2]) == [20.0, 40.0]
+    assert sorted(interests["fixed"][:2]) == [0.0, 1000.0]
+    assert np.allclose(interests["var_oil"], [0.0, 0.0, 2.0])
+    assert np.allclose(interests["var_gas"], 0.0)
+    assert interests["api"].dtype == np.int64
+
+
+def test_get_well_interests_empty(fm_data_manager):
+    interests = fm_data_manager.get_well_interests()
+
+    assert all(len(column) == 0 for column in interests.values())
+    assert interests["royalty"].dtype == np.float64
+
+
+def add_timing_sections(session):
+    """
+    Sections A and B with assumptions and their f1000s, f1001s, f1002s and
+    increased densities, C has wells but no assumptions.
+    """
+    session.add_all(
+        [
+            Section_Assumption(
+                trsm_heh="A",
+                formation_1="WOODFORD",
+                nwells_1=4,
+                tolerance_1=2,
+                formation_2="MERAMEC",
+                nwells_2=3,
+                tolerance_2=1,
+            ),
+            Section_Assumption(trsm_heh="B", formation_1="WOODFORD", nwells_1=2),
+        ]
+        + [Section_Well(api=api, trsm_heh="A") for api in [1, 2, 3, 4]]
+        + [Section_Well(api=5, trsm_heh="B"), Section_Well(api=6, trsm_heh="C")]
+        + [
+            f1000(api=1, permit_date=datetime.date(2019, 1, 1)),
+            f1000(api=2, permit_date=datetime.date(2019, 3, 1)),
+            f1000(api=3),
+            f1000(api=5, permit_date=datetime.date(2020, 1, 1)),
+            f1000(api=6, permit_date=datetime.date(2020, 1, 1)),
+            f1001(api=1, spud_date=datetime.date(2019, 2, 1)),
+            f1002(
+                api=1,
+                formation="WOODFORD",
+                well_completion_date=datetime.date(2019, 5, 1),
+            ),
+            # Matched on the normalized formation
+            f1002(
+                api=2,
+                formation="WDFD",
+                well_completion_date=datetime.date(2019, 6, 1),
+            ),
+            Well_Oneline(api=2, norm_formation="WOODFORD"),
+            f1002(
+                api=3,
+                formation="MERAMEC",
+                well_completion_date=datetime.date(2019, 7, 1),
+            ),
+            f1002(api=4, formation="WOODFORD"),
+            Increased_Density(
+                cause_number=1, trsm_heh="A", app_date=datetime.date(2018, 1, 1)
+            ),
+            Increased_Density(
+                cause_number=2,
+                trsm_heh="A",
+                app_date=datetime.date(2019, 1, 1),
+                order_date=datetime.date(2019, 4, 1),
+            ),
+            Increased_Density(
+                cause_number=3, trsm_heh="A", app_date=datetime.date(2019, 1, 1)
+            ),
+        ]
+    )
+
+
+@pytest.mark.parametrize("window_functions", [True, False])
+def test_get_section_timing_inputs(fm_data_manager, window_functions, monkeypatch):
+    dm = fm_data_manager  # type: FMDataManager
+    monkeypatch.setattr("fm_data_manager.SQLITE_WINDOW_FUNCTIONS", window_functions)
+    with dm.session_scope() as session:
+        add_timing_sections(session)
+
+    inputs = dm.get_section_timing_inputs()
+
+    assert list(inputs.trsm_heh) == ["A", "B"]
+    expected_numbers = dict(
+        nwells_1=[4, 2],
+        tolerance_1=[2, 0],
+        nwells_2=[3, 0],
+        f1000_nwells=[2, 1],
+        f1001_nwells=[1, 0],
+        f1002a_nwells_f1=[2, 0],
+        f1002a_nwells_f2=[1, 0],
+        app_nwells=[2, 0],
+        order_nwells=[1, 0],
+    )
+    for name, expected in expected_numbers.items():
+        assert list(inputs[name]) == expected, name
+
+    expected_dates = dict(
+        f1000_first_date=["2019-01-01", "2020-01-01"],
+        f1000_last_date=["2019-03-01", "2020-01-01"],
+        f1001_last_date=["2019-02-01", "NaT"],
+        f1002a_last_date_f1=["2019-06-01", "NaT"],
+        f1002a_last_date_f2=["2019-07-01", "NaT"],
+        app_date=["2019-01-01", "NaT"],
+        order_date=["2019-04-01", "NaT"],
+    )
+    for name, expected in expected_dates.items():
+        assert np.array_equal(
+            inputs[name], np.array(expected, dtype="M8[D]"), equal_nan=True
+        ), name
+
+    only_b = dm.get_section_timing_inputs(
+        sections=select([Section_Assumption.trsm_heh]).where(
+            Section_Assumption.trsm_heh == "B"
+        )
+    )
+    assert list(only_b.trsm_heh) == ["B"]
+    assert list(only_b["f1000_nwells"]) == [1]
+
+
+def section_oneline_reference(session, trsm_heh):
+    """
+    set_section_onelines of a single section, computed in python.
+    """
+    apis = [
+        well.api for well in session.query(Section_Well).filter_by(trsm_heh=trsm_heh)
+    ]
+    row = dict()
+    for nwells, name, form, date in [
+        ("no_wells_permitted", "permit", f1000, "permit_date"),
+        ("no_wells_spud", "spud", f1001, "spud_date"),
+        ("no_wells_completed", "completion", f1002, "well_completion_date"),
+    ]:
+        wells = session.query(form).filter(form.api.in_(apis)).all()
+        dates = [getattr(well, date) for well in wells if getattr(well, date)]
+        row[nwells] = len(dates)
+        row[f"date_first_{name}"] = min(dates, default=None)
+        row[f"date_last_{name}"] = max(dates, default=None)
+
+    densities = session.query(Increased_Density).filter_by(trsm_heh=trsm_heh).all()
+    for name in ["app", "order"]:
+        dates = [getattr(density, f"{name}_date") for density in densities]
+        dates = [date for date in dates if date]
+        latest = max(dates, default=None)
+        row[f"inc_den_{name}_nwells"] = dates.count(latest)
+        row[f"date_inc_den_{name}"] = latest
+    return row
+
+
+@pytest.mark.parametrize("window_functions", [True, False])
+def test_set_section_onelines(fm_data_manager, window_functions, monkeypatch):
+    dm = fm_data_manager  # type: FMDataManager
+    monkeypatch.setattr("fm_data_manager.SQLITE_WINDOW_FUNCTIONS", window_functions)
+    with dm.session_scope() as session:
+        add_timing_sections(session)
+        session.add(Section_Oneline(trsm_heh="A", eur_oil=100.0, no_wells_spud=9))
+
+    assert dm.set_section_onelines() == 3
+    # Replacing the rows again changes nothing
+    assert dm.set_section_onelines() == 3
+
+    onelines = dm.session.query(Section_Oneline).order_by(Section_Oneline.trsm_heh)
+    assert [row.trsm_heh for row in onelines] == ["A", "B", "C"]
+    for row in onelines:
+        expected = section_oneline_reference(dm.session, row.trsm_heh)
+        assert {name: getattr(row, name) for name in expected} == expected, row.trsm_heh
+    assert onelines[0].eur_oil == 100.0, "Reserves not kept"
+    assert onelines[1].eur_oil is None
+
+
+def test_moved_well_sets_both_sections_dirty(fm_data_manager):
+    dm = fm_data_manager  # type: FMDataManager
+    valuation_date = "2020-01-01"
+    with dm.session_scope() as session:
+        add_timing_sections(session)
+        session.add(Section_Assumption(trsm_heh="C", formation_1="WOODFORD"))
+
+    trsm_heh, _ = dm.get_section_timings(valuation_date)
+    assert list(trsm_heh) == ["A", "B", "C"]
+    assert len(dm.get_dirty_sections(valuation_date)) == 0
+
+    with dm.session_scope() as session:
+        well = session.query(Section_Well).filter_by(api=1, trsm_heh="A").one()
+        well.trsm_heh = "C"
+
+    assert list(dm.get_dirty_sections(valuation_date)) == ["A", "C"]
+
+    _, timings = dm.get_section_timings(valuation_date)
+    inputs = dm.get_section_timing_inputs()
+    assert list(inputs["f1000_nwells"]) == [1, 1, 2]
+    assert np.array_equal(timings, inputs.timing(valuation_date))
+
+
+def test_get_dca_python(fm_data_manager, tmp_path, monkeypatch):
+    dm = fm_data_manager  # type: FMDataManager
+    monkeypatch.setattr("sys.exec_prefix", str(tmp_path))
+
+    with pytest.raises(FileNotFoundError):
+        dm.get_dca_python()
+
+    # Python install, pythonw.exe next to python.exe
+    (tmp_path / "pythonw.exe").touch()
+    assert dm.get_dca_python() == str(tmp_path / "pythonw.exe")
+
+    # pipenv virtualenv, the venv root is the exec_prefix
+    (tmp_path / "Scripts").mkdir()
+    (tmp_path / "Scripts" / "pythonw.exe").touch()
+    assert dm.get_dca_python() == str(tmp_path / "Scripts" / "pythonw.exe")
+
+    configured = tmp_path / "python" / "pythonw.exe"
+    dm.cfg["PROJECT"]["dca_python"] = str(configured)
+    with pytest.raises(FileNotFoundError, match="dca_python"):
+        dm.get_dca_python()
+
+    configured.parent.mkdir()
+    configured.touch()
+    assert dm.get_dca_python() == str(configured)
@@ -222,13 +222,12 @@ def test_decline_wells(xl, fm_data_manager_xl, caplog):
     caplog.set_level(logging.INFO)
     dm = fm_data_manager_xl  # type: FMDataManager
 
-    df = dm["monthlies"]
-    api_list = df.api.unique()
+    layout = dm.get_production_layout()
 
-    oil_list, gas_list = run_arps(df, api_list, dm.get_initial_guess(), dm.get_bounds())
+    oil_list, gas_list = run_arps(layout, dm.get_initial_guess(), dm.get_bounds())
 
     with dm.session_scope() as session:
-        for i, selected_api in enumerate(api_list):
+        for i, selected_api in enumerate(layout.apis):
             selected_well = (
                 session.query(Well_Oneline)
                 .filter(Well_Oneline.api == str(selected_api))
@@ -249,7 +248,7 @@ def test_decline_wells(xl, fm_data_manager_xl, caplog):
 
             # selected_well.well_type = "Declined"
 
-    logging.info(f"Declined {api_list.shape[0]} wells")
+    logging.info(f"Declined {len(layout)} wells")
 
 
 @pytest.mark.parametrize("make_dca_pars", [(10000, np.float32)], indirect=True)
@@ -322,3 +321,28 @@ def test_pdp(xl, fm_data_manager_xl, caplog):
     clear_list(containing_string="fm_fn_well_list", xl=xl)
     copy_df_xl(df, "Producing", "fm_fn_well_list", copy_columns=True, xl=xl)
     assert True
+
+
+@pytest.mark.parametrize("fm_data_manager_xl", [None], indirect=True)
+def test_section_timings(fm_data_manager_xl: FMDataManager):
+    dm = fm_data_manager_xl
+    valuation_date = np.datetime64("2020-01-01")
+
+    trsm_heh, timings = dm.get_section_timings(valuation_date)
+    assert len(dm.get_dirty_sections(valuation_date)) == 0
+
+    # Only the edited section is timed again
+    with dm.session_scope() as session:
+        section = (
+            session.query(Section_Assumption)
+            .filter(Section_Assumption.trsm_heh == trsm_heh[0])
+            .one()
+        )
+        section.nwells_1 = 0
+    assert list(dm.get_dirty_sections(valuation_date)) == [trsm_heh[0]]
+
+    trsm_heh, timings = dm.get_section_timings(valuation_date)
+    inputs = dm.get_section_timing_inputs()
+    assert np.array_equal(trsm_heh, inputs.trsm_heh)
+    assert np.array_equal(timings, inputs.timing(valuation_date))
+    assert timings["nwells_fut"][0] == 0